@@ -0,0 +1,76 @@
+"""Allocation churn benchmark.
+
+Compiles a program that repeatedly allocates a batch of blocks of mixed
+sizes, touches them and frees them again, once with the tracked allocator
+(malloc/free with double-free and bounds detection) and once with
+--unchecked-alloc, and reports the best wall time of --repeat runs.
+
+    python benchmarks/alloc_churn.py --rounds 20000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def churn(rounds, batch):
+    # Sizes cycle through 8 .. 8 + 40 * (batch - 1) bytes, so small blocks
+    # hit several size classes and the largest ones bypass the arenas
+    return (f"int* ptrs[{batch}];\n"
+            f"int total = 0;\n"
+            f"for (int round = 0; round < {rounds}; round = round + 1) {{\n"
+            f"    for (int i = 0; i < {batch}; i = i + 1) {{\n"
+            f"        ptrs[i] = malloc(8 + i * 40);\n"
+            f"        *ptrs[i] = i;\n"
+            f"    }}\n"
+            f"    for (int j = 0; j < {batch}; j = j + 1) {{\n"
+            f"        int* p = ptrs[j];\n"
+            f"        total = total + *p;\n"
+            f"        free(p);\n"
+            f"    }}\n"
+            f"}}\n"
+            f"print(total);\n")
+
+MODES = {
+    'tracked': [],
+    'unchecked': ['--unchecked-alloc'],
+}
+
+def build(source, directory, name, flags):
+    path = os.path.join(directory, 'churn.cscript')
+    output = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(source)
+    subprocess.run([sys.executable, os.path.join(ROOT, 'main.py'), path, '-o', output, '-O2'] + flags,
+                   cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+    return output
+
+def measure(executable, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([executable], check=True, stdout=subprocess.DEVNULL)
+        wall = time.perf_counter() - start
+        best = wall if best is None else min(best, wall)
+    return best
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--rounds', type=int, default=20000)
+    arg_parser.add_argument('--batch', type=int, default=100,
+                            help="blocks allocated (and then freed) per round")
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    operations = args.rounds * args.batch
+    source = churn(args.rounds, args.batch)
+    with tempfile.TemporaryDirectory() as directory:
+        for name, flags in MODES.items():
+            wall = measure(build(source, directory, name, flags), args.repeat)
+            print(f"{name:10} {wall * 1000:8.1f} ms   {wall / operations * 1e9:6.1f} ns per malloc+free")
+
+if __name__ == '__main__':
+    main()
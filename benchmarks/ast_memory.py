@@ -0,0 +1,79 @@
+"""AST memory benchmark.
+
+Parses a generated program of about --nodes AST nodes twice, in fresh
+processes: once with the compact __slots__ classes from c_script.nodes and
+once with equivalent plain classes that keep a per-instance __dict__ (the
+representation used before). Reports peak RSS and the memory the finished
+tree retains.
+
+    python benchmarks/ast_memory.py --nodes 500000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, resource, sys, tracemalloc
+sys.path.insert(0, {root!r})
+sys.path.insert(0, {bench!r})
+from generate import long_block, count_nodes
+import c_script.nodes as nodes
+parser_module = sys.modules['c_script.parser']
+
+if {mode!r} == 'dict':
+    # Plain classes with the same constructors, but no __slots__
+    for name in dir(nodes):
+        cls = getattr(nodes, name)
+        if isinstance(cls, type) and issubclass(cls, nodes.Node) and cls is not nodes.Node:
+            plain = type(name, (), {{'__init__': cls.__init__}})
+            setattr(nodes, name, plain)
+            setattr(parser_module, name, plain)
+
+from c_script import parse
+
+source = long_block({statements})
+tracemalloc.start()
+ast = parse(source)
+retained, peak = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+scale = 1 if sys.platform == 'darwin' else 1024
+print(json.dumps({{'nodes': count_nodes(ast), 'retained_bytes': retained, 'traced_peak_bytes': peak,
+                  'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale}}))
+"""
+
+# long_block emits about this many nodes per statement
+NODES_PER_STATEMENT = 4.3
+
+def run(mode, statements):
+    code = CHILD.format(root=ROOT, bench=os.path.dirname(os.path.abspath(__file__)),
+                        mode=mode, statements=statements)
+    proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--nodes', type=int, default=500000)
+    arg_parser.add_argument('--json', help="write the results to this file")
+    args = arg_parser.parse_args()
+
+    statements = int(args.nodes / NODES_PER_STATEMENT)
+    results = {}
+    for mode in ('dict', 'slots'):
+        result = run(mode, statements)
+        results[mode] = result
+        print(f"{mode:6} {result['nodes']:>8} nodes  peak RSS {result['peak_rss'] / 2**20:7.1f} MiB  "
+              f"AST {result['retained_bytes'] / 2**20:7.1f} MiB  "
+              f"({result['retained_bytes'] / result['nodes']:.0f} bytes/node)")
+
+    ratio = results['dict']['retained_bytes'] / results['slots']['retained_bytes']
+    print(f"slots AST is {ratio:.2f}x smaller")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""CodeGen throughput benchmark.
+
+Parses each synthetic program once, then times CodeGen().generate() on the
+resulting AST and reports AST nodes visited per second. Track this number
+over time to catch codegen slowdowns.
+
+    python benchmarks/codegen_throughput.py --repeat 5
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate import GENERATORS, count_nodes
+from c_script import CodeGen, parse
+
+WORKLOADS = [
+    ('long_block', 20000),
+    ('long_function', 20000),
+    ('many_functions', 2000),
+    ('deep_expression', 300),
+]
+
+def measure(kind, size, repeat):
+    ast = parse(GENERATORS[kind](size))
+    nodes = count_nodes(ast)
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        CodeGen().generate(ast)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {'workload': kind, 'size': size, 'nodes': nodes, 'seconds': best,
+            'nodes_per_second': nodes / best}
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--json', help="write the results to this file")
+    args = arg_parser.parse_args()
+
+    sys.setrecursionlimit(10000)
+    results = []
+    for kind, size in WORKLOADS:
+        result = measure(kind, size, args.repeat)
+        results.append(result)
+        print(f"{kind:16} {result['nodes']:>8} nodes {result['seconds']:8.3f} s "
+              f"{result['nodes_per_second']:>12,.0f} nodes/s")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Synthetic C-Script program generators shared by the benchmarks.
+
+Each generator takes a size and returns the program source as a string.
+Run directly to write a program to stdout:
+
+    python benchmarks/generate.py long_block 10000 > big.cscript
+"""
+import sys
+
+def long_block(n):
+    # n top-level statements in a single statement list
+    lines = ['int v = 0;']
+    for i in range(n - 1):
+        if i % 3 == 0:
+            lines.append(f'v = v + {i % 97};')
+        elif i % 3 == 1:
+            lines.append(f'int t{i} = v * 2 - {i % 13};')
+        else:
+            lines.append('print(v);')
+    return '\n'.join(lines) + '\n'
+
+def long_function(n):
+    # One function whose body holds n statements, called once from main
+    body = ['    int v = 0;']
+    for i in range(n - 2):
+        body.append(f'    v = v + {i % 97};')
+    body.append('    return v;')
+    return ('def work() -> int {\n' + '\n'.join(body) + '\n}\n\n'
+            'def main() -> int {\n    print(work());\n    return 0;\n}\n')
+
+def many_functions(n):
+    # n small functions, each called once from main
+    parts = []
+    for i in range(n):
+        parts.append(f'def f{i}(int a, int b) -> int {{\n'
+                     f'    int c = a * {i % 7 + 1} + b;\n'
+                     f'    if (c > {i % 50}) {{\n        c = c - b;\n    }}\n'
+                     f'    return c;\n}}\n')
+    calls = '\n'.join(f'    print(f{i}({i}, 3));' for i in range(n))
+    return '\n'.join(parts) + f'\ndef main() -> int {{\n{calls}\n    return 0;\n}}\n'
+
+def deep_expression(n):
+    # A single expression with n binary operators, nested to the right
+    expr = 'x'
+    for i in range(n):
+        expr = f'({i % 9 + 1} + x * {expr})' if i % 2 else f'(x - {expr})'
+    return f'int x = 3;\nprint({expr});\n'
+
+def tight_loops(n):
+    # n small counted loops in one function, each accumulating into s
+    body = ['    int s = 0;']
+    for i in range(n):
+        body.append(f'    for (int i{i} = 0; i{i} < {i % 50 + 10}; i{i} = i{i} + 1) {{\n'
+                    f'        s = s + i{i} * {i % 7 + 1} - {i % 3};\n'
+                    f'    }}')
+    body.append('    return s;')
+    return ('def work() -> int {\n' + '\n'.join(body) + '\n}\n\n'
+            'def main() -> int {\n    print(work());\n    return 0;\n}\n')
+
+def array_heavy(n):
+    # n statements reading and writing a 256-element array, every tenth one
+    # a loop over the whole array
+    lines = ['int a[256];', 'int s = 0;',
+             'for (int k = 0; k < 256; k = k + 1) {\n    a[k] = k;\n}']
+    for i in range(n):
+        if i % 10 == 9:
+            lines.append(f'for (int j{i} = 0; j{i} < 256; j{i} = j{i} + 1) {{\n'
+                         f'    s = s + a[j{i}];\n'
+                         f'}}')
+        else:
+            lines.append(f'a[{i % 256}] = a[{i * 7 % 256}] + {i % 97};')
+    lines.append('print(s);')
+    return '\n'.join(lines) + '\n'
+
+GENERATORS = {
+    'long_block': long_block,
+    'long_function': long_function,
+    'many_functions': many_functions,
+    'deep_expression': deep_expression,
+    'tight_loops': tight_loops,
+    'array_heavy': array_heavy,
+}
+
+def count_nodes(node):
+    # Number of AST nodes reachable from node (a node or a list of nodes)
+    if isinstance(node, (list, tuple)):
+        return sum(count_nodes(item) for item in node)
+    if not hasattr(node, 'lineno'):
+        return 0
+    if hasattr(node, '__dict__'):
+        fields = node.__dict__.values()
+    else:
+        fields = [getattr(node, slot) for cls in type(node).__mro__
+                  for slot in getattr(cls, '__slots__', ())]
+    return 1 + sum(count_nodes(value) for value in fields)
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3 or sys.argv[1] not in GENERATORS:
+        sys.exit(f"usage: {sys.argv[0]} {{{','.join(GENERATORS)}}} SIZE")
+    sys.stdout.write(GENERATORS[sys.argv[1]](int(sys.argv[2])))
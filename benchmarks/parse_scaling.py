@@ -0,0 +1,70 @@
+"""Parser scaling benchmark.
+
+Parses generated programs of increasing size, each in a fresh process, and
+records parse time and peak RSS. The time per statement should stay flat as
+the size grows; a growing ratio means a quadratic reduction crept back in.
+
+    python benchmarks/parse_scaling.py --sizes 1000,10000,100000,1000000
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+sys.path.insert(0, {bench!r})
+from generate import GENERATORS
+from c_script import get_lexer, get_parser
+source = GENERATORS[{kind!r}]({size})
+lexer, parser = get_lexer(), get_parser()
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+parser.parse(source, lexer=lexer)
+elapsed = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+scale = 1 if sys.platform == 'darwin' else 1024
+print(json.dumps({{'seconds': elapsed, 'peak_rss': peak * scale,
+                  'parse_rss': (peak - before) * scale, 'source_bytes': len(source)}}))
+"""
+
+def run(kind, size):
+    code = CHILD.format(root=ROOT, bench=os.path.dirname(os.path.abspath(__file__)),
+                        kind=kind, size=size)
+    proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--sizes', default='1000,10000,100000',
+                            help="comma separated statement counts (add 1000000 for the full run)")
+    arg_parser.add_argument('--kind', default='long_block', choices=['long_block', 'long_function'])
+    arg_parser.add_argument('--json', help="write the results to this file")
+    args = arg_parser.parse_args()
+
+    results = []
+    previous = None
+    print(f"{'statements':>10} {'seconds':>9} {'us/stmt':>8} {'peak MiB':>9} {'exponent':>8}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        result = run(args.kind, size)
+        result['statements'] = size
+        exponent = ''
+        if previous:
+            # Growth exponent of parse time between consecutive sizes, ~1.0 is linear
+            exponent = f"{math.log(result['seconds'] / previous['seconds']) / math.log(size / previous['statements']):8.2f}"
+        print(f"{size:>10} {result['seconds']:9.3f} {result['seconds'] / size * 1e6:8.1f} "
+              f"{result['peak_rss'] / 2**20:9.1f} {exponent:>8}")
+        results.append(result)
+        previous = result
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'kind': args.kind, 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Console output benchmark.
+
+Compiles a few print-heavy programs with main.py and runs each executable
+with its stdout on a pipe, once with the runtime's default block buffering
+and once with CSCRIPT_UNBUFFERED=1 (a write per print, like the old
+println!-based runtime). Reports the best wall time of --repeat runs.
+
+    python benchmarks/print_throughput.py --count 1000000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def print_ints(count):
+    return (f"for (int i = 0; i < {count}; i = i + 1) {{\n"
+            f"    print(i);\n"
+            f"}}\n")
+
+def print_strings(count):
+    return (f"for (int i = 0; i < {count}; i = i + 1) {{\n"
+            f"    print(\"hello, world\");\n"
+            f"}}\n")
+
+def print_array(count):
+    # The same number of integers, printed 1000 at a time
+    return (f"int a[1000];\n"
+            f"for (int i = 0; i < 1000; i = i + 1) {{\n"
+            f"    a[i] = i;\n"
+            f"}}\n"
+            f"for (int j = 0; j < {count // 1000}; j = j + 1) {{\n"
+            f"    print_array(a, 1000);\n"
+            f"}}\n")
+
+PROGRAMS = {
+    'print_ints': print_ints,
+    'print_strings': print_strings,
+    'print_array': print_array,
+}
+
+def build(source, directory, name):
+    path = os.path.join(directory, name + '.cscript')
+    output = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(source)
+    subprocess.run([sys.executable, os.path.join(ROOT, 'main.py'), path, '-o', output, '-O2'],
+                   cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+    return output
+
+def measure(executable, env, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run([executable], env=env, stdout=subprocess.PIPE, check=True)
+        wall = time.perf_counter() - start
+        if best is None or wall < best[0]:
+            best = (wall, len(proc.stdout))
+    return best
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--count', type=int, default=1000000,
+                            help="number of prints per program")
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    buffered = dict(os.environ)
+    buffered.pop('CSCRIPT_UNBUFFERED', None)
+    unbuffered = dict(os.environ, CSCRIPT_UNBUFFERED='1')
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, generate in PROGRAMS.items():
+            executable = build(generate(args.count), directory, name)
+            fast, size = measure(executable, buffered, args.repeat)
+            slow, _ = measure(executable, unbuffered, args.repeat)
+            print(f"{name:14} {size / 1e6:6.1f} MB   buffered {fast * 1000:8.1f} ms   "
+                  f"unbuffered {slow * 1000:8.1f} ms   x{slow / fast:5.1f}")
+
+if __name__ == '__main__':
+    main()
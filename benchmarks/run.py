@@ -0,0 +1,284 @@
+"""Benchmark suite.
+
+Compiles every generated workload with both frontends (the Python c_script
+package and the Rust frontend behind main.py -c), timing each compiler
+phase through main.py --time-phases, then builds and runs the runtime
+benchmarks (print, file I/O, malloc churn, and array kernels written as
+loops and with the bulk builtins). Every number is the best of --repeat
+runs. Results can be written as JSON, and --compare checks them against
+an earlier run: the script exits non-zero when a metric got slower by more
+than --threshold percent, or when a benchmark that worked in the baseline
+failed or is missing, so it can gate upgrades.
+
+    python benchmarks/run.py --json baseline.json
+    python benchmarks/run.py --compare baseline.json --threshold 10
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from generate import GENERATORS
+from alloc_churn import churn
+from print_throughput import print_ints
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Workload sizes at --scale 1
+COMPILE_WORKLOADS = [
+    ('long_block', 5000),
+    ('long_function', 5000),
+    ('many_functions', 500),
+    ('deep_expression', 200),
+    ('tight_loops', 1000),
+    ('array_heavy', 2000),
+]
+
+FRONTENDS = {
+    'python': [],
+    'rust': ['-c'],
+}
+
+def file_io(count, path):
+    # Writes count 64-byte lines, then reads the file back in 4 KiB chunks
+    return (f"import file\n"
+            f"int f = fopen(\"{path}\", \"w\");\n"
+            f"for (int i = 0; i < {count}; i = i + 1) {{\n"
+            f"    fwrite(f, \"0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcde\\n\");\n"
+            f"}}\n"
+            f"fclose(f);\n"
+            f"char buf[4096];\n"
+            f"int total = 0;\n"
+            f"int g = fopen(\"{path}\", \"r\");\n"
+            f"int n = fread_into(g, buf, 4096);\n"
+            f"while (n > 0) {{\n"
+            f"    total = total + n;\n"
+            f"    n = fread_into(g, buf, 4096);\n"
+            f"}}\n"
+            f"fclose(g);\n"
+            f"print(total);\n")
+
+def array_kernels(rounds, n, builtins):
+    # Fills, copies and sums n ints per round, with the bulk builtins or
+    # with the equivalent element-by-element loops
+    if builtins:
+        body = (f"    fill(p, r, {n});\n"
+                f"    copy(q, p, {n});\n"
+                f"    t = t + sum(q, {n});\n")
+    else:
+        body = (f"    for (int i = 0; i < {n}; i = i + 1) {{\n"
+                f"        p[i] = r;\n"
+                f"    }}\n"
+                f"    for (int i = 0; i < {n}; i = i + 1) {{\n"
+                f"        q[i] = p[i];\n"
+                f"    }}\n"
+                f"    for (int i = 0; i < {n}; i = i + 1) {{\n"
+                f"        t = t + q[i];\n"
+                f"    }}\n")
+    return (f"int* p = malloc({4 * n});\n"
+            f"int* q = malloc({4 * n});\n"
+            f"int t = 0;\n"
+            f"for (int r = 0; r < {rounds}; r = r + 1) {{\n"
+            f"{body}"
+            f"}}\n"
+            f"print(t);\n")
+
+def runtime_programs(scale, directory):
+    # name -> (source, main.py flags)
+    count = int(1000000 * scale)
+    return {
+        'print_ints': (print_ints(count), []),
+        'file_io': (file_io(count, os.path.join(directory, 'file_io.txt')), []),
+        'alloc_churn': (churn(int(10000 * scale), 100), []),
+        'alloc_churn_unchecked': (churn(int(10000 * scale), 100), ['--unchecked-alloc']),
+        'array_loops': (array_kernels(max(1, int(200 * scale)), 1000000, False), []),
+        'array_builtins': (array_kernels(max(1, int(200 * scale)), 1000000, True), []),
+    }
+
+def compile_once(path, output, flags, directory):
+    # One compile with --time-phases; returns its JSON report, or the last
+    # line of the compiler's error output
+    report = os.path.join(directory, 'phases.json')
+    proc = subprocess.run([sys.executable, os.path.join(ROOT, 'main.py'), path, '-o', output,
+                           '--time-phases', report] + flags,
+                          cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0 or not os.path.exists(report):
+        lines = (proc.stderr or proc.stdout).strip().splitlines()
+        return lines[-1] if lines else 'failed'
+    with open(report) as f:
+        data = json.load(f)
+    os.remove(report)
+    return data
+
+def measure_compile(kind, size, frontend, opt_level, repeat, directory):
+    path = os.path.join(directory, f'{kind}.cscript')
+    with open(path, 'w') as f:
+        f.write(GENERATORS[kind](size))
+    flags = FRONTENDS[frontend] + ['-O', str(opt_level), '--emit', 'obj']
+    output = os.path.join(directory, kind)
+
+    # The first compile may build the runtime or the Rust frontend with
+    # cargo; it is not counted
+    report = compile_once(path, output, flags, directory)
+    if not isinstance(report, dict):
+        return None, report
+    best = {}
+    for _ in range(repeat):
+        report = compile_once(path, output, flags, directory)
+        if not isinstance(report, dict):
+            return None, report
+        times = {phase['name']: phase['wall'] for phase in report['phases']}
+        times['total'] = report['total']['wall']
+        for name, wall in times.items():
+            best[name] = min(best.get(name, wall), wall)
+    return {'phases': best, 'counts': report['counts']}, None
+
+def build(source, directory, name, flags):
+    path = os.path.join(directory, name + '.cscript')
+    output = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(source)
+    subprocess.run([sys.executable, os.path.join(ROOT, 'main.py'), path, '-o', output, '-O2'] + flags,
+                   cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+    return output
+
+def measure_run(executable, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([executable], check=True, stdout=subprocess.DEVNULL)
+        wall = time.perf_counter() - start
+        best = wall if best is None else min(best, wall)
+    return best
+
+def run_compile(args, results):
+    # A frontend that fails once (say, the Rust frontend cannot be built)
+    # is skipped for the remaining workloads
+    broken = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for kind, size in COMPILE_WORKLOADS:
+            size = max(1, int(size * args.scale))
+            for frontend in args.frontends.split(','):
+                name = f'compile/{kind}/{frontend}'
+                if frontend in broken:
+                    results['errors'][name] = broken[frontend]
+                    continue
+                result, error = measure_compile(kind, size, frontend, args.opt_level, args.repeat, directory)
+                if result is None:
+                    results['errors'][name] = broken[frontend] = error
+                    print(f"{name:36} failed, skipping the {frontend} frontend: {error}")
+                    continue
+                for phase, wall in result['phases'].items():
+                    results['metrics'][f'{name}/{phase}'] = wall
+                results['counts'][name] = result['counts']
+                phases = result['phases']
+                nodes = result['counts'].get('ast_nodes')
+                throughput = f"  {nodes / phases['total']:>10,.0f} nodes/s" if nodes else ''
+                print(f"{name:36} {phases['total'] * 1000:9.1f} ms{throughput}   " +
+                      ' '.join(f"{phase} {wall * 1000:.1f}" for phase, wall in phases.items()
+                               if phase != 'total'))
+
+def run_runtime(args, results):
+    with tempfile.TemporaryDirectory() as directory:
+        for name, (source, flags) in runtime_programs(args.scale, directory).items():
+            try:
+                executable = build(source, directory, name, flags)
+                wall = measure_run(executable, args.repeat)
+            except subprocess.CalledProcessError as e:
+                results['errors'][f'runtime/{name}'] = str(e)
+                print(f"{'runtime/' + name:36} failed: {e}")
+                continue
+            results['metrics'][f'runtime/{name}'] = wall
+            print(f"{'runtime/' + name:36} {wall * 1000:9.1f} ms")
+
+def compare(results, baseline, threshold, min_seconds, measured):
+    # Prints every metric next to its baseline and returns the ones that
+    # regressed by more than threshold percent (metrics faster than
+    # min_seconds in the baseline are too noisy to gate on), and the
+    # benchmarks that failed: new errors, and baseline metrics that this
+    # run should have measured (measured(name)) but did not
+    regressions = []
+    print(f"\n{'metric':52} {'baseline ms':>12} {'now ms':>10} {'change':>8}")
+    for name, wall in results['metrics'].items():
+        before = baseline['metrics'].get(name)
+        if before is None:
+            continue
+        change = (wall - before) / before * 100 if before else 0.0
+        status = ''
+        if change > threshold and before >= min_seconds:
+            status = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:52} {before * 1000:12.2f} {wall * 1000:10.2f} {change:+7.1f}%{status}")
+    failures = sorted(set(results['errors']) - set(baseline.get('errors', {})))
+    for name in failures:
+        print(f"{name:52} FAILED: {results['errors'][name]}")
+    for name in sorted(set(baseline['metrics']) - set(results['metrics'])):
+        if not measured(name) or any(name.startswith(error + '/') for error in results['errors']):
+            continue
+        print(f"{name:52} FAILED: missing from this run")
+        failures.append(name)
+    return regressions, failures
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--suite', default='compile,runtime',
+                            help="comma separated parts to run: compile, runtime")
+    arg_parser.add_argument('--frontends', default='python,rust',
+                            help="comma separated frontends for the compile benchmarks")
+    arg_parser.add_argument('--scale', type=float, default=1.0,
+                            help="multiplies every workload size (e.g. 0.1 for a quick run)")
+    arg_parser.add_argument('-O', dest='opt_level', type=int, choices=range(4), default=2,
+                            help="optimization level of the compile benchmarks")
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--json', help="write the results to this file")
+    arg_parser.add_argument('--compare', help="baseline results (a file written by --json) to compare against")
+    arg_parser.add_argument('--threshold', type=float, default=10.0,
+                            help="percent slowdown against the baseline that counts as a regression")
+    arg_parser.add_argument('--min-ms', type=float, default=5.0,
+                            help="baseline metrics below this many ms are reported but not gated on")
+    args = arg_parser.parse_args()
+
+    results = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'scale': args.scale,
+        'opt_level': args.opt_level,
+        'metrics': {},
+        'counts': {},
+        'errors': {},
+    }
+    suites = args.suite.split(',')
+    if 'compile' in suites:
+        run_compile(args, results)
+    if 'runtime' in suites:
+        run_runtime(args, results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for setting in ('scale', 'opt_level'):
+            if baseline.get(setting) != results[setting]:
+                print(f"warning: baseline was run with {setting} {baseline.get(setting)}, "
+                      f"this run with {results[setting]}")
+        frontends = args.frontends.split(',')
+        def measured(name):
+            parts = name.split('/')
+            return parts[0] in suites and (parts[0] != 'compile' or parts[2] in frontends)
+        regressions, failures = compare(results, baseline, args.threshold, args.min_ms / 1000, measured)
+        if regressions:
+            print(f"\n{len(regressions)} metrics regressed by more than {args.threshold:g}%")
+        if failures:
+            print(f"\n{len(failures)} benchmarks failed or are missing")
+        if regressions or failures:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
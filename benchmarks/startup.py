@@ -0,0 +1,81 @@
+"""Compiler startup benchmark.
+
+Runs a fresh interpreter with ``python -X importtime`` for each scenario and
+checks the cumulative import time of ``c_script`` and the total wall time
+against a budget. Exits non-zero when a budget is exceeded, so it can gate
+CI.
+
+    python benchmarks/startup.py --budget-ms 150
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    # Importing the package must not build the lexer/parser or load llvmlite
+    'import': "import c_script",
+    # Parse-only use builds the lexer and loads the shipped LALR tables
+    'parse': ("import c_script\n"
+              "c_script.parser.parse('int x = 1; print(x + 2);', lexer=c_script.lexer)"),
+    # Code generation is the first point that needs llvmlite
+    'codegen': ("import c_script\n"
+                "ast = c_script.parser.parse('int x = 1; print(x + 2);', lexer=c_script.lexer)\n"
+                "c_script.CodeGen().generate(ast)"),
+}
+
+def parse_importtime(stderr):
+    # Returns {module: cumulative_us} for every imported module
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace('import time:', '|', 1).split('|')]
+        modules[name] = int(cumulative_us)
+    return modules
+
+def measure(code, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                              cwd=ROOT, capture_output=True, text=True, check=True)
+        wall = time.perf_counter() - start
+        modules = parse_importtime(proc.stderr)
+        result = {
+            'wall_ms': wall * 1000,
+            'c_script_import_ms': modules.get('c_script', 0) / 1000,
+            'llvmlite_loaded': any(name.startswith('llvmlite') for name in modules),
+        }
+        if best is None or result['wall_ms'] < best['wall_ms']:
+            best = result
+    return best
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--budget-ms', type=float, default=150.0,
+                            help="wall time budget for the 'import' and 'parse' scenarios")
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    failed = False
+    for name, code in SCENARIOS.items():
+        result = measure(code, args.repeat)
+        status = ''
+        if name != 'codegen':
+            if result['wall_ms'] > args.budget_ms:
+                status = '  OVER BUDGET'
+                failed = True
+            if result['llvmlite_loaded']:
+                status += '  (loaded llvmlite)'
+                failed = True
+        print(f"{name:8} wall {result['wall_ms']:7.1f} ms   "
+              f"import c_script {result['c_script_import_ms']:6.1f} ms{status}")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
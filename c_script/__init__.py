@@ -1,10 +1,35 @@
+__version__ = "0.1.0"
 
-from .lexer import lexer
-from .parser import parser
-from .codegen import CodeGen
+from .lexer import get_lexer
+from .parser import get_parser, parse
+
+class _Lazy:
+    # Stands in for an object that is only constructed on first use
+    def __init__(self, factory):
+        object.__setattr__(self, '_factory', factory)
+
+    def __getattr__(self, name):
+        return getattr(self._factory(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._factory(), name, value)
+
+lexer = _Lazy(get_lexer)
+parser = _Lazy(get_parser)
+
+def __getattr__(name):
+    # llvmlite is only imported once code generation is needed
+    if name == 'CodeGen':
+        from .codegen import CodeGen
+        return CodeGen
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 __all__ = [
+    "__version__",
     "lexer",
     "parser",
+    "get_lexer",
+    "get_parser",
+    "parse",
     "CodeGen",
 ]
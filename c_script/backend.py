@@ -0,0 +1,63 @@
+from llvmlite import binding as llvm
+
+_initialized = False
+
+def _initialize():
+    global _initialized
+    if not _initialized:
+        llvm.initialize_native_target()
+        llvm.initialize_native_asmprinter()
+        _initialized = True
+
+def host_cpu():
+    # Returns (cpu_name, features) for the machine we are running on
+    _initialize()
+    name = llvm.get_host_cpu_name()
+    try:
+        features = llvm.get_host_cpu_features().flatten()
+    except RuntimeError:
+        # Not every platform can report its features
+        features = ''
+    return name, features
+
+def create_target_machine(triple=None, cpu='', features='', opt=2, reloc='pic', codemodel='default'):
+    _initialize()
+    if cpu == 'native':
+        cpu, host_features = host_cpu()
+        if not features:
+            features = host_features
+
+    if triple:
+        target = llvm.Target.from_triple(triple)
+    else:
+        target = llvm.Target.from_default_triple()
+
+    return target.create_target_machine(cpu=cpu, features=features, opt=opt,
+                                        reloc=reloc, codemodel=codemodel)
+
+def parse_module(module):
+    # Accepts an llvmlite.ir.Module or textual IR and returns a verified
+    # llvmlite.binding.ModuleRef
+    _initialize()
+    mod = llvm.parse_assembly(str(module))
+    mod.verify()
+    return mod
+
+def optimize(mod, target_machine, level):
+    # Run LLVM's default new pass manager pipeline for -O<level>
+    if level <= 0:
+        return mod
+    tuning = llvm.create_pipeline_tuning_options(speed_level=level)
+    tuning.loop_vectorization = level >= 2
+    tuning.slp_vectorization = level >= 2
+    pass_builder = llvm.create_pass_builder(target_machine, tuning)
+    pass_builder.getModulePassManager().run(mod, pass_builder)
+    return mod
+
+def emit_object(mod, target_machine, filename):
+    with open(filename, 'wb') as f:
+        f.write(target_machine.emit_object(mod))
+
+def emit_bitcode(mod, filename):
+    with open(filename, 'wb') as f:
+        f.write(mod.as_bitcode())
@@ -0,0 +1,237 @@
+from .folding import assigned_names, wrap_i32
+from .nodes import (Number, Identifier, BinOp, UnaryOp, FuncCall, VarDecl, ArrayAccess, Assign,
+                    While, For, ParallelFor, Return, walk)
+
+# Range analysis for --bounds-checks. CodeGen asks it which array accesses
+# need no check at all (constant indices, and induction variables of for
+# loops whose start and bound are constants), and which checks of an
+# innermost for loop can be decided once before the loop instead of on
+# every iteration (indices that are loop-invariant, or an induction
+# variable plus an invariant offset).
+
+INT_MIN = -0x80000000
+INT_MAX = 0x7fffffff
+
+# Builtins that can neither free memory nor change a pointer variable, so
+# runtime checks of pointers may be hoisted over them
+_SAFE_CALLS = {'print', 'print_array', 'flush'}
+
+def address_taken(stmts):
+    # Variables whose address stmts take (&x), which stores through
+    # pointers may change
+    return {node.operand.name for stmt in stmts for node in walk(stmt)
+            if isinstance(node, UnaryOp) and node.op == '&' and isinstance(node.operand, Identifier)}
+
+def _may_store_through_pointer(stmts, kind_of=None):
+    # Stores to *p or p[i], and calls that may make them. Stores to a
+    # fixed-size array (kind_of as for plan_loop) are checked or proven in
+    # range, so they cannot reach another variable.
+    for stmt in stmts:
+        for node in walk(stmt):
+            if isinstance(node, Assign) and not isinstance(node.target, Identifier):
+                if isinstance(node.target, ArrayAccess) and kind_of is not None \
+                        and kind_of(node.target.name) == 'array':
+                    continue
+                return True
+            if isinstance(node, FuncCall) and node.name not in _SAFE_CALLS:
+                return True
+    return False
+
+def modified_names(stmts, addressed=(), kind_of=None):
+    # Names that stmts may change. addressed are the address-taken
+    # variables of the function: a pointer to any of them may have been
+    # made before stmts run, so they count as changed by any store through
+    # a pointer.
+    names = assigned_names(stmts)
+    if addressed and _may_store_through_pointer(stmts, kind_of):
+        names |= set(addressed)
+    return names
+
+class Induction:
+    # A for loop variable that starts at its value on loop entry and moves
+    # by step (negative when counting down) towards bound, which the loop
+    # condition compares it against with < / <= (> / >= counting down)
+    __slots__ = ('name', 'start', 'bound', 'step', 'inclusive')
+
+    def __init__(self, name, start, bound, step, inclusive):
+        self.name = name
+        self.start = start
+        self.bound = bound
+        self.step = step
+        self.inclusive = inclusive
+
+def is_invariant(expr, modified):
+    # Integer arithmetic over constants and variables the loop leaves alone
+    for node in walk(expr):
+        if isinstance(node, Identifier):
+            if node.name in modified:
+                return False
+        elif isinstance(node, BinOp):
+            if node.op not in ('+', '-', '*'):
+                return False
+        elif not isinstance(node, Number):
+            return False
+    return True
+
+def _step(update, name):
+    # The constant step of 'name = name + c' / 'name = name - c', or None
+    if not isinstance(update, Assign) or not isinstance(update.target, Identifier) \
+            or update.target.name != name or not isinstance(update.value, BinOp):
+        return None
+    value = update.value
+    if value.op == '+':
+        if isinstance(value.left, Identifier) and value.left.name == name and isinstance(value.right, Number):
+            return wrap_i32(value.right.value)
+        if isinstance(value.right, Identifier) and value.right.name == name and isinstance(value.left, Number):
+            return wrap_i32(value.left.value)
+    elif value.op == '-':
+        if isinstance(value.left, Identifier) and value.left.name == name and isinstance(value.right, Number):
+            return -wrap_i32(value.right.value)
+    return None
+
+_flipped = {'<': '>', '<=': '>=', '>': '<', '>=': '<='}
+
+def induction(loop, addressed=(), kind_of=None):
+    init = loop.init
+    if isinstance(init, VarDecl) and init.var_type == 'int':
+        name, start = init.name, init.value
+    elif isinstance(init, Assign) and isinstance(init.target, Identifier):
+        name, start = init.target.name, init.value
+    else:
+        return None
+    if name in modified_names(loop.body, addressed, kind_of):
+        return None
+
+    step = _step(loop.update, name)
+    if not step:
+        return None
+
+    cond = loop.condition
+    if not isinstance(cond, BinOp) or cond.op not in _flipped:
+        return None
+    if isinstance(cond.left, Identifier) and cond.left.name == name:
+        op, bound = cond.op, cond.right
+    elif isinstance(cond.right, Identifier) and cond.right.name == name:
+        op, bound = _flipped[cond.op], cond.left
+    else:
+        return None
+
+    if (step > 0) != (op in ('<', '<=')):
+        return None
+    modified = modified_names(loop.body + [loop.update], addressed, kind_of)
+    if not is_invariant(bound, modified):
+        return None
+    return Induction(name, start, bound, step, op in ('<=', '>='))
+
+def parallel_induction(loop, addressed=()):
+    # The Induction of a parallel for. Its iterations are split up between
+    # threads, so it has to count an int it declares up by one towards a
+    # bound that is evaluated once, and the body cannot return.
+    ind = induction(loop, addressed) if isinstance(loop.init, VarDecl) else None
+    if ind is None or ind.step != 1:
+        raise Exception(f"parallel for (line {loop.lineno}) must have the form "
+                        f"'parallel for (int i = start; i < bound; i = i + 1)', "
+                        f"and the body may change neither i nor the bound")
+    if loop.reduce == ind.name:
+        raise Exception(f"parallel for (line {loop.lineno}) cannot reduce into its loop variable")
+    if any(isinstance(node, Return) for stmt in loop.body for node in walk(stmt)):
+        raise Exception(f"parallel for (line {loop.lineno}) cannot return from its body")
+    return ind
+
+def static_range(ind):
+    # (lo, hi) of the induction variable inside the loop body when its start
+    # and bound are constants, None otherwise
+    if not isinstance(ind.start, Number) or not isinstance(ind.bound, Number):
+        return None
+    start, bound = wrap_i32(ind.start.value), wrap_i32(ind.bound.value)
+    if ind.step > 0:
+        lo, hi = start, bound if ind.inclusive else bound - 1
+        # The last increment must not wrap around into the body again
+        if hi + ind.step > INT_MAX:
+            return None
+    else:
+        lo, hi = bound if ind.inclusive else bound + 1, start
+        if lo + ind.step < INT_MIN:
+            return None
+    if lo > hi:
+        return None
+    return lo, hi
+
+def interval(expr, ranges):
+    # (lo, hi) that expr always lies in, given {name: (lo, hi)} for
+    # variables with known ranges, or None
+    if isinstance(expr, Number):
+        value = wrap_i32(expr.value)
+        return value, value
+    if isinstance(expr, Identifier):
+        return ranges.get(expr.name)
+    if isinstance(expr, BinOp) and expr.op in ('+', '-', '*'):
+        left = interval(expr.left, ranges)
+        right = interval(expr.right, ranges)
+        if left is None or right is None:
+            return None
+        if expr.op == '+':
+            lo, hi = left[0] + right[0], left[1] + right[1]
+        elif expr.op == '-':
+            lo, hi = left[0] - right[1], left[1] - right[0]
+        else:
+            products = [a * b for a in left for b in right]
+            lo, hi = min(products), max(products)
+        # Anything that may wrap around is unknown
+        if lo < INT_MIN or hi > INT_MAX:
+            return None
+        return lo, hi
+    return None
+
+class Hoisted:
+    # An access whose check is decided before the loop. offset is None for
+    # an invariant index (index is then the whole expression), otherwise
+    # the index is the induction variable plus sign * offset.
+    __slots__ = ('access', 'index', 'offset', 'sign')
+
+    def __init__(self, access, index=None, offset=None, sign=1):
+        self.access = access
+        self.index = index
+        self.offset = offset
+        self.sign = sign
+
+def _affine(access, ind, modified):
+    index = access.index
+    if ind is not None and isinstance(index, Identifier) and index.name == ind.name:
+        return Hoisted(access, offset=Number(0))
+    if ind is not None and isinstance(index, BinOp) and index.op in ('+', '-'):
+        left, right = index.left, index.right
+        if isinstance(left, Identifier) and left.name == ind.name and is_invariant(right, modified):
+            return Hoisted(access, offset=right, sign=1 if index.op == '+' else -1)
+        if index.op == '+' and isinstance(right, Identifier) and right.name == ind.name \
+                and is_invariant(left, modified):
+            return Hoisted(access, offset=left)
+    if is_invariant(index, modified):
+        return Hoisted(access, index=index)
+    return None
+
+def plan_loop(loop, ind, kind_of, addressed=()):
+    # Checks in an innermost for loop that can be hoisted. kind_of(name)
+    # returns 'array' for fixed-size arrays, 'pointer' for pointer variables
+    # and None for anything else; addressed as for modified_names.
+    body = loop.body
+    for stmt in body:
+        for node in walk(stmt):
+            if isinstance(node, (For, While, ParallelFor)):
+                return []
+
+    modified = modified_names(body + ([loop.update] if loop.update is not None else []), addressed, kind_of)
+    pointers_stable = all(node.name in _SAFE_CALLS for stmt in body for node in walk(stmt)
+                          if isinstance(node, FuncCall))
+    hoisted = []
+    for stmt in body:
+        for node in walk(stmt):
+            if not isinstance(node, ArrayAccess) or node.name in modified:
+                continue
+            kind = kind_of(node.name)
+            if kind is None or (kind == 'pointer' and not pointers_stable):
+                continue
+            plan = _affine(node, ind, modified)
+            if plan is not None:
+                hoisted.append(plan)
+    return hoisted
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from . import __version__, toolchain
+
+# Content-addressed cache of whole compiles. An entry holds the files a
+# compile produced (object file, bitcode or executable) and is keyed on
+# everything that can change them: the source bytes, the compiler version,
+# the frontend, the target triple and the code generation flags.
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+class CompileCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or os.path.join(toolchain.cache_dir(), 'compile')
+        self.max_bytes = max_bytes
+        self.stats_path = os.path.join(self.directory, 'stats.json')
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, source, frontend, triple, flags):
+        h = hashlib.sha256()
+        h.update(f'c-script {__version__}\0{frontend}\0{triple}\0'.encode())
+        for name in sorted(flags):
+            h.update(f'{name}={flags[name]}\0'.encode())
+        # Executables embed the runtime, so a runtime change is a miss too
+        h.update(toolchain.source_hash(toolchain.RUNTIME_CRATE).encode())
+        if frontend == 'rust':
+            h.update(toolchain.source_hash(toolchain.FRONTEND_CRATE).encode())
+        h.update(b'\0')
+        h.update(source)
+        return h.hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def fetch(self, key, outputs):
+        # Copy a cached compile to the paths in outputs ({name: path}).
+        # Returns False (and counts a miss) if the entry is not complete.
+        entry = self._entry(key)
+        cached = {name: os.path.join(entry, name) for name in outputs}
+        if not all(os.path.exists(path) for path in cached.values()):
+            self._record(misses=1)
+            return False
+
+        saved = 0
+        for name, path in outputs.items():
+            shutil.copy2(cached[name], path)
+            saved += os.path.getsize(path)
+        # Entries are evicted least recently used first, by mtime
+        os.utime(entry)
+        self._record(hits=1, bytes_saved=saved)
+        return True
+
+    def lookup(self, key, names):
+        # Paths of the named files of an entry, for callers that use them in
+        # place rather than copying them out; None if the entry is not
+        # complete. Not counted in the stats.
+        entry = self._entry(key)
+        paths = {name: os.path.join(entry, name) for name in names}
+        if not all(os.path.exists(path) for path in paths.values()):
+            return None
+        os.utime(entry)
+        return paths
+
+    def store(self, key, outputs, evict=True):
+        # evict=False leaves eviction to the caller, e.g. to run it once
+        # after storing many entries
+        entry = self._entry(key)
+        if os.path.isdir(entry):
+            os.utime(entry)
+            return
+
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        staging = tempfile.mkdtemp(dir=os.path.dirname(entry))
+        for name, path in outputs.items():
+            shutil.copy2(path, os.path.join(staging, name))
+        try:
+            os.rename(staging, entry)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+        if evict:
+            self.evict()
+
+    def entries(self):
+        result = []
+        for shard in os.listdir(self.directory):
+            shard_path = os.path.join(self.directory, shard)
+            if not os.path.isdir(shard_path):
+                continue
+            for key in os.listdir(shard_path):
+                entry = os.path.join(shard_path, key)
+                if key.startswith('tmp') or not os.path.isdir(entry):
+                    continue
+                size = sum(os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry))
+                result.append((os.path.getmtime(entry), size, entry))
+        return result
+
+    def evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            self._record(evictions=1)
+
+    def stats(self):
+        try:
+            with open(self.stats_path) as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            stats = {}
+        for name in ('hits', 'misses', 'bytes_saved', 'evictions'):
+            stats.setdefault(name, 0)
+        return stats
+
+    def _record(self, **counts):
+        stats = self.stats()
+        for name, value in counts.items():
+            stats[name] += value
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(stats, f)
+        os.replace(tmp, self.stats_path)
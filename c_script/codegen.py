@@ -1,20 +1,49 @@
 from llvmlite import ir
-import platform
 
-linux_triple = "x86_64-pc-linux-gnu"
-macos_arm_triple = "aarch64-apple-darwin"
-macos_x86_triple = "x86_64-apple-darwin"
+from . import bounds, nodes
+from .nodes import FunctionDef, Import, Identifier, UnaryOp, ArrayAccess, BinOp, VarDecl, For, walk
+from .toolchain import host_triple
+
+# Lanes per vector in the bulk array builtins (256 bits of ints)
+VECTOR_WIDTH = 8
+
+# Builtins that a user function of the same name replaces
+BULK_BUILTINS = ('fill', 'copy', 'sum', 'min', 'max', 'dot')
 
 class CodeGen:
-    def __init__(self):
+    def __init__(self, externs=None, unchecked_alloc=False, bounds_checks=False, profile=False,
+                 profile_loops=False):
+        # externs: (name, param types, return type) of functions defined in
+        # other compilation units that this module may call.
+        # unchecked_alloc: lower malloc/free to the runtime's untracked
+        # allocator (no double-free or invalid-pointer detection).
+        # bounds_checks: check array indexing and pointer dereferences.
+        # profile: call the runtime's profiling hooks on function entry and
+        # exit; profile_loops: count loop iterations as well
+        self.externs = externs or []
+        self.unchecked_alloc = unchecked_alloc
+        self.bounds_checks = bounds_checks
+        self.profile = profile
+        self.profile_loops = profile_loops
+        # Loop node id -> its iteration counter, and (counter, label) in
+        # the order the loops were generated
+        self._loop_counters = {}
+        self._profiled_loops = []
+        # Array accesses proven (or already checked) to be in range, and the
+        # ranges of the induction variables of the loops being generated
+        self._unchecked = set()
+        self._ranges = {}
+        # Variables of the function being generated whose address is taken
+        self._addressed = set()
+        # Bodies of parallel for loops outlined so far, and how many of the
+        # functions being generated are such bodies
+        self._parallel_bodies = 0
+        self._parallel_depth = 0
+        self._intrinsics = {}
         self.module = ir.Module(name="c-script")
-        if platform.system().lower() == "linux":
-            self.module.triple = linux_triple
-        elif platform.system().lower() == "darwin":
-            if platform.machine().lower() == "arm64":
-                self.module.triple = macos_arm_triple
-            else:
-                self.module.triple = macos_x86_triple
+        triple = host_triple()
+        if triple:
+            self.module.triple = triple
         self.builder = None
         self.string_constants = {}
         self.symbol_table = {}
@@ -22,6 +51,36 @@ class CodeGen:
         # Declare C standard library functions (replaced by Rust runtime)
         self._declare_runtime_funcs()
 
+        # Node class -> bound gen_* method, and builtin name -> call lowering,
+        # so that visiting a node or a call is a single dict lookup
+        self._dispatch = {type(None): self.generic_generate}
+        for node_class in vars(nodes).values():
+            if isinstance(node_class, type) and issubclass(node_class, nodes.Node):
+                method = getattr(self, 'gen_' + node_class.__name__.lower(), None)
+                if method is not None:
+                    self._dispatch[node_class] = method
+        self._builtins = {
+            'print': self._call_print,
+            'print_array': self._call_print_array,
+            'flush': self._call_flush,
+            'malloc': self._call_malloc,
+            'free': self._call_free,
+            'fopen': self._call_fopen,
+            'fwrite': self._call_fwrite,
+            'fread': self._call_fread,
+            'fread_into': self._call_fread_into,
+            'fclose': self._call_fclose,
+            'mmap': self._call_mmap,
+            'mmap_len': self._call_mmap_len,
+            'munmap': self._call_munmap,
+            'fill': self._call_fill,
+            'copy': self._call_copy,
+            'sum': self._call_sum,
+            'min': self._call_min,
+            'max': self._call_max,
+            'dot': self._call_dot,
+        }
+
     def _get_llvm_type(self, type_str):
         if type_str.endswith('*'):
             return self._get_llvm_type(type_str[:-1]).as_pointer()
@@ -50,6 +109,133 @@ class CodeGen:
         print_str_ty = ir.FunctionType(ir.VoidType(), [ir.IntType(8).as_pointer()])
         self.cscript_print_string = ir.Function(self.module, print_str_ty, name="cscript_print_string")
 
+        # void cscript_print_int_array(int*, int)
+        print_array_ty = ir.FunctionType(ir.VoidType(), [ir.IntType(32).as_pointer(), ir.IntType(32)])
+        self.cscript_print_int_array = ir.Function(self.module, print_array_ty, name="cscript_print_int_array")
+
+        # void cscript_flush()
+        flush_ty = ir.FunctionType(ir.VoidType(), [])
+        self.cscript_flush = ir.Function(self.module, flush_ty, name="cscript_flush")
+
+    def _declare_bounds_funcs(self):
+        if hasattr(self, 'cscript_bounds_fail'): return
+
+        # void cscript_bounds_fail(int index, int length, int line), never returns
+        fail_ty = ir.FunctionType(ir.VoidType(), [ir.IntType(32)] * 3)
+        self.cscript_bounds_fail = ir.Function(self.module, fail_ty, name="cscript_bounds_fail")
+        self.cscript_bounds_fail.attributes.add('noreturn')
+        self.cscript_bounds_fail.attributes.add('cold')
+
+        # void cscript_check_index(char* ptr, int index, int elem_size, int line)
+        check_ty = ir.FunctionType(ir.VoidType(), [ir.IntType(8).as_pointer()] + [ir.IntType(32)] * 3)
+        self.cscript_check_index = ir.Function(self.module, check_ty, name="cscript_check_index")
+
+        # int cscript_bounds_ok(char* ptr, i64 lo, i64 hi, int elem_size)
+        ok_ty = ir.FunctionType(ir.IntType(32), [ir.IntType(8).as_pointer(), ir.IntType(64),
+                                                 ir.IntType(64), ir.IntType(32)])
+        self.cscript_bounds_ok = ir.Function(self.module, ok_ty, name="cscript_bounds_ok")
+
+    def _declare_profile_funcs(self):
+        if hasattr(self, 'cscript_prof_enter'): return
+
+        # void cscript_prof_enter(int* slot, char* name)
+        enter_ty = ir.FunctionType(ir.VoidType(), [ir.IntType(32).as_pointer(), ir.IntType(8).as_pointer()])
+        self.cscript_prof_enter = ir.Function(self.module, enter_ty, name="cscript_prof_enter")
+
+        # void cscript_prof_exit()
+        exit_ty = ir.FunctionType(ir.VoidType(), [])
+        self.cscript_prof_exit = ir.Function(self.module, exit_ty, name="cscript_prof_exit")
+
+        # i64* cscript_prof_register_loops(char** labels, int n)
+        register_ty = ir.FunctionType(ir.IntType(64).as_pointer(), [ir.IntType(8).as_pointer().as_pointer(),
+                                                                    ir.IntType(32)])
+        self.cscript_prof_register_loops = ir.Function(self.module, register_ty, name="cscript_prof_register_loops")
+
+    def _profile_enter(self, name):
+        # The runtime numbers functions on their first call and keeps the
+        # number in slot, so that later calls skip the registration
+        self._declare_profile_funcs()
+        slot = ir.GlobalVariable(self.module, ir.IntType(32), name=f"prof_id_{name}")
+        slot.linkage = 'internal'
+        slot.initializer = ir.Constant(ir.IntType(32), 0)
+        label = self.builder.bitcast(self._get_string_constant(name), ir.IntType(8).as_pointer())
+        self.builder.call(self.cscript_prof_enter, [slot, label])
+
+    def _profile_exit(self):
+        self.builder.call(self.cscript_prof_exit, [])
+
+    def _count_iteration(self, node, kind):
+        # Back edge of a loop: counters[n] += 1, where counters is the block
+        # the runtime handed out when the module was loaded
+        index = self._loop_counters.get(id(node))
+        if index is None:
+            index = self._loop_counters[id(node)] = len(self._profiled_loops)
+            self._profiled_loops.append(f"{self.builder.function.name}:{node.lineno} ({kind})")
+        if not hasattr(self, 'prof_loop_counters'):
+            counter_ptr = ir.IntType(64).as_pointer()
+            self.prof_loop_counters = ir.GlobalVariable(self.module, counter_ptr, name="prof_loop_counters")
+            self.prof_loop_counters.linkage = 'internal'
+            self.prof_loop_counters.initializer = ir.Constant(counter_ptr, None)
+        counters = self.builder.load(self.prof_loop_counters)
+        counter = self.builder.gep(counters, [ir.Constant(ir.IntType(32), index)])
+        if self._parallel_depth:
+            # Several threads run the loops of a parallel for body
+            self.builder.atomic_rmw('add', counter, ir.Constant(ir.IntType(64), 1), 'monotonic')
+            return
+        count = self.builder.load(counter)
+        self.builder.store(self.builder.add(count, ir.Constant(ir.IntType(64), 1)), counter)
+
+    def _register_loop_counters(self):
+        # A module constructor registers the labels of the loops with the
+        # runtime, which owns their counters and reports them at exit
+        self._declare_profile_funcs()
+        i8_ptr = ir.IntType(8).as_pointer()
+        zero = ir.Constant(ir.IntType(32), 0)
+        n = len(self._profiled_loops)
+
+        labels_ty = ir.ArrayType(i8_ptr, n)
+        labels = ir.GlobalVariable(self.module, labels_ty, name="prof_loop_labels")
+        labels.linkage = 'internal'
+        labels.initializer = ir.Constant(labels_ty, [self._get_string_constant(label).gep([zero, zero])
+                                                     for label in self._profiled_loops])
+
+        ctor = ir.Function(self.module, ir.FunctionType(ir.VoidType(), []), name="prof_register_loops")
+        ctor.linkage = 'internal'
+        builder = ir.IRBuilder(ctor.append_basic_block(name="entry"))
+        counters = builder.call(self.cscript_prof_register_loops,
+                                [labels.gep([zero, zero]), ir.Constant(ir.IntType(32), n)])
+        builder.store(counters, self.prof_loop_counters)
+        builder.ret_void()
+
+        entry_ty = ir.LiteralStructType([ir.IntType(32), ctor.type, i8_ptr])
+        ctors_ty = ir.ArrayType(entry_ty, 1)
+        ctors = ir.GlobalVariable(self.module, ctors_ty, name="llvm.global_ctors")
+        ctors.linkage = 'appending'
+        ctors.initializer = ir.Constant(ctors_ty, [ir.Constant(entry_ty, [65535, ctor, ir.Constant(i8_ptr, None)])])
+
+    def _declare_parallel_funcs(self):
+        if hasattr(self, 'cscript_parallel_for'): return
+
+        # int cscript_parallel_for(int (*body)(int lo, int hi, char* env), int lo, int hi, char* env)
+        i8_ptr = ir.IntType(8).as_pointer()
+        self.parallel_body_ty = ir.FunctionType(ir.IntType(32), [ir.IntType(32), ir.IntType(32), i8_ptr])
+        parallel_ty = ir.FunctionType(ir.IntType(32), [self.parallel_body_ty.as_pointer(), ir.IntType(32),
+                                                       ir.IntType(32), i8_ptr])
+        self.cscript_parallel_for = ir.Function(self.module, parallel_ty, name="cscript_parallel_for")
+
+    def _declare_alloc_funcs(self):
+        if hasattr(self, 'cscript_malloc'): return
+
+        suffix = '_unchecked' if self.unchecked_alloc else ''
+
+        # char* cscript_malloc(int)
+        malloc_ty = ir.FunctionType(ir.IntType(8).as_pointer(), [ir.IntType(32)])
+        self.cscript_malloc = ir.Function(self.module, malloc_ty, name="cscript_malloc" + suffix)
+
+        # int cscript_free(char*)
+        free_ty = ir.FunctionType(ir.IntType(32), [ir.IntType(8).as_pointer()])
+        self.cscript_free = ir.Function(self.module, free_ty, name="cscript_free" + suffix)
+
     def gen_import(self, node):
         module = node.module
         if module == "file":
@@ -78,6 +264,22 @@ class CodeGen:
         fread_ty = ir.FunctionType(ir.IntType(8).as_pointer(), [ir.IntType(32), ir.IntType(32)])
         self.cscript_fread = ir.Function(self.module, fread_ty, name="cscript_fread")
 
+        # int cscript_fread_into(int, char*, int)
+        fread_into_ty = ir.FunctionType(ir.IntType(32), [ir.IntType(32), ir.IntType(8).as_pointer(), ir.IntType(32)])
+        self.cscript_fread_into = ir.Function(self.module, fread_into_ty, name="cscript_fread_into")
+
+        # char* cscript_mmap(char*)
+        mmap_ty = ir.FunctionType(ir.IntType(8).as_pointer(), [ir.IntType(8).as_pointer()])
+        self.cscript_mmap = ir.Function(self.module, mmap_ty, name="cscript_mmap")
+
+        # int cscript_mmap_len(char*)
+        mmap_len_ty = ir.FunctionType(ir.IntType(32), [ir.IntType(8).as_pointer()])
+        self.cscript_mmap_len = ir.Function(self.module, mmap_len_ty, name="cscript_mmap_len")
+
+        # int cscript_munmap(char*)
+        munmap_ty = ir.FunctionType(ir.IntType(32), [ir.IntType(8).as_pointer()])
+        self.cscript_munmap = ir.Function(self.module, munmap_ty, name="cscript_munmap")
+
     def _declare_os_funcs(self):
         if hasattr(self, 'cscript_system'): return
 
@@ -101,8 +303,8 @@ class CodeGen:
         return self.string_constants[s]
 
     def generate(self, node):
-        method = 'gen_' + node.__class__.__name__.lower()
-        return getattr(self, method, self.generic_generate)(node)
+        method = self._dispatch.get(node.__class__, self.generic_generate)
+        return method(node)
 
     def generic_generate(self, node):
         if node is None:
@@ -116,9 +318,9 @@ class CodeGen:
         statements = []
         
         for stmt in node.stmts:
-            if stmt.__class__.__name__ == 'FunctionDef':
+            if isinstance(stmt, FunctionDef):
                 functions.append(stmt)
-            elif stmt.__class__.__name__ == 'Import':
+            elif isinstance(stmt, Import):
                 imports.append(stmt)
             else:
                 statements.append(stmt)
@@ -127,6 +329,12 @@ class CodeGen:
         for imp in imports:
             self.generate(imp)
 
+        # Declare functions that live in other compilation units
+        defined = {func.name for func in functions}
+        for name, param_types, return_type in self.externs:
+            if name not in defined and name not in self.module.globals:
+                self.declare_function(name, param_types, return_type)
+
         # Generate user functions
         for func in functions:
             self.generate(func)
@@ -154,14 +362,28 @@ class CodeGen:
                  main_func = ir.Function(self.module, main_func_type, name="main")
                  block = main_func.append_basic_block(name="entry")
                  self.builder = ir.IRBuilder(block)
+                 self._addressed = bounds.address_taken(statements)
     
+                 if self.profile:
+                     self._profile_enter("main")
+
                  # Generate code for each statement
                  for stmt in statements:
                      self.generate(stmt)
     
                  # Return 0
+                 if self.profile:
+                     self._profile_exit()
                  self.builder.ret(ir.Constant(ir.IntType(32), 0))
 
+        if self._profiled_loops:
+            self._register_loop_counters()
+
+
+    def declare_function(self, name, param_types, return_type):
+        func_type = ir.FunctionType(self._get_llvm_type(return_type),
+                                    [self._get_llvm_type(p_type) for p_type in param_types])
+        return ir.Function(self.module, func_type, name=name)
 
     def gen_functiondef(self, node):
         # Return type
@@ -178,7 +400,9 @@ class CodeGen:
         # Add arguments to symbol table
         entry_block = func.append_basic_block(name="entry")
         previous_builder = self.builder
+        previous_addressed = self._addressed
         self.builder = ir.IRBuilder(entry_block)
+        self._addressed = bounds.address_taken(node.body)
         
         # Store params in alloca so they are mutable (if we want them to be)
         # and to match how we handle variables
@@ -188,6 +412,9 @@ class CodeGen:
             alloca = self.builder.alloca(param_types[i], name=p_name)
             self.builder.store(arg, alloca)
             self.symbol_table[p_name] = alloca
+
+        if self.profile:
+            self._profile_enter(node.name)
             
         # Generate body
         for stmt in node.body:
@@ -195,9 +422,13 @@ class CodeGen:
             
         # Restore builder
         self.builder = previous_builder
+        self._addressed = previous_addressed
 
     def gen_return(self, node):
         value = self.generate(node.value)
+        value = self._coerce(value, self.builder.function.function_type.return_type)
+        if self.profile:
+            self._profile_exit()
         self.builder.ret(value)
 
     def gen_vardecl(self, node):
@@ -208,6 +439,7 @@ class CodeGen:
         value = self.generate(node.value)
         if isinstance(value.type, ir.PointerType) and isinstance(var_type, ir.IntType):
             value = self.builder.ptrtoint(value, var_type)
+        value = self._coerce(value, var_type)
         self.builder.store(value, ptr)
 
     def gen_arraydecl(self, node):
@@ -225,23 +457,80 @@ class CodeGen:
         # Helper to get the pointer to the element
         array_ptr = self.symbol_table[node.name]
         index = self.generate(node.index)
-        
+
+        checked = self.bounds_checks and id(node) not in self._unchecked
+        if isinstance(array_ptr.type.pointee, ir.PointerType):
+            # Indexing a pointer variable (p[i]): load the pointer, then
+            # step over i elements
+            base = self.builder.load(array_ptr, name=node.name)
+            if checked:
+                self._check_pointer(base, index, node)
+            return self.builder.gep(base, [index])
+
+        if checked and not self._in_range(node.index, array_ptr.type.pointee.count):
+            self._check_index(index, array_ptr.type.pointee.count, node)
+
         # GEP: [0, index]
         # We need two indices: 0 to dereference the array pointer, and index for the element
         zero = ir.Constant(ir.IntType(32), 0)
         return self.builder.gep(array_ptr, [zero, index], inbounds=True)
 
+    def _in_range(self, index, length, ranges=None):
+        # Statically known to lie in [0, length)?
+        known = bounds.interval(index, self._ranges if ranges is None else ranges)
+        return known is not None and known[0] >= 0 and known[1] < length
+
+    def _check_index(self, index, length, node):
+        # Inline check for a fixed-size array: one unsigned compare, which
+        # also catches negative indices
+        self._declare_bounds_funcs()
+        index = self._coerce_int(index, ir.IntType(32))
+        length = ir.Constant(ir.IntType(32), length)
+        ok = self.builder.icmp_unsigned('<', index, length, name="inbounds")
+        with self.builder.if_then(self.builder.not_(ok), likely=False):
+            self.builder.call(self.cscript_bounds_fail, [index, length, ir.Constant(ir.IntType(32), node.lineno)])
+            self.builder.unreachable()
+
+    def _check_pointer(self, ptr, index, node):
+        # Pointers are checked by the runtime against its allocation table
+        self._declare_bounds_funcs()
+        size = ir.Constant(ir.IntType(32), self._type_size(ptr.type.pointee))
+        data = self.builder.bitcast(ptr, ir.IntType(8).as_pointer())
+        index = self._coerce_int(index, ir.IntType(32))
+        self.builder.call(self.cscript_check_index, [data, index, size, ir.Constant(ir.IntType(32), node.lineno)])
+
+    def _type_size(self, ty):
+        if isinstance(ty, ir.IntType):
+            return max(ty.width // 8, 1)
+        if isinstance(ty, ir.ArrayType):
+            return ty.count * self._type_size(ty.element)
+        if isinstance(ty, ir.FloatType):
+            return 4
+        return 8
+
+    def _array_kind(self, name):
+        ptr = self.symbol_table.get(name)
+        if ptr is None:
+            return None
+        if isinstance(ptr.type.pointee, ir.ArrayType):
+            return 'array'
+        if isinstance(ptr.type.pointee, ir.PointerType):
+            return 'pointer'
+        return None
+
     def gen_assign(self, node):
         target = node.target
         ptr = None
         
-        if isinstance(target, type(node) if False else object) and target.__class__.__name__ == 'Identifier':
+        if isinstance(target, Identifier):
             ptr = self.symbol_table[target.name]
-        elif isinstance(target, type(node) if False else object) and target.__class__.__name__ == 'UnaryOp' and target.op == '*':
+        elif isinstance(target, UnaryOp) and target.op == '*':
             # Dereference assignment: *p = val
             # Evaluate the operand to get the pointer address
             ptr = self.generate(target.operand)
-        elif isinstance(target, type(node) if False else object) and target.__class__.__name__ == 'ArrayAccess':
+            if self.bounds_checks:
+                self._check_pointer(ptr, ir.Constant(ir.IntType(32), 0), target)
+        elif isinstance(target, ArrayAccess):
             # Array assignment: x[i] = val
             ptr = self._get_array_ptr(target)
         else:
@@ -259,16 +548,17 @@ class CodeGen:
              # Or maybe just safety.
              # Let's keep it but check types carefully.
              value = self.builder.ptrtoint(value, ptr.type.pointee)
-             
+
+        value = self._coerce(value, ptr.type.pointee)
         self.builder.store(value, ptr)
 
     def gen_unaryop(self, node):
         if node.op == '&':
             # Address-of
             operand = node.operand
-            if isinstance(operand, type(node) if False else object) and operand.__class__.__name__ == 'Identifier':
+            if isinstance(operand, Identifier):
                 return self.symbol_table[operand.name]
-            elif isinstance(operand, type(node) if False else object) and operand.__class__.__name__ == 'UnaryOp' and operand.op == '*':
+            elif isinstance(operand, UnaryOp) and operand.op == '*':
                 # &(*p) -> p
                 return self.generate(operand.operand)
             else:
@@ -276,6 +566,8 @@ class CodeGen:
         elif node.op == '*':
             # Dereference
             ptr = self.generate(node.operand)
+            if self.bounds_checks:
+                self._check_pointer(ptr, ir.Constant(ir.IntType(32), 0), node)
             return self.builder.load(ptr)
 
     def gen_identifier(self, node):
@@ -283,39 +575,377 @@ class CodeGen:
         return self.builder.load(ptr, name=node.name)
 
     def gen_funccall(self, node):
-        if node.name == 'print':
-            value = self.generate(node.args[0])
-            if isinstance(value.type, ir.IntType):
-                self.builder.call(self.cscript_print_int, [value])
-            elif isinstance(value.type, ir.FloatType):
-                self.builder.call(self.cscript_print_float, [value])
-            else:
-                # Assume string or char*
-                self.builder.call(self.cscript_print_string, [value])
-        elif node.name == 'fopen':
-            filename = self.generate(node.args[0])
-            mode = self.generate(node.args[1])
-            return self.builder.call(self.cscript_fopen, [filename, mode])
-        elif node.name == 'fwrite':
-            handle = self.generate(node.args[0])
-            data = self.generate(node.args[1])
-            # cscript_fwrite takes (handle, data)
-            self.builder.call(self.cscript_fwrite, [handle, data])
-        elif node.name == 'fread':
-            handle = self.generate(node.args[0])
-            size = self.generate(node.args[1])
-            return self.builder.call(self.cscript_fread, [handle, size])
-        elif node.name == 'fclose':
-            handle = self.generate(node.args[0])
-            self.builder.call(self.cscript_fclose, [handle])
+        builtin = self._builtins.get(node.name)
+        if builtin is not None and not (node.name in BULK_BUILTINS and node.name in self.module.globals):
+            return builtin(node)
+
+        # User defined function
+        if node.name in self.module.globals:
+            func = self.module.globals[node.name]
+            args = [self._call_argument(arg, param_type)
+                    for arg, param_type in zip(node.args, func.function_type.args)]
+            return self.builder.call(func, args)
+        else:
+            raise Exception(f"Function {node.name} not defined")
+
+    def _call_print(self, node):
+        # A char array prints as the string it holds
+        value = self._array_pointer(node.args[0])
+        if isinstance(value.type, ir.IntType):
+            value = self._coerce_int(value, ir.IntType(32))
+            self.builder.call(self.cscript_print_int, [value])
+        elif isinstance(value.type, ir.FloatType):
+            self.builder.call(self.cscript_print_float, [value])
+        else:
+            # Assume string or char*
+            self.builder.call(self.cscript_print_string, [value])
+
+    def _call_print_array(self, node):
+        # print_array(arr, n): one runtime call for n elements
+        array = self._array_pointer(node.args[0])
+        count = self.generate(node.args[1])
+        self.builder.call(self.cscript_print_int_array, [array, count])
+
+    # Bulk array builtins. fill and copy become llvm.memset/llvm.memmove
+    # where they can, everything else runs VECTOR_WIDTH elements per
+    # iteration in explicit vector IR (plus a scalar loop for the rest), so
+    # they are vectorized at every optimization level. The element count may
+    # be left out when the (first) array is a fixed-size array.
+
+    def _call_fill(self, node):
+        # fill(a, v[, n]): a[0..n) = v
+        self._bulk_arity(node, 2)
+        base, length = self._bulk_array(node, node.args[0])
+        count = self._bulk_count(node, 2, length)
+        elem = base.type.pointee
+        if not isinstance(elem, (ir.IntType, ir.FloatType)):
+            raise Exception(f"fill needs an int, char or float array (line {node.lineno})")
+        value = self.generate(node.args[1])
+        if isinstance(elem, ir.FloatType) and isinstance(value.type, ir.IntType):
+            value = self.builder.sitofp(value, elem)
+        value = self._coerce(value, elem)
+        self._check_extent(base, length, count, node)
+
+        size = self._type_size(elem)
+        if elem == ir.IntType(8) or (isinstance(value, ir.Constant) and value.constant == 0):
+            data = self.builder.bitcast(base, ir.IntType(8).as_pointer())
+            byte = value if elem == ir.IntType(8) else ir.Constant(ir.IntType(8), 0)
+            self.builder.call(self._intrinsic('llvm.memset', None, [data.type, ir.IntType(32)]),
+                              [data, byte, self.builder.mul(count, ir.Constant(ir.IntType(32), size)),
+                               ir.Constant(ir.IntType(1), 0)])
+            return
+
+        splat = self._splat(value)
+
+        def store_vector(k, values):
+            self.builder.store(splat, self._vector_pointer(base, k), align=size)
+            return []
+
+        def store_element(k, values):
+            self.builder.store(value, self.builder.gep(base, [k]))
+            return []
+        whole = self._whole_vectors(count)
+        self._bulk_loop(ir.Constant(ir.IntType(32), 0), whole, VECTOR_WIDTH, [], store_vector)
+        self._bulk_loop(whole, count, 1, [], store_element)
+
+    def _call_copy(self, node):
+        # copy(dst, src[, n]): dst[0..n) = src[0..n), the ranges may overlap
+        self._bulk_arity(node, 2)
+        dst, dst_length = self._bulk_array(node, node.args[0])
+        src, src_length = self._bulk_array(node, node.args[1])
+        if dst.type != src.type:
+            raise Exception(f"copy needs arrays of the same element type (line {node.lineno})")
+        count = self._bulk_count(node, 2, dst_length)
+        self._check_extent(dst, dst_length, count, node)
+        self._check_extent(src, src_length, count, node)
+
+        # Two different fixed-size arrays never overlap
+        distinct = dst_length is not None and src_length is not None \
+            and node.args[0].name != node.args[1].name
+        i8_ptr = ir.IntType(8).as_pointer()
+        intrinsic = self._intrinsic('llvm.memcpy' if distinct else 'llvm.memmove', None,
+                                    [i8_ptr, i8_ptr, ir.IntType(32)])
+        size = ir.Constant(ir.IntType(32), self._type_size(dst.type.pointee))
+        self.builder.call(intrinsic, [self.builder.bitcast(dst, i8_ptr), self.builder.bitcast(src, i8_ptr),
+                                      self.builder.mul(count, size), ir.Constant(ir.IntType(1), 0)])
+
+    def _call_sum(self, node):
+        # sum(a[, n]): a[0] + ... + a[n - 1], wrapping like int arithmetic
+        return self._bulk_reduce(node, 'add', 0)
+
+    def _call_min(self, node):
+        # min(a[, n]): the smallest element, INT_MAX when n is 0
+        return self._bulk_reduce(node, 'smin', bounds.INT_MAX)
+
+    def _call_max(self, node):
+        # max(a[, n]): the largest element, INT_MIN when n is 0
+        return self._bulk_reduce(node, 'smax', bounds.INT_MIN)
+
+    def _call_dot(self, node):
+        # dot(a, b[, n]): a[0] * b[0] + ... + a[n - 1] * b[n - 1]
+        self._bulk_arity(node, 2)
+        a, a_length = self._bulk_array(node, node.args[0])
+        b, b_length = self._bulk_array(node, node.args[1])
+        count = self._bulk_count(node, 2, a_length)
+        self._check_extent(a, a_length, count, node)
+        self._check_extent(b, b_length, count, node)
+
+        def multiply(k, values):
+            product = self.builder.mul(self._load_vector(node, a, k), self._load_vector(node, b, k))
+            return [self.builder.add(values[0], product)]
+
+        def multiply_element(k, values):
+            product = self.builder.mul(self._load_element(node, a, k), self._load_element(node, b, k))
+            return [self.builder.add(values[0], product)]
+        return self._vectorized_reduce('add', 0, count, multiply, multiply_element)
+
+    def _bulk_reduce(self, node, op, identity):
+        self._bulk_arity(node, 1)
+        base, length = self._bulk_array(node, node.args[0])
+        count = self._bulk_count(node, 1, length)
+        self._check_extent(base, length, count, node)
+
+        def combine(value, values):
+            if op == 'add':
+                return [self.builder.add(values[0], value)]
+            return [self.builder.call(self._intrinsic(f'llvm.{op}', value.type, [value.type] * 2),
+                                      [values[0], value])]
+        return self._vectorized_reduce(op, identity, count,
+                                       lambda k, values: combine(self._load_vector(node, base, k), values),
+                                       lambda k, values: combine(self._load_element(node, base, k), values))
+
+    def _vectorized_reduce(self, op, identity, count, vector_step, scalar_step):
+        # Reduces lanes with vector_step, folds the accumulator into one int
+        # with llvm.vector.reduce.<op> and finishes with scalar_step
+        i32 = ir.IntType(32)
+        vector_ty = ir.VectorType(i32, VECTOR_WIDTH)
+        lanes, = self._bulk_loop(ir.Constant(i32, 0), self._whole_vectors(count), VECTOR_WIDTH,
+                                 [ir.Constant(vector_ty, [identity] * VECTOR_WIDTH)], vector_step)
+        reduce = self._intrinsic(f'llvm.vector.reduce.{op}', i32, [vector_ty])
+        total = self.builder.call(reduce, [lanes])
+        total, = self._bulk_loop(self._whole_vectors(count), count, 1, [total], scalar_step)
+        return total
+
+    def _whole_vectors(self, count):
+        # count rounded down to a multiple of VECTOR_WIDTH
+        return self.builder.and_(count, ir.Constant(ir.IntType(32), -VECTOR_WIDTH))
+
+    def _bulk_loop(self, start, end, step, carried, body):
+        # for (k = start; k < end; k = k + step) with the values in carried
+        # kept in phis: body(k, values) returns their next values. Returns
+        # the values after the loop.
+        i32 = ir.IntType(32)
+        before = self.builder.block
+        cond_bb = self.builder.append_basic_block(name="bulkcond")
+        body_bb = self.builder.append_basic_block(name="bulkbody")
+        end_bb = self.builder.append_basic_block(name="bulkend")
+        self.builder.branch(cond_bb)
+
+        self.builder.position_at_start(cond_bb)
+        k = self.builder.phi(i32, name="k")
+        k.add_incoming(start, before)
+        values = []
+        for value in carried:
+            phi = self.builder.phi(value.type)
+            phi.add_incoming(value, before)
+            values.append(phi)
+        self.builder.cbranch(self.builder.icmp_signed('<', k, end), body_bb, end_bb)
+
+        self.builder.position_at_start(body_bb)
+        following = body(k, values)
+        latch = self.builder.block
+        k.add_incoming(self.builder.add(k, ir.Constant(i32, step)), latch)
+        for phi, value in zip(values, following):
+            phi.add_incoming(value, latch)
+        self.builder.branch(cond_bb)
+
+        self.builder.position_at_start(end_bb)
+        return values
+
+    def _bulk_arity(self, node, arrays):
+        # arrays array arguments (or array and value for fill), then an
+        # optional count
+        if not arrays <= len(node.args) <= arrays + 1:
+            raise Exception(f"{node.name} takes {arrays} or {arrays + 1} arguments (line {node.lineno})")
+
+    def _bulk_array(self, node, arg):
+        # (pointer to the first element, length of a fixed-size array or None)
+        if isinstance(arg, Identifier):
+            ptr = self.symbol_table.get(arg.name)
+            if ptr is not None and isinstance(ptr.type.pointee, ir.ArrayType):
+                return self._array_pointer(arg), ptr.type.pointee.count
+        value = self.generate(arg)
+        if not isinstance(value.type, ir.PointerType):
+            raise Exception(f"{node.name} needs an array or a pointer (line {node.lineno})")
+        return value, None
+
+    def _bulk_count(self, node, index, length):
+        # The count argument, or the length of the fixed-size array; a
+        # negative count is 0
+        i32 = ir.IntType(32)
+        if len(node.args) <= index:
+            if length is None:
+                raise Exception(f"{node.name} needs an element count for a pointer (line {node.lineno})")
+            return ir.Constant(i32, length)
+        count = self._coerce_int(self.generate(node.args[index]), i32)
+        if isinstance(count, ir.Constant):
+            return ir.Constant(i32, max(count.constant, 0))
+        zero = ir.Constant(i32, 0)
+        return self.builder.select(self.builder.icmp_signed('<', count, zero), zero, count)
+
+    def _check_extent(self, base, length, count, node):
+        # With --bounds-checks, elements [0, count) of base have to exist
+        if not self.bounds_checks:
+            return
+        if length is not None and isinstance(count, ir.Constant) and count.constant <= length:
+            return
+        self._declare_bounds_funcs()
+        i32 = ir.IntType(32)
+        last = self.builder.sub(count, ir.Constant(i32, 1))
+        if length is not None:
+            too_long = self.builder.icmp_signed('>', count, ir.Constant(i32, length))
+            with self.builder.if_then(too_long, likely=False):
+                self.builder.call(self.cscript_bounds_fail, [last, ir.Constant(i32, length),
+                                                             ir.Constant(i32, node.lineno)])
+                self.builder.unreachable()
+            return
+        # The last element lies in the block that base starts, so all do
+        with self.builder.if_then(self.builder.icmp_signed('>', count, ir.Constant(i32, 0))):
+            self._check_pointer(base, last, node)
+
+    def _element_int(self, node, value):
+        # Elements take part in sums and comparisons as ints
+        if isinstance(value.type, ir.VectorType):
+            elem = value.type.element
+            target = ir.VectorType(ir.IntType(32), value.type.count)
         else:
-            # User defined function
-            if node.name in self.module.globals:
-                func = self.module.globals[node.name]
-                args = [self.generate(arg) for arg in node.args]
-                return self.builder.call(func, args)
+            elem = value.type
+            target = ir.IntType(32)
+        if not isinstance(elem, ir.IntType):
+            raise Exception(f"{node.name} needs an int or char array (line {node.lineno})")
+        if elem.width < 32:
+            return self.builder.sext(value, target)
+        return value
+
+    def _vector_pointer(self, base, k):
+        vector_ty = ir.VectorType(base.type.pointee, VECTOR_WIDTH)
+        return self.builder.bitcast(self.builder.gep(base, [k]), vector_ty.as_pointer())
+
+    def _load_vector(self, node, base, k):
+        # Elements k .. k + VECTOR_WIDTH - 1, only aligned like one element
+        size = self._type_size(base.type.pointee)
+        return self._element_int(node, self.builder.load(self._vector_pointer(base, k), align=size))
+
+    def _load_element(self, node, base, k):
+        return self._element_int(node, self.builder.load(self.builder.gep(base, [k])))
+
+    def _splat(self, value):
+        vector_ty = ir.VectorType(value.type, VECTOR_WIDTH)
+        i32 = ir.IntType(32)
+        first = self.builder.insert_element(ir.Constant(vector_ty, ir.Undefined), value, ir.Constant(i32, 0))
+        return self.builder.shuffle_vector(first, ir.Constant(vector_ty, ir.Undefined),
+                                           ir.Constant(ir.VectorType(i32, VECTOR_WIDTH), None))
+
+    def _intrinsic(self, name, return_type, arg_types):
+        # An overloaded intrinsic, declared once per module. The llvm.mem*
+        # names get their pointer and length types from declare_intrinsic,
+        # the others the type of their first argument (llvm.smin.v8i32,
+        # llvm.smin.i32).
+        key = (name, tuple(arg_types))
+        func = self._intrinsics.get(key)
+        if func is None:
+            if name.startswith('llvm.mem'):
+                func = self.module.declare_intrinsic(name, arg_types)
             else:
-                raise Exception(f"Function {node.name} not defined")
+                ty = arg_types[0]
+                suffix = f"v{ty.count}i{ty.element.width}" if isinstance(ty, ir.VectorType) else f"i{ty.width}"
+                func = ir.Function(self.module, ir.FunctionType(return_type, arg_types), name=f"{name}.{suffix}")
+            self._intrinsics[key] = func
+        return func
+
+    def _call_flush(self, node):
+        self.builder.call(self.cscript_flush, [])
+
+    def _call_malloc(self, node):
+        self._declare_alloc_funcs()
+        size = self._call_argument(node.args[0], ir.IntType(32))
+        return self.builder.call(self.cscript_malloc, [size])
+
+    def _call_free(self, node):
+        self._declare_alloc_funcs()
+        ptr = self._call_argument(node.args[0], ir.IntType(8).as_pointer())
+        return self.builder.call(self.cscript_free, [ptr])
+
+    def _array_pointer(self, node):
+        # An array variable evaluates to a pointer to its first element
+        if isinstance(node, Identifier):
+            ptr = self.symbol_table[node.name]
+            if isinstance(ptr.type.pointee, ir.ArrayType):
+                zero = ir.Constant(ir.IntType(32), 0)
+                return self.builder.gep(ptr, [zero, zero], inbounds=True)
+        return self.generate(node)
+
+    def _call_fopen(self, node):
+        filename = self.generate(node.args[0])
+        mode = self.generate(node.args[1])
+        return self.builder.call(self.cscript_fopen, [filename, mode])
+
+    def _call_fwrite(self, node):
+        handle = self.generate(node.args[0])
+        data = self.generate(node.args[1])
+        # cscript_fwrite takes (handle, data)
+        self.builder.call(self.cscript_fwrite, [handle, data])
+
+    def _call_fread(self, node):
+        handle = self.generate(node.args[0])
+        size = self.generate(node.args[1])
+        return self.builder.call(self.cscript_fread, [handle, size])
+
+    def _call_fread_into(self, node):
+        handle = self.generate(node.args[0])
+        buf = self._call_argument(node.args[1], ir.IntType(8).as_pointer())
+        size = self.generate(node.args[2])
+        return self.builder.call(self.cscript_fread_into, [handle, buf, size])
+
+    def _call_argument(self, node, param_type):
+        # Arrays are passed as a pointer to their first element, and a
+        # pointer argument is converted to the parameter's pointer type
+        return self._coerce(self._array_pointer(node), param_type)
+
+    def _coerce(self, value, target_type):
+        # Pointers convert to any other pointer type (malloc's char* to an
+        # int*, say), ints to the int width of the target
+        if isinstance(target_type, ir.PointerType) and isinstance(value.type, ir.PointerType) \
+                and value.type != target_type:
+            return self.builder.bitcast(value, target_type)
+        return self._coerce_int(value, target_type)
+
+    def _coerce_int(self, value, int_type):
+        # chars are sign-extended to int and ints truncated to char where
+        # one is used as the other
+        if not isinstance(value.type, ir.IntType) or not isinstance(int_type, ir.IntType):
+            return value
+        if value.type.width < int_type.width:
+            return self.builder.sext(value, int_type)
+        if value.type.width > int_type.width:
+            return self.builder.trunc(value, int_type)
+        return value
+
+    def _call_mmap(self, node):
+        filename = self.generate(node.args[0])
+        return self.builder.call(self.cscript_mmap, [filename])
+
+    def _call_mmap_len(self, node):
+        data = self._call_argument(node.args[0], ir.IntType(8).as_pointer())
+        return self.builder.call(self.cscript_mmap_len, [data])
+
+    def _call_munmap(self, node):
+        data = self._call_argument(node.args[0], ir.IntType(8).as_pointer())
+        return self.builder.call(self.cscript_munmap, [data])
+
+    def _call_fclose(self, node):
+        handle = self.generate(node.args[0])
+        self.builder.call(self.cscript_fclose, [handle])
 
     def gen_string(self, node):
         return self.builder.bitcast(self._get_string_constant(node.value), ir.IntType(8).as_pointer())
@@ -367,6 +997,8 @@ class CodeGen:
         for stmt in node.body:
             self.generate(stmt)
         if not self.builder.block.is_terminated:
+            if self.profile_loops:
+                self._count_iteration(node, 'while')
             self.builder.branch(cond_bb)
             
         # End block
@@ -375,7 +1007,181 @@ class CodeGen:
     def gen_for(self, node):
         # Init
         self.generate(node.init)
-        
+
+        if not self.bounds_checks:
+            return self._gen_for_loop(node)
+
+        saved_ranges = self._ranges
+        ind = bounds.induction(node, self._addressed, self._array_kind)
+        body_ranges = None
+        if ind is not None:
+            known = bounds.static_range(ind)
+            if known is not None:
+                body_ranges = dict(saved_ranges)
+                body_ranges[ind.name] = known
+
+        # Accesses the ranges already prove need no check in either version
+        hoisted = [plan for plan in bounds.plan_loop(node, ind, self._array_kind, self._addressed)
+                   if body_ranges is None or self._array_kind(plan.access.name) != 'array'
+                   or not self._in_range(plan.access.index,
+                                         self.symbol_table[plan.access.name].type.pointee.count,
+                                         body_ranges)]
+        if not hoisted:
+            self._gen_for_loop(node, body_ranges)
+            return
+
+        # Loop versioning: decide the hoisted checks once, then run a copy
+        # of the loop without them, or the fully checked loop if any fails
+        ok = self._hoisted_checks(ind, hoisted)
+        fast_bb = self.builder.append_basic_block(name="forfast")
+        checked_bb = self.builder.append_basic_block(name="forchecked")
+        done_bb = self.builder.append_basic_block(name="fordone")
+        self.builder.cbranch(ok, fast_bb, checked_bb)
+
+        ids = {id(plan.access) for plan in hoisted}
+        self.builder.position_at_start(fast_bb)
+        self._unchecked |= ids
+        self._gen_for_loop(node, body_ranges)
+        self._unchecked -= ids
+        self.builder.branch(done_bb)
+
+        self.builder.position_at_start(checked_bb)
+        self._gen_for_loop(node, body_ranges)
+        self.builder.branch(done_bb)
+
+        self.builder.position_at_start(done_bb)
+
+    def gen_parallelfor(self, node):
+        # The body becomes a function that runs the iterations [lo, hi)
+        # and returns what they added to the reduction variable. The
+        # runtime's thread pool calls it on chunks of the whole range, and
+        # the sum of the results is added to the variable afterwards.
+        ind = bounds.parallel_induction(node, self._addressed)
+        i32 = ir.IntType(32)
+        i8_ptr = ir.IntType(8).as_pointer()
+        self._declare_parallel_funcs()
+
+        reduce_ptr = None
+        if node.reduce is not None:
+            reduce_ptr = self.symbol_table.get(node.reduce)
+            if reduce_ptr is None or reduce_ptr.type.pointee != i32:
+                raise Exception(f"reduce({node.reduce}) (line {node.lineno}) needs an int variable")
+
+        lo = self._coerce_int(self.generate(ind.start), i32)
+        hi = self._coerce_int(self.generate(ind.bound), i32)
+        if ind.inclusive:
+            hi = self.builder.add(hi, ir.Constant(i32, 1))
+
+        # The body reaches the variables of this function through an array
+        # of their addresses
+        function = self.builder.function
+        names = sorted({child.name for stmt in node.body for child in walk(stmt)
+                        if isinstance(child, (Identifier, ArrayAccess))} - {ind.name, node.reduce})
+        captured = [(name, self.symbol_table[name]) for name in names
+                    if name in self.symbol_table and self.symbol_table[name].parent.parent is function]
+        zero = ir.Constant(i32, 0)
+        env = self.builder.alloca(ir.ArrayType(i8_ptr, max(len(captured), 1)), name="parallel.env")
+        for k, (name, ptr) in enumerate(captured):
+            slot = self.builder.gep(env, [zero, ir.Constant(i32, k)], inbounds=True)
+            self.builder.store(self.builder.bitcast(ptr, i8_ptr), slot)
+
+        body = self._outline_parallel(node, ind, captured)
+        added = self.builder.call(self.cscript_parallel_for, [body, lo, hi, self.builder.bitcast(env, i8_ptr)])
+        if reduce_ptr is not None:
+            total = self.builder.load(reduce_ptr)
+            self.builder.store(self.builder.add(total, added), reduce_ptr)
+
+    def _outline_parallel(self, node, ind, captured):
+        i32 = ir.IntType(32)
+        name = f"{self.builder.function.name}.parallel{self._parallel_bodies}"
+        self._parallel_bodies += 1
+        func = ir.Function(self.module, self.parallel_body_ty, name=name)
+        func.linkage = 'internal'
+        lo, hi, env = func.args
+        lo.name, hi.name, env.name = 'lo', 'hi', 'env'
+
+        saved = self.builder, self.symbol_table, self._ranges
+        self.builder = ir.IRBuilder(func.append_basic_block(name="entry"))
+        self.symbol_table = {}
+        self._ranges = {}
+        self._parallel_depth += 1
+
+        slots = self.builder.bitcast(env, ir.IntType(8).as_pointer().as_pointer())
+        for k, (var, ptr) in enumerate(captured):
+            address = self.builder.load(self.builder.gep(slots, [ir.Constant(i32, k)]))
+            self.symbol_table[var] = self.builder.bitcast(address, ptr.type, name=var)
+        # The chunk's bounds, under names no variable can have
+        for arg, label in ((lo, '.lo'), (hi, '.hi')):
+            self.symbol_table[label] = self.builder.alloca(i32, name=arg.name)
+            self.builder.store(arg, self.symbol_table[label])
+        if node.reduce is not None:
+            # Every call sums into its own copy, starting from 0
+            self.symbol_table[node.reduce] = self.builder.alloca(i32, name=node.reduce)
+            self.builder.store(ir.Constant(i32, 0), self.symbol_table[node.reduce])
+
+        # for (int i = lo; i < hi; i = i + 1), so that bounds checks are
+        # hoisted out of the chunk like out of any other for loop
+        position = (node.lineno, node.col)
+        loop = For(VarDecl('int', ind.name, Identifier('.lo', *position), *position),
+                   BinOp(Identifier(ind.name, *position), '<', Identifier('.hi', *position), *position),
+                   node.update, node.body, *position)
+        self.gen_for(loop)
+        if node.reduce is not None:
+            self.builder.ret(self.builder.load(self.symbol_table[node.reduce]))
+        else:
+            self.builder.ret(ir.Constant(i32, 0))
+
+        self._parallel_depth -= 1
+        self.builder, self.symbol_table, self._ranges = saved
+        return func
+
+    def _hoisted_checks(self, ind, hoisted):
+        # i1 that is true when every hoisted access stays in range for the
+        # whole loop. Computed in i64 so that nothing wraps.
+        i64 = ir.IntType(64)
+        ok = ir.Constant(ir.IntType(1), 1)
+        lo = hi = None
+        if ind is not None and any(plan.offset is not None for plan in hoisted):
+            current = self.builder.sext(self.builder.load(self.symbol_table[ind.name]), i64)
+            bound = self.builder.sext(self._coerce_int(self.generate(ind.bound), ir.IntType(32)), i64)
+            step = ir.Constant(i64, ind.step)
+            if ind.step > 0:
+                lo = current
+                hi = bound if ind.inclusive else self.builder.sub(bound, ir.Constant(i64, 1))
+                last = self.builder.add(hi, step)
+                ok = self.builder.and_(ok, self.builder.icmp_signed('<=', last, ir.Constant(i64, bounds.INT_MAX)))
+            else:
+                lo = bound if ind.inclusive else self.builder.add(bound, ir.Constant(i64, 1))
+                hi = current
+                last = self.builder.add(lo, step)
+                ok = self.builder.and_(ok, self.builder.icmp_signed('>=', last, ir.Constant(i64, bounds.INT_MIN)))
+
+        for plan in hoisted:
+            if plan.offset is None:
+                first = last = self.builder.sext(self._coerce_int(self.generate(plan.index), ir.IntType(32)), i64)
+            else:
+                offset = self.builder.sext(self._coerce_int(self.generate(plan.offset), ir.IntType(32)), i64)
+                if plan.sign < 0:
+                    offset = self.builder.neg(offset)
+                first = self.builder.add(lo, offset)
+                last = self.builder.add(hi, offset)
+
+            array_ptr = self.symbol_table[plan.access.name]
+            if isinstance(array_ptr.type.pointee, ir.ArrayType):
+                length = ir.Constant(i64, array_ptr.type.pointee.count)
+                ok = self.builder.and_(ok, self.builder.icmp_signed('>=', first, ir.Constant(i64, 0)))
+                ok = self.builder.and_(ok, self.builder.icmp_signed('<', last, length))
+            else:
+                self._declare_bounds_funcs()
+                base = self.builder.load(array_ptr)
+                size = ir.Constant(ir.IntType(32), self._type_size(base.type.pointee))
+                data = self.builder.bitcast(base, ir.IntType(8).as_pointer())
+                known = self.builder.call(self.cscript_bounds_ok, [data, first, last, size])
+                ok = self.builder.and_(ok, self.builder.icmp_signed('!=', known, ir.Constant(ir.IntType(32), 0)))
+        return ok
+
+    def _gen_for_loop(self, node, body_ranges=None):
+        # Everything of a for loop after its init
         cond_bb = self.builder.append_basic_block(name="forcond")
         body_bb = self.builder.append_basic_block(name="forbody")
         end_bb = self.builder.append_basic_block(name="forend")
@@ -390,13 +1196,19 @@ class CodeGen:
         
         # Body block
         self.builder.position_at_start(body_bb)
+        saved_ranges = self._ranges
+        if body_ranges is not None:
+            self._ranges = body_ranges
         for stmt in node.body:
             self.generate(stmt)
-        
+        self._ranges = saved_ranges
+
         # Update
         self.generate(node.update)
         
         if not self.builder.block.is_terminated:
+            if self.profile_loops:
+                self._count_iteration(node, 'for')
             self.builder.branch(cond_bb)
             
         # End block
@@ -405,6 +1217,11 @@ class CodeGen:
     def gen_binop(self, node):
         lhs = self.generate(node.left)
         rhs = self.generate(node.right)
+        if isinstance(lhs.type, ir.IntType) and isinstance(rhs.type, ir.IntType) \
+                and lhs.type.width != rhs.type.width:
+            # Mixed char/int arithmetic happens in int
+            lhs = self._coerce_int(lhs, ir.IntType(32))
+            rhs = self._coerce_int(rhs, ir.IntType(32))
 
         if node.op == '+':
             return self.builder.add(lhs, rhs, name="addtmp")
@@ -0,0 +1,386 @@
+from .nodes import (Number, Identifier, BinOp, UnaryOp, FuncCall, VarDecl, ArrayDecl,
+                    ArrayAccess, Assign, If, While, For, ParallelFor, FunctionDef, Return, Import, walk)
+
+# AST simplification run between parsing and code generation: folds constant
+# expressions with i32 semantics, propagates constants assigned to local
+# ints, prunes branches and loops whose condition is constant, and drops
+# variables that are never read. Functions are folded independently, the
+# top-level statements (which become main) are folded as one more body.
+
+INT_MIN = -0x80000000
+
+def wrap_i32(value):
+    return (value + 0x80000000) % 0x100000000 - 0x80000000
+
+def _sdiv(a, b):
+    # C division truncates towards zero
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
+
+_operators = {
+    '+': lambda a, b: a + b,
+    '-': lambda a, b: a - b,
+    '*': lambda a, b: a * b,
+    '/': _sdiv,
+    '<': lambda a, b: int(a < b),
+    '<=': lambda a, b: int(a <= b),
+    '>': lambda a, b: int(a > b),
+    '>=': lambda a, b: int(a >= b),
+    '==': lambda a, b: int(a == b),
+    '!=': lambda a, b: int(a != b),
+}
+
+def _is_number(node, value=None):
+    return isinstance(node, Number) and (value is None or wrap_i32(node.value) == value)
+
+def is_pure(expr):
+    # True if evaluating expr can be skipped: no calls, and no division
+    # that might trap
+    for node in walk(expr):
+        if isinstance(node, FuncCall):
+            return False
+        if isinstance(node, BinOp) and node.op == '/':
+            if not _is_number(node.right) or wrap_i32(node.right.value) in (0, -1):
+                return False
+    return True
+
+def assigned_names(stmts):
+    # Names that stmts may change: assignment targets, declarations and
+    # variables whose address is taken
+    names = set()
+    for stmt in stmts:
+        for node in walk(stmt):
+            if isinstance(node, Assign) and isinstance(node.target, Identifier):
+                names.add(node.target.name)
+            elif isinstance(node, (VarDecl, ArrayDecl)):
+                names.add(node.name)
+            elif isinstance(node, UnaryOp) and node.op == '&' and isinstance(node.operand, Identifier):
+                names.add(node.operand.name)
+    return names
+
+def _variables(stmts):
+    # (declared, read): the scalar variables declared in stmts, and every
+    # name whose value is used, i.e. all identifiers except the targets of
+    # plain assignments
+    targets = set()
+    declared = set()
+    read = set()
+    for stmt in stmts:
+        for node in walk(stmt):
+            if isinstance(node, Assign) and isinstance(node.target, Identifier):
+                targets.add(id(node.target))
+            elif isinstance(node, Identifier):
+                if id(node) not in targets:
+                    read.add(node.name)
+            elif isinstance(node, VarDecl):
+                declared.add(node.name)
+            elif isinstance(node, ArrayAccess):
+                read.add(node.name)
+    return declared, read
+
+def _ends_with_return(stmts):
+    return bool(stmts) and isinstance(stmts[-1], Return)
+
+class Folder:
+    def __init__(self, params=()):
+        # Known values of local ints, and the names that may never be
+        # tracked because something holds a pointer to them
+        self.env = {}
+        self.int_vars = {name for var_type, name in params if var_type == 'int'}
+        self.pinned = set()
+
+        self._statements = {
+            VarDecl: self.fold_vardecl,
+            ArrayDecl: self.fold_arraydecl,
+            Assign: self.fold_assign,
+            If: self.fold_if,
+            While: self.fold_while,
+            For: self.fold_for,
+            ParallelFor: self.fold_parallelfor,
+            Return: self.fold_return,
+            FunctionDef: self.fold_functiondef,
+        }
+        self._expressions = {
+            Identifier: self.fold_identifier,
+            BinOp: self.fold_binop,
+            UnaryOp: self.fold_unaryop,
+            FuncCall: self.fold_funccall,
+            ArrayAccess: self.fold_arrayaccess,
+        }
+
+    def body(self, stmts):
+        # Folds a function body (or the top-level statements)
+        stmts = self.block(stmts)
+        return self.sweep(stmts)
+
+    def block(self, stmts):
+        result = []
+        for stmt in stmts:
+            result.extend(self.statement(stmt))
+            if _ends_with_return(result):
+                # Anything after a return is unreachable
+                break
+        return result
+
+    def statement(self, node):
+        # Returns the list of statements that replace node
+        method = self._statements.get(node.__class__)
+        if method is not None:
+            return method(node)
+        if isinstance(node, Import):
+            return [node]
+        # Expression statement, kept only for its side effects
+        expr = self.expression(node)
+        return [] if is_pure(expr) else [expr]
+
+    def expression(self, node):
+        method = self._expressions.get(node.__class__)
+        if method is None:
+            return node
+        return method(node)
+
+    def _set(self, name, value):
+        if name in self.int_vars and name not in self.pinned and isinstance(value, Number):
+            self.env[name] = wrap_i32(value.value)
+        else:
+            self.env.pop(name, None)
+
+    def _forget(self, names):
+        for name in names:
+            self.env.pop(name, None)
+
+    # Statements
+
+    def fold_vardecl(self, node):
+        node.value = self.expression(node.value)
+        if node.var_type == 'int':
+            self.int_vars.add(node.name)
+        else:
+            self.int_vars.discard(node.name)
+        self._set(node.name, node.value)
+        return [node]
+
+    def fold_arraydecl(self, node):
+        self.int_vars.discard(node.name)
+        self.env.pop(node.name, None)
+        return [node]
+
+    def fold_assign(self, node):
+        node.value = self.expression(node.value)
+        target = node.target
+        if isinstance(target, Identifier):
+            self._set(target.name, node.value)
+        elif isinstance(target, ArrayAccess):
+            target.index = self.expression(target.index)
+        elif isinstance(target, UnaryOp) and target.op == '*':
+            # Only pinned variables can be reached through a pointer, and
+            # those are never tracked
+            target.operand = self.expression(target.operand)
+        return [node]
+
+    def fold_if(self, node):
+        node.condition = self.expression(node.condition)
+        if isinstance(node.condition, Number):
+            taken = node.then_body if wrap_i32(node.condition.value) else node.else_body
+            return self.block(taken or [])
+
+        before = dict(self.env)
+        node.then_body = self.block(node.then_body)
+        then_env, self.env = self.env, dict(before)
+        if node.else_body:
+            node.else_body = self.block(node.else_body)
+        else_env = self.env
+
+        # Only a branch that falls through reaches the code after the if
+        if _ends_with_return(node.then_body):
+            self.env = else_env
+        elif _ends_with_return(node.else_body):
+            self.env = then_env
+        else:
+            self.env = {name: value for name, value in then_env.items()
+                        if else_env.get(name) == value}
+
+        if not node.then_body and not node.else_body:
+            return [] if is_pure(node.condition) else [node.condition]
+        return [node]
+
+    def fold_while(self, node):
+        self._forget(assigned_names(node.body))
+        node.condition = self.expression(node.condition)
+        if _is_number(node.condition, 0):
+            return []
+
+        before = dict(self.env)
+        node.body = self.block(node.body)
+        self.env = before
+        return [node]
+
+    def fold_for(self, node):
+        init = self.statement(node.init) if node.init is not None else []
+        self._forget(assigned_names(node.body + ([node.update] if node.update is not None else [])))
+        node.condition = self.expression(node.condition)
+        if _is_number(node.condition, 0):
+            return init
+
+        before = dict(self.env)
+        node.body = self.block(node.body)
+        if node.update is not None:
+            node.update, = self.fold_assign(node.update)
+        self.env = before
+        return [node]
+
+    def fold_parallelfor(self, node):
+        # The loop keeps its init, CodeGen splits its range between threads.
+        # Nothing the iterations assign is known during or after the loop.
+        node.init.value = self.expression(node.init.value)
+        self._forget(assigned_names([node.init, node.update] + node.body))
+        node.condition = self.expression(node.condition)
+
+        before = dict(self.env)
+        node.body = self.block(node.body)
+        node.update, = self.fold_assign(node.update)
+        self.env = before
+        return [node]
+
+    def fold_return(self, node):
+        node.value = self.expression(node.value)
+        return [node]
+
+    def fold_functiondef(self, node):
+        node.body = Folder(node.params).body(node.body)
+        return [node]
+
+    # Expressions
+
+    def fold_identifier(self, node):
+        value = self.env.get(node.name)
+        if value is None:
+            return node
+        return Number(value, node.lineno, node.col)
+
+    def fold_binop(self, node):
+        left = node.left = self.expression(node.left)
+        right = node.right = self.expression(node.right)
+        op = node.op
+
+        if isinstance(left, Number) and isinstance(right, Number):
+            a, b = wrap_i32(left.value), wrap_i32(right.value)
+            # Division by zero and INT_MIN / -1 trap at run time, leave
+            # them to it
+            if op != '/' or (b != 0 and not (a == INT_MIN and b == -1)):
+                return Number(wrap_i32(_operators[op](a, b)), node.lineno, node.col)
+            return node
+
+        if op == '+':
+            if _is_number(left, 0):
+                return right
+            if _is_number(right, 0):
+                return left
+        elif op == '-':
+            if _is_number(right, 0):
+                return left
+        elif op == '*':
+            if _is_number(left, 1):
+                return right
+            if _is_number(right, 1):
+                return left
+            if (_is_number(left, 0) and is_pure(right)) or (_is_number(right, 0) and is_pure(left)):
+                return Number(0, node.lineno, node.col)
+        elif op == '/':
+            if _is_number(right, 1):
+                return left
+        return node
+
+    def fold_unaryop(self, node):
+        if node.op == '&':
+            # &x names the variable itself, it is not a use of its value.
+            # Stores through the pointer can only follow this point (loops
+            # forget the variables they take the address of up front), so
+            # the variable is not tracked from here on.
+            if isinstance(node.operand, Identifier):
+                self.pinned.add(node.operand.name)
+                self.env.pop(node.operand.name, None)
+            return node
+        node.operand = self.expression(node.operand)
+        return node
+
+    def fold_funccall(self, node):
+        node.args = [self.expression(arg) for arg in node.args]
+        return node
+
+    def fold_arrayaccess(self, node):
+        node.index = self.expression(node.index)
+        return node
+
+    # Unused variables
+
+    def sweep(self, stmts):
+        declared, read = _variables(stmts)
+        unused = declared - read - self.pinned
+        if not unused:
+            return stmts
+        return self._sweep(stmts, unused)
+
+    def _dead_store(self, node, unused):
+        # The replacement for a declaration of, or an assignment to, an
+        # unused variable: nothing, or just the value for its side effects
+        if isinstance(node, VarDecl):
+            name = node.name
+        elif isinstance(node, Assign) and isinstance(node.target, Identifier):
+            name = node.target.name
+        else:
+            return None
+        if name not in unused:
+            return None
+        return [] if is_pure(node.value) else [node.value]
+
+    def _sweep(self, stmts, unused):
+        result = []
+        for stmt in stmts:
+            dead = self._dead_store(stmt, unused)
+            if dead is not None:
+                result.extend(dead)
+                continue
+            if isinstance(stmt, If):
+                stmt.then_body = self._sweep(stmt.then_body, unused)
+                if stmt.else_body:
+                    stmt.else_body = self._sweep(stmt.else_body, unused)
+                if not stmt.then_body and not stmt.else_body:
+                    if not is_pure(stmt.condition):
+                        result.append(stmt.condition)
+                    continue
+            elif isinstance(stmt, While):
+                stmt.body = self._sweep(stmt.body, unused)
+            elif isinstance(stmt, For):
+                stmt.body = self._sweep(stmt.body, unused)
+                for name in ('init', 'update'):
+                    part = getattr(stmt, name)
+                    if part is not None and self._dead_store(part, unused) == []:
+                        setattr(stmt, name, None)
+            elif isinstance(stmt, ParallelFor):
+                stmt.body = self._sweep(stmt.body, unused)
+            result.append(stmt)
+        return result
+
+def fold(program):
+    # Simplifies program in place and returns it
+    if program is None:
+        # Parse error, already reported by the parser
+        return program
+    definitions = []
+    statements = []
+    for stmt in program.stmts:
+        if isinstance(stmt, FunctionDef):
+            definitions.extend(Folder().fold_functiondef(stmt))
+        elif isinstance(stmt, Import):
+            definitions.append(stmt)
+        else:
+            statements.append(stmt)
+
+    folded = Folder().body(statements)
+    if statements and not folded:
+        # CodeGen only creates main when there are top-level statements,
+        # keep one that generates no code
+        folded = [Number(0, statements[0].lineno, statements[0].col)]
+    program.stmts = definitions + folded
+    return program
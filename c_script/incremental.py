@@ -0,0 +1,121 @@
+import hashlib
+
+from . import __version__
+from .nodes import Node, FuncCall, FunctionDef, Import, Program, fields, walk
+
+# Function-level incremental builds (main.py --incremental). A program is
+# split into one unit per function plus one for the top-level statements
+# (main), and every unit is compiled to its own module and object file. A
+# unit's key hashes its AST subtree, the signatures of the functions it
+# calls, the program's imports and the code generation flags, which is all
+# its code depends on, so an edit only recompiles the functions it touches
+# (and, when a signature changes, its callers).
+
+class Unit:
+    # name: the function (or 'main'); program: a Program holding the
+    # imports and the function (or the top-level statements); externs: the
+    # signatures of the other functions it calls, for CodeGen
+    __slots__ = ('name', 'program', 'externs', 'key')
+
+    def __init__(self, name, program, externs, key):
+        self.name = name
+        self.program = program
+        self.externs = externs
+        self.key = key
+
+def signature(func):
+    # (name, [param types], return type), as scan_signatures returns them
+    return (func.name, [param_type for param_type, _ in func.params], func.return_type)
+
+def _digest(value, h, positions):
+    # Feeds the structure of an AST value into h. Positions only matter
+    # when they end up in the generated code.
+    if isinstance(value, Node):
+        h.update(value.__class__.__name__.encode() + b'(')
+        if positions:
+            h.update(f'{value.lineno}:{value.col};'.encode())
+        for name, field in fields(value):
+            h.update(name.encode() + b'=')
+            _digest(field, h, positions)
+        h.update(b')')
+    elif isinstance(value, (list, tuple)):
+        h.update(b'[')
+        for item in value:
+            _digest(item, h, positions)
+            h.update(b',')
+        h.update(b']')
+    else:
+        h.update(repr(value).encode())
+
+def _callees(stmts, visible):
+    # Signatures of the functions in visible ({name: signature}) that stmts
+    # call, sorted by name
+    names = {node.name for stmt in stmts for node in walk(stmt)
+             if isinstance(node, FuncCall) and node.name in visible}
+    return [visible[name] for name in sorted(names)]
+
+class UnitBuilder:
+    # Makes the units of a program as its statements arrive: imports first,
+    # then each function in definition order, then main. split() feeds it a
+    # whole program, main.py --stream one statement at a time.
+    def __init__(self, flags, triple=''):
+        # flags are the code generation flags ({name: value}); positions
+        # are hashed when flags say they are compiled in (bounds checks and
+        # loop labels carry line numbers)
+        self.flags = flags
+        self.triple = triple
+        self.positions = bool(flags.get('bounds_checks') or flags.get('profile_loops'))
+        self.imports = []
+        # As in a whole-program build, a function sees the functions
+        # defined before it (and itself, which lives in its own module)
+        self.visible = {}
+        self._base = None
+
+    def add_import(self, node):
+        self.imports.append(node)
+        self._base = None
+
+    def _unit(self, name, stmts):
+        if self._base is None:
+            base = hashlib.sha256()
+            base.update(f'c-script {__version__}\0{self.triple}\0'.encode())
+            for flag in sorted(self.flags):
+                base.update(f'{flag}={self.flags[flag]}\0'.encode())
+            base.update(repr(sorted(imp.module for imp in self.imports)).encode())
+            self._base = base
+        externs = _callees(stmts, self.visible)
+        h = self._base.copy()
+        h.update(f'\0{name}\0{externs!r}\0'.encode())
+        _digest(stmts, h, self.positions)
+        return Unit(name, Program(self.imports + stmts), externs, h.hexdigest())
+
+    def function(self, func):
+        unit = self._unit(func.name, [func])
+        self.visible[func.name] = signature(func)
+        return unit
+
+    def main(self, statements):
+        # The unit for the top-level statements, or None when there is
+        # none: they only become main when no function is called main,
+        # like CodeGen.gen_program
+        if not statements or 'main' in self.visible:
+            return None
+        return self._unit('main', statements)
+
+def split(program, flags, triple=''):
+    # The units of a (folded) program, in definition order
+    builder = UnitBuilder(flags, triple)
+    functions = []
+    statements = []
+    for stmt in program.stmts:
+        if isinstance(stmt, Import):
+            builder.add_import(stmt)
+        elif isinstance(stmt, FunctionDef):
+            functions.append(stmt)
+        else:
+            statements.append(stmt)
+    units = [builder.function(func) for func in functions]
+    main = builder.main(statements)
+    if main is not None:
+        units.append(main)
+    return units
@@ -0,0 +1,1052 @@
+import ctypes
+import sys
+from operator import itemgetter
+
+from .bounds import INT_MAX, INT_MIN, parallel_induction
+from .folding import assigned_names, wrap_i32
+from .nodes import (Node, Number, String, Identifier, BinOp, UnaryOp, FuncCall, VarDecl,
+                    ArrayDecl, ArrayAccess, Assign, If, While, For, ParallelFor, FunctionDef, Return,
+                    Import, Program, fields, walk)
+
+# Tiered execution (main.py --interp). Programs start in this interpreter,
+# which translates every AST node once into a Python closure over its
+# children and then runs the closures, so there is no LLVM or linker on the
+# way to the first statement. Builtins call the Rust runtime through ctypes,
+# and variables whose address is taken, arrays and strings live in ctypes
+# memory, so pointers are real addresses that native code can use too.
+#
+# Every function counts its calls and the loop iterations it runs. Once the
+# count passes the hot threshold, the function and the functions it calls
+# are compiled with CodeGen and MCJIT, and later calls go to the native
+# code. A loop that gets hot while it runs is outlined into a native
+# function that takes the loop's variables (by pointer where the loop
+# assigns them), and the remaining iterations run there.
+
+HOT_THRESHOLD = 10000
+
+_CTYPES = {
+    'int': ctypes.c_int32,
+    'char': ctypes.c_int8,
+    'float': ctypes.c_float,
+}
+
+def _ctype(type_name):
+    # Pointers are kept as plain integer addresses
+    if type_name.endswith('*'):
+        return ctypes.c_size_t
+    ctype = _CTYPES.get(type_name)
+    if ctype is None:
+        raise Exception(f"Unknown type: {type_name}")
+    return ctype
+
+def _argument_ctype(type_name):
+    return ctypes.c_void_p if type_name.endswith('*') else _ctype(type_name)
+
+def _result_ctype(type_name):
+    return None if type_name == 'void' else _ctype(type_name)
+
+# Runtime functions as CodeGen declares them: always, or after an import.
+# Programs may call these directly by name.
+_RUNTIME = {
+    'cscript_print_int': (['int'], 'void'),
+    'cscript_print_float': (['float'], 'void'),
+    'cscript_print_string': (['char*'], 'void'),
+    'cscript_print_int_array': (['int*', 'int'], 'void'),
+    'cscript_flush': ([], 'void'),
+}
+
+_MODULES = {
+    'file': {
+        'cscript_fopen': (['char*', 'char*'], 'int'),
+        'cscript_fwrite': (['int', 'char*'], 'int'),
+        'cscript_fclose': (['int'], 'int'),
+        'cscript_fread': (['int', 'int'], 'char*'),
+        'cscript_fread_into': (['int', 'char*', 'int'], 'int'),
+        'cscript_mmap': (['char*'], 'char*'),
+        'cscript_mmap_len': (['char*'], 'int'),
+        'cscript_munmap': (['char*'], 'int'),
+    },
+    'os': {
+        'cscript_system': (['char*'], 'int'),
+        'cscript_getenv': (['char*'], 'char*'),
+    },
+}
+
+# Builtins that are a plain runtime call: builtin -> (runtime function,
+# module that has to be imported first)
+_BUILTINS = {
+    'print_array': ('cscript_print_int_array', None),
+    'flush': ('cscript_flush', None),
+    'fopen': ('cscript_fopen', 'file'),
+    'fwrite': ('cscript_fwrite', 'file'),
+    'fread': ('cscript_fread', 'file'),
+    'fread_into': ('cscript_fread_into', 'file'),
+    'fclose': ('cscript_fclose', 'file'),
+    'mmap': ('cscript_mmap', 'file'),
+    'mmap_len': ('cscript_mmap_len', 'file'),
+    'munmap': ('cscript_munmap', 'file'),
+}
+
+# Bulk array builtins (CodeGen's BULK_BUILTINS), which a user function of
+# the same name replaces
+_BULK = ('fill', 'copy', 'sum', 'min', 'max', 'dot')
+
+def _wrap_char(value):
+    return ((value + 0x80) & 0xFF) - 0x80
+
+def _arithmetic(op, left, right):
+    # i32 arithmetic, wrapping like the native code does
+    if op == '+':
+        return lambda frame: ((left(frame) + right(frame) + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+    if op == '-':
+        return lambda frame: ((left(frame) - right(frame) + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+    return lambda frame: ((left(frame) * right(frame) + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+
+def _add_constant(left, constant):
+    constant += 0x80000000
+    return lambda frame: ((left(frame) + constant) & 0xFFFFFFFF) - 0x80000000
+
+def _float_arithmetic(op, left, right):
+    if op == '+':
+        return lambda frame: left(frame) + right(frame)
+    if op == '-':
+        return lambda frame: left(frame) - right(frame)
+    if op == '*':
+        return lambda frame: left(frame) * right(frame)
+    return lambda frame: left(frame) / right(frame)
+
+def _comparison(op, left, right):
+    # Returns a closure that evaluates to a Python bool
+    if op == '<':
+        return lambda frame: left(frame) < right(frame)
+    if op == '<=':
+        return lambda frame: left(frame) <= right(frame)
+    if op == '>':
+        return lambda frame: left(frame) > right(frame)
+    if op == '>=':
+        return lambda frame: left(frame) >= right(frame)
+    if op == '==':
+        return lambda frame: left(frame) == right(frame)
+    return lambda frame: left(frame) != right(frame)
+
+_COMPARISONS = ('<', '<=', '>', '>=', '==', '!=')
+
+def _sdiv(a, b):
+    # C division truncates towards zero
+    quotient = abs(a) // abs(b)
+    return wrap_i32(quotient if (a < 0) == (b < 0) else -quotient)
+
+def _runtime_error(lib, message, line):
+    # Same shape as the runtime's own errors: earlier output first, then
+    # the message on stderr and exit status 1
+    lib.cscript_flush()
+    sys.stderr.write(f"runtime error: {message} (line {line})\n")
+    sys.exit(1)
+
+def _dereferenced(node, names):
+    # A copy of node in which the variables in names are accessed through
+    # pointers of the same name (x becomes *x, so &x becomes &*x, i.e. x)
+    if isinstance(node, list):
+        return [_dereferenced(item, names) for item in node]
+    if not isinstance(node, Node):
+        return node
+    if isinstance(node, Identifier):
+        if node.name in names:
+            return UnaryOp('*', Identifier(node.name, node.lineno, node.col), node.lineno, node.col)
+        return node
+    copy = node.__class__.__new__(node.__class__)
+    copy.lineno = node.lineno
+    copy.col = node.col
+    for name, value in fields(node):
+        setattr(copy, name, _dereferenced(value, names))
+    return copy
+
+class Var:
+    # A variable of the function being compiled. kind is 'value' (the
+    # Python value sits in the frame), 'cell' (a ctypes object sits in the
+    # frame, for variables whose address is taken) or 'array'.
+    __slots__ = ('slot', 'type', 'kind', 'size')
+
+    def __init__(self, slot, type, kind, size=0):
+        self.slot = slot
+        self.type = type
+        self.kind = kind
+        self.size = size
+
+class Function:
+    # A user function. Calls go through call, which starts out as the
+    # interpreter and is replaced by the native code on promotion.
+    __slots__ = ('node', 'param_types', 'return_type', 'call', 'count', 'tried')
+
+    def __init__(self, node):
+        self.node = node
+        self.param_types = [param_type for param_type, _ in node.params]
+        self.return_type = node.return_type
+        self.call = None
+        self.count = 0
+        self.tried = False
+
+class Loop:
+    # A while or for loop, the variables in scope where it starts, the
+    # iterations it ran so far (over all its runs) and, once it got hot,
+    # its native version
+    __slots__ = ('node', 'vars', 'count', 'native', 'tried')
+
+    def __init__(self, node, vars):
+        self.node = node
+        self.vars = vars
+        self.count = 0
+        self.native = None
+        self.tried = False
+
+class Interpreter:
+    def __init__(self, lib, hot_threshold=HOT_THRESHOLD, unchecked_alloc=False, bounds_checks=False,
+                 cpu='', features='', opt_level=2):
+        # lib: the shared runtime library (ctypes.CDLL). The remaining
+        # arguments are passed on to CodeGen and the JIT for hot code.
+        self.lib = lib
+        self.hot_threshold = hot_threshold
+        self.unchecked_alloc = unchecked_alloc
+        self.bounds_checks = bounds_checks
+        self.cpu = cpu
+        self.features = features
+        self.opt_level = opt_level
+
+        self.functions = {}
+        self.imports = []
+        self.declared = dict(_RUNTIME)
+        # What was compiled to native code, and what could not be
+        self.compiled = []
+        self.failed = []
+        self._engines = []
+        self._strings = {}
+        self._runtime = {}
+        self._loops = 0
+
+    def runtime(self, name, signature=None):
+        # The runtime function name as a ctypes function with its argument
+        # and result types set
+        func = self._runtime.get(name)
+        if func is None:
+            param_types, return_type = signature or self.declared[name]
+            func = getattr(self.lib, name)
+            func.argtypes = [_argument_ctype(param_type) for param_type in param_types]
+            func.restype = _result_ctype(return_type)
+            self._runtime[name] = func
+        return func
+
+    def string_address(self, value):
+        # String constants are NUL-terminated buffers that live as long as
+        # the interpreter
+        buffer = self._strings.get(value)
+        if buffer is None:
+            buffer = self._strings[value] = ctypes.create_string_buffer(value.encode('utf8'))
+        return ctypes.addressof(buffer)
+
+    def run(self, program):
+        # Runs the program's main (the user's, or the top-level statements)
+        # and returns its result
+        statements = []
+        for stmt in program.stmts:
+            if isinstance(stmt, Import):
+                self.import_module(stmt)
+        for stmt in program.stmts:
+            if isinstance(stmt, FunctionDef):
+                self.define(stmt)
+            elif not isinstance(stmt, Import):
+                statements.append(stmt)
+
+        main = self.functions.get('main')
+        if main is None:
+            if not statements:
+                raise Exception("Program has no main function")
+            main = Function(FunctionDef('main', [], 'int', statements))
+            main.call = _Compiler(self, main).entry()
+            # Top-level code is not a function CodeGen can compile on its own
+            main.tried = True
+
+        # The runtime writes straight to fd 1, keep our own output ordered
+        sys.stdout.flush()
+        result = main.call()
+        self.lib.cscript_flush()
+        return result
+
+    def import_module(self, node):
+        declarations = _MODULES.get(node.module)
+        if declarations is None:
+            raise Exception(f"Unknown module: {node.module}")
+        if node not in self.imports:
+            self.imports.append(node)
+            self.declared.update(declarations)
+
+    def define(self, node):
+        function = Function(node)
+        # Registered first so that the body can call itself
+        self.functions[node.name] = function
+        function.call = _Compiler(self, function).entry()
+
+    # Native code
+
+    def _callees(self, names):
+        # The FunctionDefs that calls to names can reach, in definition
+        # order (CodeGen needs a function defined before its callers)
+        pending = list(names)
+        seen = set()
+        while pending:
+            name = pending.pop()
+            if name in seen or name not in self.functions:
+                continue
+            seen.add(name)
+            for node in walk(self.functions[name].node):
+                if isinstance(node, FuncCall):
+                    pending.append(node.name)
+        return [function.node for name, function in self.functions.items() if name in seen]
+
+    def _compile(self, definitions, what):
+        # Generates and JIT-compiles a module with definitions, returns the
+        # execution engine or None if the code is not compilable
+        from . import backend, jit
+        from .codegen import CodeGen
+
+        try:
+            codegen = CodeGen(unchecked_alloc=self.unchecked_alloc, bounds_checks=self.bounds_checks)
+            codegen.generate(Program(self.imports + definitions))
+            mod = backend.parse_module(codegen.module)
+        except Exception:
+            self.failed.append(what)
+            return None
+        engine = jit.compile_module(mod, self.lib, self.cpu, self.features, self.opt_level)
+        self._engines.append(engine)
+        self.compiled.append(what)
+        return engine
+
+    def promote(self, function):
+        # Replaces function.call with native code. Returns False (and keeps
+        # interpreting) if the function cannot be compiled.
+        function.tried = True
+        node = function.node
+        engine = self._compile(self._callees([node.name]), node.name)
+        if engine is None:
+            return False
+        prototype = ctypes.CFUNCTYPE(_result_ctype(node.return_type),
+                                     *[_ctype(param_type) for param_type in function.param_types])
+        function.call = prototype(engine.get_function_address(node.name))
+        return True
+
+    def compile_loop(self, loop):
+        # Sets loop.native to a function of the frame that runs the loop
+        # (from its condition on) in native code
+        loop.tried = True
+        node = loop.node
+        if isinstance(node, (For, ParallelFor)):
+            parts = [node.condition] + node.body + ([node.update] if node.update is not None else [])
+            outlined = For(None, node.condition, node.update, node.body, node.lineno, node.col)
+        else:
+            parts = [node.condition] + node.body
+            outlined = While(node.condition, node.body, node.lineno, node.col)
+
+        declared = set()
+        used = set()
+        indexed = set()
+        calls = set()
+        for part in parts:
+            for child in walk(part):
+                if isinstance(child, Return):
+                    # The loop cannot return from the interpreted function
+                    return
+                if isinstance(child, (VarDecl, ArrayDecl)):
+                    declared.add(child.name)
+                elif isinstance(child, Identifier):
+                    used.add(child.name)
+                elif isinstance(child, ArrayAccess):
+                    used.add(child.name)
+                    indexed.add(child.name)
+                elif isinstance(child, FuncCall):
+                    calls.add(child.name)
+        if declared & loop.vars.keys():
+            # A declaration in the body shadows a variable from outside
+            return
+
+        modified = assigned_names(parts)
+        params = []
+        bindings = []
+        refs = set()
+        for name in sorted(used - declared):
+            var = loop.vars.get(name)
+            if var is None:
+                return
+            if var.kind == 'array':
+                # With bounds checks the array would only be checked as an
+                # unknown pointer
+                if self.bounds_checks:
+                    return
+                how = 'array'
+                param_type = var.type + '*'
+            elif var.kind == 'cell' or name in modified:
+                if name in indexed:
+                    return
+                how = 'ref'
+                param_type = var.type + '*'
+                refs.add(name)
+            else:
+                how = 'value'
+                param_type = var.type
+            params.append((param_type, name))
+            bindings.append((var.slot, how, var.kind == 'cell', _ctype(var.type)))
+
+        self._loops += 1
+        name = f"__loop{self._loops}"
+        function = FunctionDef(name, params, 'int', [_dereferenced(outlined, refs), Return(Number(0))],
+                               node.lineno, node.col)
+        engine = self._compile(self._callees(calls) + [function], f"loop at line {node.lineno}")
+        if engine is None:
+            return
+
+        prototype = ctypes.CFUNCTYPE(ctypes.c_int32, *[_ctype(param_type) for param_type, _ in params])
+        native = prototype(engine.get_function_address(name))
+
+        def run(frame):
+            args = []
+            copies = []
+            for slot, how, is_cell, ctype in bindings:
+                value = frame[slot]
+                if how == 'array':
+                    args.append(ctypes.addressof(value))
+                elif how == 'ref':
+                    if not is_cell:
+                        # Scalars are copied in and out of a temporary cell
+                        value = ctype(value)
+                        copies.append((slot, value))
+                    args.append(ctypes.addressof(value))
+                else:
+                    args.append(value)
+            native(*args)
+            for slot, cell in copies:
+                frame[slot] = cell.value
+
+        loop.native = run
+
+class _Compiler:
+    # Translates one function body into closures that take the frame, a
+    # list with a slot per variable declaration. Statements return None,
+    # or the function's result once a return statement ran.
+    def __init__(self, interp, function):
+        self.interp = interp
+        self.lib = interp.lib
+        self.function = function
+        self.vars = {}
+        self.nslots = 0
+        # Variables whose address is taken live in ctypes cells
+        self.addressed = set()
+        for stmt in function.node.body:
+            for node in walk(stmt):
+                if isinstance(node, UnaryOp) and node.op == '&' and isinstance(node.operand, Identifier):
+                    self.addressed.add(node.operand.name)
+
+        self._statements = {
+            VarDecl: self.compile_vardecl,
+            ArrayDecl: self.compile_arraydecl,
+            Assign: self.compile_assign,
+            If: self.compile_if,
+            While: self.compile_while,
+            For: self.compile_for,
+            ParallelFor: self.compile_parallelfor,
+            Return: self.compile_return,
+        }
+        self._expressions = {
+            Number: self.compile_number,
+            String: self.compile_string,
+            Identifier: self.compile_identifier,
+            BinOp: self.compile_binop,
+            UnaryOp: self.compile_unaryop,
+            FuncCall: self.compile_funccall,
+            ArrayAccess: self.compile_arrayaccess,
+        }
+
+    def declare(self, name, var_type, kind=None, size=0):
+        if kind is None:
+            kind = 'cell' if name in self.addressed else 'value'
+        var = self.vars[name] = Var(self.nslots, var_type, kind, size)
+        self.nslots += 1
+        return var
+
+    def lookup(self, name):
+        var = self.vars.get(name)
+        if var is None:
+            raise Exception(f"Undefined variable {name}")
+        return var
+
+    def entry(self):
+        # The interpreted entry point of the function: called with the
+        # (already converted) arguments, returns the result
+        node = self.function.node
+        params = [self.declare(name, param_type) for param_type, name in node.params]
+        body = self.block(node.body)
+        nslots = self.nslots
+        cells = [(var.slot, _ctype(var.type)) for var in params if var.kind == 'cell']
+        function = self.function
+        interp = self.interp
+        threshold = interp.hot_threshold
+
+        def invoke(*args):
+            function.count += 1
+            if function.count > threshold and not function.tried and interp.promote(function):
+                return function.call(*args)
+            frame = [*args, *[None] * (nslots - len(args))]
+            for slot, ctype in cells:
+                frame[slot] = ctype(frame[slot])
+            result = body(frame)
+            return 0 if result is None else result
+        return invoke
+
+    # Statements
+
+    def block(self, stmts):
+        fns = [self.statement(stmt) for stmt in stmts]
+        if not fns:
+            return lambda frame: None
+        if len(fns) == 1:
+            return fns[0]
+
+        def run(frame):
+            for fn in fns:
+                result = fn(frame)
+                if result is not None:
+                    return result
+        return run
+
+    def statement(self, node):
+        method = self._statements.get(node.__class__)
+        if method is not None:
+            return method(node)
+        if isinstance(node, (FunctionDef, Import)):
+            raise Exception(f"{node.__class__.__name__} is only allowed at the top level")
+        # Expression statement, evaluated for its side effects
+        value, _ = self.expression(node)
+
+        def run(frame):
+            value(frame)
+        return run
+
+    def compile_vardecl(self, node):
+        var = self.declare(node.name, node.var_type)
+        # Like CodeGen, the new variable is already in scope in its own
+        # initializer
+        value = self.converted(node.value, node.var_type)
+        slot = var.slot
+        if var.kind == 'cell':
+            ctype = _ctype(node.var_type)
+
+            def run(frame):
+                cell = frame[slot]
+                if cell is None:
+                    frame[slot] = ctype(value(frame))
+                else:
+                    cell.value = value(frame)
+            return run
+
+        def run(frame):
+            frame[slot] = value(frame)
+        return run
+
+    def compile_arraydecl(self, node):
+        var = self.declare(node.name, node.var_type, 'array', node.size)
+        slot = var.slot
+        array_type = _ctype(node.var_type) * node.size
+
+        def run(frame):
+            # A loop reuses the array of its previous iteration
+            if frame[slot] is None:
+                frame[slot] = array_type()
+        return run
+
+    def compile_assign(self, node):
+        target = node.target
+        if isinstance(target, Identifier):
+            var = self.lookup(target.name)
+            value = self.converted(node.value, var.type)
+            slot = var.slot
+            if var.kind == 'array':
+                raise Exception("Invalid lvalue for assignment")
+            if var.kind == 'cell':
+                def run(frame):
+                    frame[slot].value = value(frame)
+                return run
+
+            def run(frame):
+                frame[slot] = value(frame)
+            return run
+
+        if isinstance(target, UnaryOp) and target.op == '*':
+            address, pointer_type = self.expression(target.operand)
+            return self._store(address, self._pointee(pointer_type), node, target)
+
+        if isinstance(target, ArrayAccess):
+            var = self.lookup(target.name)
+            if var.kind == 'array':
+                index = self.converted(target.index, 'int')
+                value = self.converted(node.value, var.type)
+                slot = var.slot
+                size = var.size
+                line = target.lineno
+                fail = self.interp.runtime('cscript_bounds_fail', (['int', 'int', 'int'], 'void'))
+
+                def run(frame):
+                    i = index(frame)
+                    if not 0 <= i < size:
+                        fail(i, size, line)
+                    frame[slot][i] = value(frame)
+                return run
+            address, pointer_type = self.compile_identifier(target)
+            return self._store(address, self._pointee(pointer_type), node, target, target.index)
+
+        raise Exception("Invalid lvalue for assignment")
+
+    def _store(self, address, elem_type, node, target, index=None):
+        # *address = value, or address[index] = value
+        locate, ctype = self._element(address, elem_type, target, index)
+        value = self.converted(node.value, elem_type)
+
+        def run(frame):
+            ctype.from_address(locate(frame)).value = value(frame)
+        return run
+
+    def compile_if(self, node):
+        test = self.condition(node.condition)
+        then_body = self.block(node.then_body)
+        else_body = self.block(node.else_body or [])
+
+        def run(frame):
+            if test(frame):
+                return then_body(frame)
+            return else_body(frame)
+        return run
+
+    def compile_while(self, node):
+        loop = Loop(node, dict(self.vars))
+        test = self.condition(node.condition)
+        body = self.block(node.body)
+        return self._loop(loop, None, test, body, None)
+
+    def compile_for(self, node):
+        init = self.statement(node.init) if node.init is not None else None
+        # The loop starts after its init, which may declare the variable
+        loop = Loop(node, dict(self.vars))
+        test = self.condition(node.condition)
+        body = self.block(node.body)
+        update = self.statement(node.update) if node.update is not None else None
+        return self._loop(loop, init, test, body, update)
+
+    def compile_parallelfor(self, node):
+        # Runs serially: adding to the reduction variable directly gives
+        # the same sum. Compiled functions run it on the thread pool.
+        parallel_induction(node, self.addressed)
+        if node.reduce is not None and self.lookup(node.reduce).type != 'int':
+            raise Exception(f"reduce({node.reduce}) (line {node.lineno}) needs an int variable")
+        return self.compile_for(node)
+
+    def _loop(self, loop, init, test, body, update):
+        function = self.function
+        interp = self.interp
+        threshold = interp.hot_threshold
+
+        def run(frame):
+            if init is not None:
+                init(frame)
+            if loop.native is not None:
+                return loop.native(frame)
+            n = 0
+            # Iterations left until the loop is hot (an inner loop gets
+            # there over several runs)
+            hot = threshold - loop.count
+            while test(frame):
+                result = body(frame)
+                if result is not None:
+                    break
+                if update is not None:
+                    update(frame)
+                n += 1
+                if n == hot and not loop.tried:
+                    interp.compile_loop(loop)
+                    if loop.native is not None:
+                        # On-stack replacement: between two iterations the
+                        # whole state of the loop is in the frame
+                        loop.count += n
+                        function.count += n
+                        return loop.native(frame)
+            else:
+                result = None
+            loop.count += n
+            function.count += n
+            return result
+        return run
+
+    def compile_return(self, node):
+        value = self.converted(node.value, self.function.return_type)
+        return value
+
+    # Expressions
+
+    def expression(self, node):
+        # Returns (closure, type name of its value)
+        method = self._expressions.get(node.__class__)
+        if method is None:
+            raise Exception('No gen_{} method'.format(node.__class__.__name__.lower()))
+        return method(node)
+
+    def converted(self, node, target_type):
+        # The value of node converted to target_type the way CodeGen's
+        # _coerce does (char <-> int, pointers to any pointer or int type)
+        value, value_type = self.expression(node)
+        if value_type == target_type or target_type.endswith('*'):
+            return value
+        if target_type == 'char':
+            if value_type == 'float':
+                return lambda frame: _wrap_char(int(value(frame)))
+            return lambda frame: _wrap_char(value(frame))
+        if target_type == 'int':
+            if value_type == 'float':
+                return lambda frame: wrap_i32(int(value(frame)))
+            if value_type.endswith('*'):
+                return lambda frame: wrap_i32(value(frame))
+            return value
+        if target_type == 'float':
+            return lambda frame: float(value(frame))
+        return value
+
+    def condition(self, node):
+        # A closure whose truth value decides a branch
+        if isinstance(node, BinOp) and node.op in _COMPARISONS:
+            left, left_type = self.expression(node.left)
+            right, right_type = self.expression(node.right)
+            self._arithmetic_type(node.op, left_type, right_type)
+            return _comparison(node.op, left, right)
+        value, _ = self.expression(node)
+        return value
+
+    def compile_number(self, node):
+        value = wrap_i32(node.value)
+        return (lambda frame: value), 'int'
+
+    def compile_string(self, node):
+        address = self.interp.string_address(node.value)
+        return (lambda frame: address), 'char*'
+
+    def compile_identifier(self, node):
+        var = self.lookup(node.name)
+        slot = var.slot
+        if var.kind == 'array':
+            # An array evaluates to a pointer to its first element
+            return (lambda frame: ctypes.addressof(frame[slot])), var.type + '*'
+        if var.kind == 'cell':
+            return (lambda frame: frame[slot].value), var.type
+        return itemgetter(slot), var.type
+
+    def _arithmetic_type(self, op, left_type, right_type):
+        if left_type.endswith('*') or right_type.endswith('*'):
+            raise Exception(f"Invalid operands to {op}: {left_type} and {right_type}")
+        if 'float' in (left_type, right_type):
+            return 'float'
+        if left_type == right_type == 'char':
+            return 'char'
+        return 'int'
+
+    def compile_binop(self, node):
+        op = node.op
+        left, left_type = self.expression(node.left)
+        right, right_type = self.expression(node.right)
+        result_type = self._arithmetic_type(op, left_type, right_type)
+
+        if op in _COMPARISONS:
+            test = _comparison(op, left, right)
+            return (lambda frame: 1 if test(frame) else 0), 'int'
+        if result_type == 'float':
+            return _float_arithmetic(op, left, right), 'float'
+
+        if op == '/':
+            lib = self.lib
+            line = node.lineno
+
+            def value(frame):
+                divisor = right(frame)
+                if not divisor:
+                    _runtime_error(lib, "division by zero", line)
+                return _sdiv(left(frame), divisor)
+        elif op in ('+', '-') and isinstance(node.right, Number):
+            constant = wrap_i32(node.right.value)
+            value = _add_constant(left, constant if op == '+' else -constant)
+        else:
+            value = _arithmetic(op, left, right)
+
+        if result_type == 'char':
+            # char op char stays a char
+            wide = value
+            return (lambda frame: _wrap_char(wide(frame))), 'char'
+        return value, 'int'
+
+    def _pointee(self, pointer_type):
+        if not pointer_type.endswith('*'):
+            raise Exception(f"Cannot dereference a value of type {pointer_type}")
+        return pointer_type[:-1]
+
+    def _pointer_check(self):
+        # cscript_check_index with --bounds-checks, None otherwise
+        if not self.interp.bounds_checks:
+            return None
+        return self.interp.runtime('cscript_check_index', (['char*', 'int', 'int', 'int'], 'void'))
+
+    def _element(self, address, elem_type, node, index=None):
+        # A closure for the address of address[index] (of *address without
+        # an index), null or bounds checked, and the element's ctype
+        ctype = _ctype(elem_type)
+        size = ctypes.sizeof(ctype)
+        check = self._pointer_check()
+        lib = self.lib
+        line = node.lineno
+
+        if index is None or isinstance(index, Number):
+            offset = 0 if index is None else wrap_i32(index.value)
+
+            def locate(frame):
+                base = address(frame)
+                if check is not None:
+                    check(base, offset, size, line)
+                elif not base:
+                    _runtime_error(lib, "null pointer dereference", line)
+                return base + offset * size
+            return locate, ctype
+
+        index = self.converted(index, 'int')
+
+        def locate(frame):
+            base = address(frame)
+            i = index(frame)
+            if check is not None:
+                check(base, i, size, line)
+            elif not base:
+                _runtime_error(lib, "null pointer dereference", line)
+            return base + i * size
+        return locate, ctype
+
+    def _load(self, address, elem_type, node, index=None):
+        # The value at address[index], or at *address
+        locate, ctype = self._element(address, elem_type, node, index)
+        return (lambda frame: ctype.from_address(locate(frame)).value), elem_type
+
+    def compile_unaryop(self, node):
+        operand = node.operand
+        if node.op == '&':
+            if isinstance(operand, Identifier):
+                var = self.lookup(operand.name)
+                slot = var.slot
+                if var.kind == 'value':
+                    raise Exception(f"Cannot take the address of {operand.name}")
+                return (lambda frame: ctypes.addressof(frame[slot])), var.type + '*'
+            if isinstance(operand, UnaryOp) and operand.op == '*':
+                # &(*p) -> p
+                return self.expression(operand.operand)
+            raise Exception("Cannot take address of rvalue")
+
+        address, pointer_type = self.expression(operand)
+        return self._load(address, self._pointee(pointer_type), node)
+
+    def compile_arrayaccess(self, node):
+        var = self.lookup(node.name)
+        if var.kind != 'array':
+            address, pointer_type = self.compile_identifier(node)
+            return self._load(address, self._pointee(pointer_type), node, node.index)
+
+        index = self.converted(node.index, 'int')
+
+        slot = var.slot
+        size = var.size
+        line = node.lineno
+        fail = self.interp.runtime('cscript_bounds_fail', (['int', 'int', 'int'], 'void'))
+
+        def value(frame):
+            i = index(frame)
+            if not 0 <= i < size:
+                fail(i, size, line)
+            return frame[slot][i]
+        return value, var.type
+
+    def compile_funccall(self, node):
+        name = node.name
+        interp = self.interp
+        if name == 'print':
+            return self._call_print(node)
+        if name in ('malloc', 'free'):
+            suffix = '_unchecked' if interp.unchecked_alloc else ''
+            if name == 'malloc':
+                return self._runtime_call(node, 'cscript_malloc' + suffix, (['int'], 'char*'))
+            return self._runtime_call(node, 'cscript_free' + suffix, (['char*'], 'int'))
+        if name in _BULK and name not in interp.functions:
+            return self._call_bulk(node)
+        builtin = _BUILTINS.get(name)
+        if builtin is not None:
+            runtime_name, module = builtin
+            if module is not None and runtime_name not in interp.declared:
+                raise Exception(f"{name} requires 'import {module}'")
+            return self._runtime_call(node, runtime_name, interp.declared[runtime_name])
+
+        function = interp.functions.get(name)
+        if function is not None:
+            args = self._arguments(node, function.param_types)
+            return self._user_call(function, args), function.return_type
+        if name in interp.declared:
+            return self._runtime_call(node, name, interp.declared[name])
+        raise Exception(f"Function {name} not defined")
+
+    def _call_bulk(self, node):
+        # fill(a, v[, n]), copy(dst, src[, n]), sum/min/max(a[, n]) and
+        # dot(a, b[, n]) on ctypes memory, with CodeGen's semantics: the
+        # count defaults to the length of a fixed-size array, a negative
+        # count is 0 and sums wrap
+        name = node.name
+        arrays = 1 if name in ('sum', 'min', 'max') else 2
+        if not arrays <= len(node.args) <= arrays + 1:
+            raise Exception(f"{name} takes {arrays} or {arrays + 1} arguments (line {node.lineno})")
+        first, elem_type, length = self._bulk_array(node, node.args[0])
+        count = self._bulk_count(node, arrays, length)
+        ctype = _ctype(elem_type)
+        checked = [self._bulk_extent(node, elem_type, length)]
+
+        if name == 'fill':
+            if elem_type not in _CTYPES:
+                raise Exception(f"fill needs an int, char or float array (line {node.lineno})")
+            value = self.converted(node.args[1], elem_type)
+
+            def run(frame):
+                base = first(frame)
+                n = count(frame)
+                checked[0](base, n)
+                (ctype * n).from_address(base)[:] = [value(frame)] * n
+            return run, 'void'
+
+        if name == 'copy':
+            second, src_type, src_length = self._bulk_array(node, node.args[1])
+            if src_type != elem_type:
+                raise Exception(f"copy needs arrays of the same element type (line {node.lineno})")
+            check_src = self._bulk_extent(node, src_type, src_length)
+            size = ctypes.sizeof(ctype)
+
+            def run(frame):
+                dst = first(frame)
+                src = second(frame)
+                n = count(frame)
+                checked[0](dst, n)
+                check_src(src, n)
+                ctypes.memmove(dst, src, n * size)
+            return run, 'void'
+
+        if elem_type not in ('int', 'char'):
+            raise Exception(f"{name} needs an int or char array (line {node.lineno})")
+        if name == 'dot':
+            second, other_type, other_length = self._bulk_array(node, node.args[1])
+            if other_type not in ('int', 'char'):
+                raise Exception(f"dot needs an int or char array (line {node.lineno})")
+            other_ctype = _ctype(other_type)
+            check_other = self._bulk_extent(node, other_type, other_length)
+
+            def value(frame):
+                a = first(frame)
+                b = second(frame)
+                n = count(frame)
+                checked[0](a, n)
+                check_other(b, n)
+                return wrap_i32(sum(x * y for x, y in zip((ctype * n).from_address(a),
+                                                          (other_ctype * n).from_address(b))))
+            return value, 'int'
+
+        reduce = {'sum': lambda values: wrap_i32(sum(values)),
+                  'min': lambda values: min(values, default=INT_MAX),
+                  'max': lambda values: max(values, default=INT_MIN)}[name]
+
+        def value(frame):
+            base = first(frame)
+            n = count(frame)
+            checked[0](base, n)
+            return reduce((ctype * n).from_address(base))
+        return value, 'int'
+
+    def _bulk_array(self, node, arg):
+        # (address closure, element type, length of a fixed-size array or None)
+        address, value_type = self.expression(arg)
+        if not value_type.endswith('*'):
+            raise Exception(f"{node.name} needs an array or a pointer (line {node.lineno})")
+        length = None
+        if isinstance(arg, Identifier):
+            var = self.lookup(arg.name)
+            if var.kind == 'array':
+                length = var.size
+        return address, value_type[:-1], length
+
+    def _bulk_count(self, node, index, length):
+        if len(node.args) <= index:
+            if length is None:
+                raise Exception(f"{node.name} needs an element count for a pointer (line {node.lineno})")
+            return lambda frame: length
+        count = self.converted(node.args[index], 'int')
+        return lambda frame: max(count(frame), 0)
+
+    def _bulk_extent(self, node, elem_type, length):
+        # A function of (address, count) that stops the program unless
+        # elements [0, count) exist, like CodeGen's checks
+        lib = self.lib
+        line = node.lineno
+        if not self.interp.bounds_checks:
+            def check(base, n):
+                if n > 0 and not base:
+                    _runtime_error(lib, "null pointer dereference", line)
+            return check
+        if length is not None:
+            fail = self.interp.runtime('cscript_bounds_fail', (['int', 'int', 'int'], 'void'))
+
+            def check(base, n):
+                if n > length:
+                    fail(n - 1, length, line)
+            return check
+        check_index = self._pointer_check()
+        size = ctypes.sizeof(_ctype(elem_type))
+
+        def check(base, n):
+            if n > 0:
+                check_index(base, n - 1, size, line)
+        return check
+
+    def _arguments(self, node, param_types):
+        if len(node.args) != len(param_types):
+            raise Exception(f"{node.name} takes {len(param_types)} arguments, {len(node.args)} given")
+        return [self.converted(arg, param_type) for arg, param_type in zip(node.args, param_types)]
+
+    def _user_call(self, function, args):
+        # Looks up function.call on every call, promotion replaces it
+        if not args:
+            return lambda frame: function.call()
+        if len(args) == 1:
+            arg, = args
+            return lambda frame: function.call(arg(frame))
+        if len(args) == 2:
+            first, second = args
+            return lambda frame: function.call(first(frame), second(frame))
+        return lambda frame: function.call(*[arg(frame) for arg in args])
+
+    def _runtime_call(self, node, runtime_name, signature):
+        param_types, return_type = signature
+        func = self.interp.runtime(runtime_name, signature)
+        args = self._arguments(node, param_types)
+        if return_type.endswith('*'):
+            # A null pointer comes back as None
+            return (lambda frame: func(*[arg(frame) for arg in args]) or 0), return_type
+        return (lambda frame: func(*[arg(frame) for arg in args])), return_type
+
+    def _call_print(self, node):
+        value, value_type = self.expression(node.args[0])
+        if value_type in ('int', 'char'):
+            func = self.interp.runtime('cscript_print_int')
+        elif value_type == 'float':
+            func = self.interp.runtime('cscript_print_float')
+        else:
+            # Assume string or char*
+            func = self.interp.runtime('cscript_print_string')
+        return (lambda frame: func(value(frame))), 'void'
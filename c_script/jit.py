@@ -0,0 +1,66 @@
+import ctypes
+import sys
+
+from llvmlite import binding as llvm
+
+from . import backend
+
+def load_runtime(path):
+    # Load the shared build of the runtime crate (libruntime.so)
+    return ctypes.CDLL(path)
+
+def _resolve_declarations(mod, lib):
+    # Register every runtime function the module declares with the JIT's
+    # symbol resolver
+    for func in mod.functions:
+        if not func.is_declaration or func.name.startswith('llvm.'):
+            continue
+        try:
+            symbol = getattr(lib, func.name)
+        except AttributeError:
+            raise Exception(f"Runtime does not export {func.name}")
+        llvm.add_symbol(func.name, ctypes.cast(symbol, ctypes.c_void_p).value)
+
+def compile_module(mod, lib, cpu='', features='', opt_level=0):
+    # Resolve mod's runtime declarations against lib, optimize it and
+    # compile it with MCJIT. Returns the execution engine, which has to be
+    # kept alive for as long as its code may run.
+    _resolve_declarations(mod, lib)
+    target_machine = backend.create_target_machine(
+        triple=mod.triple or None, cpu=cpu, features=features, reloc='default',
+        codemodel='jitdefault', opt=opt_level)
+    backend.optimize(mod, target_machine, opt_level)
+    engine = llvm.create_mcjit_compiler(mod, target_machine)
+    engine.finalize_object()
+    return engine
+
+def load(modules, runtime_path, cpu='', features='', opt_level=0):
+    # Compile the modules (separate compilation units are linked together
+    # first) with MCJIT. Returns the engine and the runtime library.
+    mod = backend.parse_module(modules[0])
+    for module in modules[1:]:
+        mod.link_in(backend.parse_module(module))
+    lib = load_runtime(runtime_path)
+    return compile_module(mod, lib, cpu, features, opt_level), lib
+
+def execute(engine, lib):
+    # Call main() of a loaded program in this process
+    engine.run_static_constructors()
+
+    main_addr = engine.get_function_address("main")
+    if not main_addr:
+        raise Exception("Program has no main function")
+    main = ctypes.CFUNCTYPE(ctypes.c_int)(main_addr)
+
+    # The runtime writes straight to fd 1, keep our own output ordered
+    sys.stdout.flush()
+    result = main()
+    # Prints are buffered in the runtime, which only flushes by itself when
+    # the process exits
+    lib.cscript_flush()
+    engine.run_static_destructors()
+    return result
+
+def run(modules, runtime_path, cpu='', features='', opt_level=0):
+    engine, lib = load(modules, runtime_path, cpu, features, opt_level)
+    return execute(engine, lib)
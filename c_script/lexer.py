@@ -1,4 +1,3 @@
-import ply.lex as lex
 import codecs
 
 # List of token names.
@@ -93,7 +92,11 @@ def t_ID(t):
 
 def t_STRING(t):
     r'"[^"]*"'
-    t.value = codecs.escape_decode(bytes(t.value[1:-1], "utf-8"))[0].decode("utf-8")
+    value = t.value[1:-1]
+    # Only strings that contain escapes need the (much slower) decoder
+    if '\\' in value:
+        value = codecs.escape_decode(bytes(value, "utf-8"))[0].decode("utf-8")
+    t.value = value
     return t
 
 # A regular expression rule with some action code
@@ -115,5 +118,18 @@ def t_error(t):
     print("Illegal character '%s'" % t.value[0])
     t.lexer.skip(1)
 
-# Build the lexer
-lexer = lex.lex()
+# The lexer is built on first use, so importing this module (for example
+# for `tokens`) stays cheap
+_lexer = None
+
+def get_lexer():
+    global _lexer
+    if _lexer is None:
+        import ply.lex as lex
+        _lexer = lex.lex()
+    return _lexer
+
+def __getattr__(name):
+    if name == 'lexer':
+        return get_lexer()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,86 +1,209 @@
-class Number:
-    def __init__(self, value):
+# AST node classes. Nodes use __slots__ to stay compact on large programs;
+# every node also records the line and column (both 1-based, 0 if unknown)
+# of the token it was built from.
+
+class Node:
+    __slots__ = ('lineno', 'col')
+
+class Number(Node):
+    __slots__ = ('value',)
+
+    def __init__(self, value, lineno=0, col=0):
         self.value = value
+        self.lineno = lineno
+        self.col = col
+
+class String(Node):
+    __slots__ = ('value',)
 
-class String:
-    def __init__(self, value):
+    def __init__(self, value, lineno=0, col=0):
         self.value = value
+        self.lineno = lineno
+        self.col = col
 
-class Identifier:
-    def __init__(self, name):
+class Identifier(Node):
+    __slots__ = ('name',)
+
+    def __init__(self, name, lineno=0, col=0):
         self.name = name
+        self.lineno = lineno
+        self.col = col
+
+class BinOp(Node):
+    __slots__ = ('left', 'op', 'right')
 
-class BinOp:
-    def __init__(self, left, op, right):
+    def __init__(self, left, op, right, lineno=0, col=0):
         self.left = left
         self.op = op
         self.right = right
+        self.lineno = lineno
+        self.col = col
+
+class UnaryOp(Node):
+    __slots__ = ('op', 'operand')
 
-class UnaryOp:
-    def __init__(self, op, operand):
+    def __init__(self, op, operand, lineno=0, col=0):
         self.op = op
         self.operand = operand
+        self.lineno = lineno
+        self.col = col
 
-class FuncCall:
-    def __init__(self, name, args):
+class FuncCall(Node):
+    __slots__ = ('name', 'args')
+
+    def __init__(self, name, args, lineno=0, col=0):
         self.name = name
         self.args = args
+        self.lineno = lineno
+        self.col = col
+
+class VarDecl(Node):
+    __slots__ = ('var_type', 'name', 'value')
 
-class VarDecl:
-    def __init__(self, var_type, name, value):
+    def __init__(self, var_type, name, value, lineno=0, col=0):
         self.var_type = var_type
         self.name = name
         self.value = value
+        self.lineno = lineno
+        self.col = col
+
+class ArrayDecl(Node):
+    __slots__ = ('var_type', 'name', 'size')
 
-class ArrayDecl:
-    def __init__(self, var_type, name, size):
+    def __init__(self, var_type, name, size, lineno=0, col=0):
         self.var_type = var_type
         self.name = name
         self.size = size
+        self.lineno = lineno
+        self.col = col
 
-class ArrayAccess:
-    def __init__(self, name, index):
+class ArrayAccess(Node):
+    __slots__ = ('name', 'index')
+
+    def __init__(self, name, index, lineno=0, col=0):
         self.name = name
         self.index = index
+        self.lineno = lineno
+        self.col = col
+
+class Assign(Node):
+    __slots__ = ('target', 'value')
 
-class Assign:
-    def __init__(self, target, value):
+    def __init__(self, target, value, lineno=0, col=0):
         self.target = target
         self.value = value
+        self.lineno = lineno
+        self.col = col
+
+class If(Node):
+    __slots__ = ('condition', 'then_body', 'else_body')
 
-class If:
-    def __init__(self, condition, then_body, else_body=None):
+    def __init__(self, condition, then_body, else_body=None, lineno=0, col=0):
         self.condition = condition
         self.then_body = then_body
         self.else_body = else_body
+        self.lineno = lineno
+        self.col = col
 
-class While:
-    def __init__(self, condition, body):
+class While(Node):
+    __slots__ = ('condition', 'body')
+
+    def __init__(self, condition, body, lineno=0, col=0):
+        self.condition = condition
+        self.body = body
+        self.lineno = lineno
+        self.col = col
+
+class For(Node):
+    __slots__ = ('init', 'condition', 'update', 'body')
+
+    def __init__(self, init, condition, update, body, lineno=0, col=0):
+        self.init = init
         self.condition = condition
+        self.update = update
         self.body = body
+        self.lineno = lineno
+        self.col = col
+
+class ParallelFor(Node):
+    # parallel for (int i = a; i < b; i = i + 1) [reduce(name)] { body }.
+    # reduce is the int variable the iterations add to, or None
+    __slots__ = ('init', 'condition', 'update', 'body', 'reduce')
 
-class For:
-    def __init__(self, init, condition, update, body):
+    def __init__(self, init, condition, update, body, reduce=None, lineno=0, col=0):
         self.init = init
         self.condition = condition
         self.update = update
         self.body = body
+        self.reduce = reduce
+        self.lineno = lineno
+        self.col = col
+
+class FunctionDef(Node):
+    __slots__ = ('name', 'params', 'return_type', 'body')
 
-class FunctionDef:
-    def __init__(self, name, params, return_type, body):
+    def __init__(self, name, params, return_type, body, lineno=0, col=0):
         self.name = name
         self.params = params
         self.return_type = return_type
         self.body = body
+        self.lineno = lineno
+        self.col = col
 
-class Return:
-    def __init__(self, value):
+class Return(Node):
+    __slots__ = ('value',)
+
+    def __init__(self, value, lineno=0, col=0):
         self.value = value
+        self.lineno = lineno
+        self.col = col
+
+class Import(Node):
+    __slots__ = ('module',)
 
-class Import:
-    def __init__(self, module):
+    def __init__(self, module, lineno=0, col=0):
         self.module = module
+        self.lineno = lineno
+        self.col = col
+
+class Program(Node):
+    __slots__ = ('stmts',)
 
-class Program:
-    def __init__(self, stmts):
+    def __init__(self, stmts, lineno=0, col=0):
         self.stmts = stmts
+        self.lineno = lineno
+        self.col = col
+
+_fields = {}
+
+def _child_fields(cls):
+    fields = _fields.get(cls)
+    if fields is None:
+        fields = _fields[cls] = tuple(name for base in cls.__mro__[:-2] for name in base.__slots__)
+    return fields
+
+def fields(node):
+    # (name, value) of each field of node, everything but its position
+    for name in _child_fields(node.__class__):
+        yield name, getattr(node, name)
+
+def iter_child_nodes(node):
+    # Direct children of a node, in field order (statement lists included)
+    for name in _child_fields(node.__class__):
+        value = getattr(node, name)
+        if isinstance(value, Node):
+            yield value
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, Node):
+                    yield item
+
+def walk(node):
+    # node and all of its descendants, depth first
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        children = list(iter_child_nodes(node))
+        children.reverse()
+        stack.extend(children)
@@ -1,19 +1,34 @@
-import ply.yacc as yacc
+from .lexer import tokens, get_lexer
+from .nodes import Number, BinOp, Program, FuncCall, String, VarDecl, Assign, Identifier, If, While, For, ParallelFor, FunctionDef, Return, Import, UnaryOp, ArrayDecl, ArrayAccess
 
-from .lexer import tokens
-from .nodes import Number, BinOp, Program, FuncCall, String, VarDecl, Assign, Identifier, If, While, For, FunctionDef, Return, Import, UnaryOp, ArrayDecl, ArrayAccess
+def _pos(p, n):
+    # (line, column) of the n-th symbol of the production. Only tokens, and
+    # nonterminals whose rule called set_lineno/set_lexpos, have a position.
+    lexpos = p.lexpos(n)
+    line_start = p.lexer.lexdata.rfind('\n', 0, lexpos) + 1
+    return p.lineno(n), lexpos - line_start + 1
+
+def _expect_word(p, n, word):
+    # For contextual keywords, which the lexer returns as IDs: anything
+    # else is a syntax error like those p_error reports, and SyntaxError
+    # puts the parser into its error recovery
+    if p[n] != word:
+        _syntax_error(f"Syntax error at '{p[n]}', line {p.lineno(n)}")
+        raise SyntaxError
 
 def p_program(p):
     'program : statement_list'
-    p[0] = Program(p[1])
+    p[0] = Program(p[1], 1, 1)
 
 def p_statement_list(p):
     '''statement_list : statement_list statement
                       | statement'''
+    # Appending in place keeps long blocks linear, p[1] is not used again
     if len(p) == 2:
         p[0] = [p[1]]
     else:
-        p[0] = p[1] + [p[2]]
+        p[1].append(p[2])
+        p[0] = p[1]
 
 def p_statement(p):
     '''statement : var_declaration
@@ -22,6 +37,7 @@ def p_statement(p):
                  | if_statement
                  | while_statement
                  | for_statement
+                 | parallel_for_statement
                  | return_statement
                  | function_definition
                  | import_statement'''
@@ -29,10 +45,11 @@ def p_statement(p):
 
 def p_import_statement(p):
     'import_statement : IMPORT ID'
-    p[0] = Import(p[2])
+    p[0] = Import(p[2], *_pos(p, 1))
+
 def p_function_definition(p):
     'function_definition : DEF ID LPAREN parameters RPAREN ARROW type block'
-    p[0] = FunctionDef(p[2], p[4], p[7], p[8])
+    p[0] = FunctionDef(p[2], p[4], p[7], p[8], *_pos(p, 1))
 
 def p_parameters(p):
     '''parameters : parameters COMMA parameter
@@ -43,7 +60,8 @@ def p_parameters(p):
     elif len(p) == 2:
         p[0] = [p[1]]
     else:
-        p[0] = p[1] + [p[3]]
+        p[1].append(p[3])
+        p[0] = p[1]
 
 def p_parameter(p):
     'parameter : type ID'
@@ -51,7 +69,7 @@ def p_parameter(p):
 
 def p_return_statement(p):
     'return_statement : RETURN expression SEMI'
-    p[0] = Return(p[2])
+    p[0] = Return(p[2], *_pos(p, 1))
 
 def p_block(p):
     'block : LCURLY statement_list RCURLY'
@@ -61,17 +79,29 @@ def p_if_statement(p):
     '''if_statement : IF LPAREN expression RPAREN block
                     | IF LPAREN expression RPAREN block ELSE block'''
     if len(p) == 6:
-        p[0] = If(p[3], p[5])
+        p[0] = If(p[3], p[5], None, *_pos(p, 1))
     else:
-        p[0] = If(p[3], p[5], p[7])
+        p[0] = If(p[3], p[5], p[7], *_pos(p, 1))
 
 def p_while_statement(p):
     'while_statement : WHILE LPAREN expression RPAREN block'
-    p[0] = While(p[3], p[5])
+    p[0] = While(p[3], p[5], *_pos(p, 1))
 
 def p_for_statement(p):
     'for_statement : FOR LPAREN for_init expression SEMI assignment_no_semi RPAREN block'
-    p[0] = For(p[3], p[4], p[6], p[8])
+    p[0] = For(p[3], p[4], p[6], p[8], *_pos(p, 1))
+
+def p_parallel_for_statement(p):
+    # parallel and reduce are only keywords here, so they stay usable as
+    # names everywhere else
+    '''parallel_for_statement : ID FOR LPAREN for_init expression SEMI assignment_no_semi RPAREN block
+                              | ID FOR LPAREN for_init expression SEMI assignment_no_semi RPAREN ID LPAREN ID RPAREN block'''
+    _expect_word(p, 1, 'parallel')
+    if len(p) == 10:
+        p[0] = ParallelFor(p[4], p[5], p[7], p[9], None, *_pos(p, 1))
+    else:
+        _expect_word(p, 9, 'reduce')
+        p[0] = ParallelFor(p[4], p[5], p[7], p[13], p[11], *_pos(p, 1))
 
 def p_for_init(p):
     '''for_init : assignment
@@ -80,19 +110,20 @@ def p_for_init(p):
 
 def p_assignment_no_semi(p):
     'assignment_no_semi : expression EQUALS expression'
-    p[0] = Assign(p[1], p[3])
+    p[0] = Assign(p[1], p[3], p[1].lineno, p[1].col)
 
 def p_var_declaration(p):
     '''var_declaration : type ID EQUALS expression SEMI
                        | type ID SEMI
                        | type ID LBRACKET NUMBER RBRACKET SEMI'''
+    lineno, col = _pos(p, 2)
     if len(p) == 6:
-        p[0] = VarDecl(p[1], p[2], p[4])
+        p[0] = VarDecl(p[1], p[2], p[4], lineno, col)
     elif len(p) == 7:
-        p[0] = ArrayDecl(p[1], p[2], p[4])
+        p[0] = ArrayDecl(p[1], p[2], p[4], lineno, col)
     else:
         # Uninitialized variable, default to 0
-        p[0] = VarDecl(p[1], p[2], Number(0))
+        p[0] = VarDecl(p[1], p[2], Number(0, lineno, col), lineno, col)
 
 def p_type(p):
     '''type : INT
@@ -106,11 +137,11 @@ def p_type(p):
 
 def p_assignment(p):
     'assignment : expression EQUALS expression SEMI'
-    p[0] = Assign(p[1], p[3])
+    p[0] = Assign(p[1], p[3], p[1].lineno, p[1].col)
 
 def p_expression_func_call(p):
     'expression : func_name LPAREN arg_list RPAREN'
-    p[0] = FuncCall(p[1], p[3])
+    p[0] = FuncCall(p[1], p[3], *_pos(p, 1))
 
 def p_func_name(p):
     '''func_name : PRINT
@@ -120,6 +151,9 @@ def p_func_name(p):
                  | FCLOSE
                  | ID'''
     p[0] = p[1]
+    # Let the call node report the position of the function name
+    p.set_lineno(0, p.lineno(1))
+    p.set_lexpos(0, p.lexpos(1))
 
 def p_arg_list(p):
     '''arg_list : arg_list COMMA expression
@@ -130,7 +164,8 @@ def p_arg_list(p):
     elif len(p) == 2:
         p[0] = [p[1]]
     else:
-        p[0] = p[1] + [p[3]]
+        p[1].append(p[3])
+        p[0] = p[1]
 
 precedence = (
     ('left', 'EQ', 'NOT_EQ'),
@@ -152,7 +187,7 @@ def p_expression_binop(p):
                   | expression GREATER_EQ expression
                   | expression EQ expression
                   | expression NOT_EQ expression'''
-    p[0] = BinOp(p[1], p[2], p[3])
+    p[0] = BinOp(p[1], p[2], p[3], *_pos(p, 2))
 
 def p_expression_group(p):
     'expression : LPAREN expression RPAREN'
@@ -160,31 +195,173 @@ def p_expression_group(p):
 
 def p_expression_number(p):
     'expression : NUMBER'
-    p[0] = Number(p[1])
+    p[0] = Number(p[1], *_pos(p, 1))
 
 def p_expression_string(p):
     'expression : STRING'
-    p[0] = String(p[1])
+    p[0] = String(p[1], *_pos(p, 1))
 
 def p_expression_unaryop(p):
     '''expression : AMPERSAND expression %prec UNARY
                   | TIMES expression %prec UNARY'''
-    p[0] = UnaryOp(p[1], p[2])
+    p[0] = UnaryOp(p[1], p[2], *_pos(p, 1))
 
 def p_expression_array_access(p):
     'expression : ID LBRACKET expression RBRACKET'
-    p[0] = ArrayAccess(p[1], p[3])
+    p[0] = ArrayAccess(p[1], p[3], *_pos(p, 1))
 
 def p_expression_id(p):
     'expression : ID'
-    p[0] = Identifier(p[1])
+    p[0] = Identifier(p[1], *_pos(p, 1))
+
+# Syntax errors reported during the current parse. The parser recovers to
+# report as many as it can, but a program with any of them is not returned.
+_syntax_errors = 0
+
+def _syntax_error(message):
+    global _syntax_errors
+    _syntax_errors += 1
+    print(message)
 
 # Error rule for syntax errors
 def p_error(p):
     if p:
-        print(f"Syntax error at '{p.value}', line {p.lineno}")
+        _syntax_error(f"Syntax error at '{p.value}', line {p.lineno}")
     else:
-        print("Syntax error at EOF")
+        _syntax_error("Syntax error at EOF")
+
+# The LALR tables are shipped precomputed in parsetab.py next to this module
+# (regenerate them with `just parsetab` after changing the grammar). PLY
+# still compares the grammar signature against them, so stale tables are
+# rebuilt in memory instead of being used; nothing is written at runtime.
+_parser = None
+
+def build_parser(write_tables=False):
+    import ply.yacc as yacc
+    return yacc.yacc(start='program', debug=False, write_tables=write_tables)
+
+def get_parser():
+    global _parser
+    if _parser is None:
+        _parser = build_parser()
+    return _parser
+
+def parse(data):
+    # Parse a whole program, with line numbers starting over at 1
+    global _syntax_errors
+    lexer = get_lexer()
+    lexer.lineno = 1
+    _syntax_errors = 0
+    program = get_parser().parse(data, lexer=lexer)
+    return None if _syntax_errors else program
+
+class TokenStream:
+    # Stands in for the lexer when the tokens were produced beforehand, so
+    # that lexing and parsing can be timed separately. The parser only
+    # needs token() and the source text (for column numbers).
+    def __init__(self, toks, lexdata):
+        self.lexdata = lexdata
+        self._next = iter(toks).__next__
+
+    def token(self):
+        try:
+            return self._next()
+        except StopIteration:
+            return None
+
+def tokenize(data):
+    # All tokens of a program, with line numbers starting at 1
+    lexer = get_lexer()
+    lexer.lineno = 1
+    lexer.input(data)
+    return list(iter(lexer.token, None))
+
+def parse_tokens(toks, data):
+    # parse() for the output of tokenize(data)
+    global _syntax_errors
+    _syntax_errors = 0
+    program = get_parser().parse(lexer=TokenStream(toks, data))
+    return None if _syntax_errors else program
+
+def _parse_statements(toks, data):
+    program = parse_tokens(toks, data)
+    return None if program is None else program.stmts
+
+def iter_statements(data):
+    # Parses a program one top-level statement at a time: tokens are read
+    # lazily and every statement is parsed as soon as its last token is
+    # seen, so a caller can process and drop it before the rest of the
+    # program is read. Yields None (after reporting it) on a syntax error.
+    lexer = get_lexer()
+    lexer.lineno = 1
+    lexer.input(data)
+    toks = []
+    depth = 0
+    # A '}' that closed a statement, which an ELSE may still continue
+    closed = False
+    for tok in iter(lexer.token, None):
+        if closed:
+            closed = False
+            if tok.type != 'ELSE':
+                stmts = _parse_statements(toks, data)
+                if stmts is None:
+                    yield None
+                    return
+                yield from stmts
+                toks = []
+        toks.append(tok)
+        kind = tok.type
+        if kind in ('LPAREN', 'LCURLY'):
+            depth += 1
+        elif kind in ('RPAREN', 'RCURLY'):
+            depth -= 1
+            closed = kind == 'RCURLY' and depth == 0
+        elif depth == 0 and (kind == 'SEMI' or (len(toks) == 2 and toks[0].type == 'IMPORT')):
+            stmts = _parse_statements(toks, data)
+            if stmts is None:
+                yield None
+                return
+            yield from stmts
+            toks = []
+    if toks:
+        stmts = _parse_statements(toks, data)
+        yield from [None] if stmts is None else stmts
+
+def scan_signatures(data):
+    # Signatures of the functions a program defines, as
+    # [(name, [param types], return type)], found from the token stream
+    # alone so that other compilation units can declare them cheaply
+    lexer = get_lexer().clone()
+    lexer.input(data)
+    toks = list(iter(lexer.token, None))
+    signatures = []
+    for i, tok in enumerate(toks):
+        if tok.type != 'DEF' or i + 2 >= len(toks) or toks[i + 1].type != 'ID':
+            continue
+        j = i + 3
+        param_types = []
+        current = None
+        while j < len(toks) and toks[j].type != 'RPAREN':
+            if toks[j].type in ('INT', 'FLOAT', 'CHAR') and current is None:
+                current = toks[j].value
+            elif toks[j].type == 'TIMES' and current is not None:
+                current += '*'
+            elif toks[j].type == 'ID' and current is not None:
+                param_types.append(current)
+                current = None
+            j += 1
+        # RPAREN ARROW type
+        j += 2
+        if j >= len(toks):
+            break
+        return_type = toks[j].value
+        while j + 1 < len(toks) and toks[j + 1].type == 'TIMES':
+            return_type += '*'
+            j += 1
+        signatures.append((toks[i + 1].value, param_types, return_type))
+    return signatures
 
-# Build the parser
-parser = yacc.yacc(start='program')
+def __getattr__(name):
+    if name == 'parser':
+        return get_parser()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,95 @@
+
+# parsetab.py
+# This file is automatically generated. Do not edit.
+# pylint: disable=W,C,R
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = 'programleftEQNOT_EQleftLESSGREATERLESS_EQGREATER_EQleftPLUSMINUSleftTIMESDIVIDErightUNARYAMPERSAND ARROW CHAR COMMA DEF DIVIDE ELSE EQ EQUALS FCLOSE FLOAT FOPEN FOR FREAD FWRITE GREATER GREATER_EQ ID IF IMPORT INT LBRACKET LCURLY LESS LESS_EQ LPAREN MINUS NOT_EQ NUMBER PLUS PRINT RBRACKET RCURLY RETURN RPAREN SEMI STRING TIMES WHILEprogram : statement_liststatement_list : statement_list statement\n| statementstatement : var_declaration\n| assignment\n| expression SEMI\n| if_statement\n| while_statement\n| for_statement\n| parallel_for_statement\n| return_statement\n| function_definition\n| import_statementimport_statement : IMPORT IDfunction_definition : DEF ID LPAREN parameters RPAREN ARROW type blockparameters : parameters COMMA parameter\n| parameter\n|parameter : type IDreturn_statement : RETURN expression SEMIblock : LCURLY statement_list RCURLYif_statement : IF LPAREN expression RPAREN block\n| IF LPAREN expression RPAREN block ELSE blockwhile_statement : WHILE LPAREN expression RPAREN blockfor_statement : FOR LPAREN for_init expression SEMI assignment_no_semi RPAREN blockparallel_for_statement : ID FOR LPAREN for_init expression SEMI assignment_no_semi RPAREN block\n| ID FOR LPAREN for_init expression SEMI assignment_no_semi RPAREN ID LPAREN ID RPAREN blockfor_init : assignment\n| var_declarationassignment_no_semi : expression EQUALS expressionvar_declaration : type ID EQUALS expression SEMI\n| type ID SEMI\n| type ID LBRACKET NUMBER RBRACKET SEMItype : INT\n| FLOAT\n| CHAR\n| type TIMESassignment : expression EQUALS expression SEMIexpression : func_name LPAREN arg_list RPARENfunc_name : PRINT\n| FOPEN\n| FREAD\n| FWRITE\n| FCLOSE\n| IDarg_list : arg_list COMMA expression\n| expression\n|expression : expression PLUS expression\n| expression MINUS expression\n| expression TIMES expression\n| expression DIVIDE expression\n| expression LESS expression\n| expression GREATER expression\n| expression LESS_EQ expression\n| expression GREATER_EQ expression\n| expression EQ expression\n| expression NOT_EQ expressionexpression : LPAREN expression RPARENexpression : NUMBERexpression : STRINGexpression : AMPERSAND expression %prec UNARY\n| TIMES expression %prec UNARYexpression : ID LBRACKET expression RBRACKETexpression : ID'
+    
+_lr_action_items = {'LPAREN':([0,2,3,4,5,7,8,9,10,11,12,13,15,17,18,19,21,22,23,24,25,31,32,33,34,35,36,37,38,39,40,41,42,43,44,45,46,47,48,51,52,53,55,58,59,60,62,63,75,76,79,85,87,88,89,91,95,97,104,108,109,110,111,115,116,118,124,125,126,131,132,133,134,138,],[18,18,-3,-4,-5,-7,-8,-9,-10,-11,-12,-13,-45,53,18,18,18,58,59,60,18,-40,-41,-42,-43,-44,-2,-6,18,18,18,18,18,18,18,18,18,18,18,18,79,18,-45,18,18,18,90,-14,18,-32,18,18,-28,-29,-20,-38,18,18,-31,-22,18,-24,18,-33,18,18,-23,-21,18,-25,-15,135,-26,-27,]),'NUMBER':([0,2,3,4,5,7,8,9,10,11,12,13,18,19,21,25,36,37,38,39,40,41,42,43,44,45,46,47,48,51,53,58,59,60,63,75,76,77,79,85,87,88,89,91,95,97,104,108,109,110,111,115,116,118,124,125,126,131,132,134,138,],[16,16,-3,-4,-5,-7,-8,-9,-10,-11,-12,-13,16,16,16,16,-2,-6,16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,-14,16,-32,93,16,16,-28,-29,-20,-38,16,16,-31,-22,16,-24,16,-33,16,16,-23,-21,16,-25,-15,-26,-27,]),'STRING':([0,2,3,4,5,7,8,9,10,11,12,13,18,19,21,25,36,37,38,39,40,41,42,43,44,45,46,47,48,51,53,58,59,60,63,75,76,79,85,87,88,89,91,95,97,104,108,109,110,111,115,116,118,124,125,126,131,132,134,138,],[20,20,-3,-4,-5,-7,-8,-9,-10,-11,-12,-13,20,20,20,20,-2,-6,20,20,20,20,20,20,20,20,20,20,20,20,20,20,20,20,-14,20,-32,20,20,-28,-29,-20,-38,20,20,-31,-22,20,-24,20,-33,20,20,-23,-21,20,-25,-15,-26,-27,]),'AMPERSAND':([0,2,3,4,5,7,8,9,10,11,12,13,18,19,21,25,36,37,38,39,40,41,42,43,44,45,46,47,48,51,53,58,59,60,63,75,76,79,85,87,88,89,91,95,97,104,108,109,110,111,115,116,118,124,125,126,131,132,134,138,],[21,21,-3,-4,-5,-7,-8,-9,-10,-11,-12,-13,21,21,21,21,-2,-6,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,-14,21,-32,21,21,-28,-29,-20,-38,21,21,-31,-22,21,-24,21,-33,21,21,-23,-21,21,-25,-15,-26,-27,]),'TIMES':([0,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,18,19,20,21,25,28,29,30,36,37,38,39,40,41,42,43,44,45,46,47,48,50,51,53,54,55,56,57,58,59,60,61,63,64,65,66,67,68,69,70,71,72,73,74,75,76,78,79,81,82,83,84,85,86,87,88,89,91,92,94,95,96,97,100,102,104,106,107,108,109,110,111,115,116,118,119,124,125,126,128,130,131,132,134,138,],[19,19,-3,-4,-5,41,-7,-8,-9,-10,-11,-12,-13,50,-65,-60,19,19,-61,19,19,-34,-35,-36,-2,-6,19,19,19,19,19,19,19,19,19,19,19,-37,19,19,41,-65,-63,-62,19,19,19,41,-14,41,41,41,-51,-52,41,41,41,41,41,41,19,-32,41,19,41,-59,41,41,19,41,-28,-29,-20,-38,41,-64,19,-39,19,41,50,-31,41,41,-22,19,-24,19,-33,19,19,41,-23,-21,19,50,41,-25,-15,-26,-27,]),'ID':([0,2,3,4,5,7,8,9,10,11,12,13,14,18,19,21,25,26,27,28,29,30,36,37,38,39,40,41,42,43,44,45,46,47,48,50,51,53,58,59,60,63,75,76,79,85,87,88,89,91,95,97,102,104,108,109,110,111,115,116,118,124,125,126,129,131,132,134,135,138,],[15,15,-3,-4,-5,-7,-8,-9,-10,-11,-12,-13,49,55,55,55,55,62,63,-34,-35,-36,-2,-6,55,55,55,55,55,55,55,55,55,55,55,-37,55,55,55,55,55,-14,55,-32,55,55,-28,-29,-20,-38,55,55,114,-31,-22,15,-24,55,-33,55,15,-23,-21,55,133,-25,-15,-26,136,-27,]),'IF':([0,2,3,4,5,7,8,9,10,11,12,13,36,37,63,76,89,91,104,108,109,110,115,118,124,125,131,132,134,138,],[22,22,-3,-4,-5,-7,-8,-9,-10,-11,-12,-13,-2,-6,-14,-32,-20,-38,-31,-22,22,-24,-33,22,-23,-21,-25,-15,-26,-27,]),'WHILE':([0,2,3,4,5,7,8,9,10,11,12,13,36,37,63,76,89,91,104,108,109,110,115,118,124,125,131,132,134,138,],[23,23,-3,-4,-5,-7,-8,-9,-10,-11,-12,-13,-2,-6,-14,-32,-20,-38,-31,-22,23,-24,-33,23,-23,-21,-25,-15,-26,-27,]),'FOR':([0,2,3,4,5,7,8,9,10,11,12,13,15,36,37,63,76,89,91,104,108,109,110,115,118,124,125,131,132,134,138,],[24,24,-3,-4,-5,-7,-8,-9,-10,-11,-12,-13,52,-2,-6,-14,-32,-20,-38,-31,-22,24,-24,-33,24,-23,-21,-25,-15,-26,-27,]),'RETURN':([0,2,3,4,5,7,8,9,10,11,12,13,36,37,63,76,89,91,104,108,109,110,115,118,124,125,131,132,134,138,],[25,25,-3,-4,-5,-7,-8,-9,-10,-11,-12,-13,-2,-6,-14,-32,-20,-38,-31,-22,25,-24,-33,25,-23,-21,-25,-15,-26,-27,]),'DEF':([0,2,3,4,5,7,8,9,10,11,12,13,36,37,63,76,89,91,104,108,109,110,115,118,124,125,131,132,134,138,],[26,26,-3,-4,-5,-7,-8,-9,-10,-11,-12,-13,-2,-6,-14,-32,-20,-38,-31,-22,26,-24,-33,26,-23,-21,-25,-15,-26,-27,]),'IMPORT':([0,2,3,4,5,7,8,9,10,11,12,13,36,37,63,76,89,91,104,108,109,110,115,118,124,125,131,132,134,138,],[27,27,-3,-4,-5,-7,-8,-9,-10,-11,-12,-13,-2,-6,-14,-32,-20,-38,-31,-22,27,-24,-33,27,-23,-21,-25,-15,-26,-27,]),'INT':([0,2,3,4,5,7,8,9,10,11,12,13,36,37,60,63,76,79,89,90,91,104,108,109,110,113,115,118,121,124,125,131,132,134,138,],[28,28,-3,-4,-5,-7,-8,-9,-10,-11,-12,-13,-2,-6,28,-14,-32,28,-20,28,-38,-31,-22,28,-24,28,-33,28,28,-23,-21,-25,-15,-26,-27,]),'FLOAT':([0,2,3,4,5,7,8,9,10,11,12,13,36,37,60,63,76,79,89,90,91,104,108,109,110,113,115,118,121,124,125,131,132,134,138,],[29,29,-3,-4,-5,-7,-8,-9,-10,-11,-12,-13,-2,-6,29,-14,-32,29,-20,29,-38,-31,-22,29,-24,29,-33,29,29,-23,-21,-25,-15,-26,-27,]),'CHAR':([0,2,3,4,5,7,8,9,10,11,12,13,36,37,60,63,76,79,89,90,91,104,108,109,110,113,115,118,121,124,125,131,132,134,138,],[30,30,-3,-4,-5,-7,-8,-9,-10,-11,-12,-13,-2,-6,30,-14,-32,30,-20,30,-38,-31,-22,30,-24,30,-33,30,30,-23,-21,-25,-15,-26,-27,]),'PRINT':([0,2,3,4,5,7,8,9,10,11,12,13,18,19,21,25,36,37,38,39,40,41,42,43,44,45,46,47,48,51,53,58,59,60,63,75,76,79,85,87,88,89,91,95,97,104,108,109,110,111,115,116,118,124,125,126,131,132,134,138,],[31,31,-3,-4,-5,-7,-8,-9,-10,-11,-12,-13,31,31,31,31,-2,-6,31,31,31,31,31,31,31,31,31,31,31,31,31,31,31,31,-14,31,-32,31,31,-28,-29,-20,-38,31,31,-31,-22,31,-24,31,-33,31,31,-23,-21,31,-25,-15,-26,-27,]),'FOPEN':([0,2,3,4,5,7,8,9,10,11,12,13,18,19,21,25,36,37,38,39,40,41,42,43,44,45,46,47,48,51,53,58,59,60,63,75,76,79,85,87,88,89,91,95,97,104,108,109,110,111,115,116,118,124,125,126,131,132,134,138,],[32,32,-3,-4,-5,-7,-8,-9,-10,-11,-12,-13,32,32,32,32,-2,-6,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,32,-14,32,-32,32,32,-28,-29,-20,-38,32,32,-31,-22,32,-24,32,-33,32,32,-23,-21,32,-25,-15,-26,-27,]),'FREAD':([0,2,3,4,5,7,8,9,10,11,12,13,18,19,21,25,36,37,38,39,40,41,42,43,44,45,46,47,48,51,53,58,59,60,63,75,76,79,85,87,88,89,91,95,97,104,108,109,110,111,115,116,118,124,125,126,131,132,134,138,],[33,33,-3,-4,-5,-7,-8,-9,-10,-11,-12,-13,33,33,33,33,-2,-6,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,33,-14,33,-32,33,33,-28,-29,-20,-38,33,33,-31,-22,33,-24,33,-33,33,33,-23,-21,33,-25,-15,-26,-27,]),'FWRITE':([0,2,3,4,5,7,8,9,10,11,12,13,18,19,21,25,36,37,38,39,40,41,42,43,44,45,46,47,48,51,53,58,59,60,63,75,76,79,85,87,88,89,91,95,97,104,108,109,110,111,115,116,118,124,125,126,131,132,134,138,],[34,34,-3,-4,-5,-7,-8,-9,-10,-11,-12,-13,34,34,34,34,-2,-6,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,34,-14,34,-32,34,34,-28,-29,-20,-38,34,34,-31,-22,34,-24,34,-33,34,34,-23,-21,34,-25,-15,-26,-27,]),'FCLOSE':([0,2,3,4,5,7,8,9,10,11,12,13,18,19,21,25,36,37,38,39,40,41,42,43,44,45,46,47,48,51,53,58,59,60,63,75,76,79,85,87,88,89,91,95,97,104,108,109,110,111,115,116,118,124,125,126,131,132,134,138,],[35,35,-3,-4,-5,-7,-8,-9,-10,-11,-12,-13,35,35,35,35,-2,-6,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,35,-14,35,-32,35,35,-28,-29,-20,-38,35,35,-31,-22,35,-24,35,-33,35,35,-23,-21,35,-25,-15,-26,-27,]),'$end':([1,2,3,4,5,7,8,9,10,11,12,13,36,37,63,76,89,91,104,108,110,115,124,125,131,132,134,138,],[0,-1,-3,-4,-5,-7,-8,-9,-10,-11,-12,-13,-2,-6,-14,-32,-20,-38,-31,-22,-24,-33,-23,-21,-25,-15,-26,-27,]),'RCURLY':([3,4,5,7,8,9,10,11,12,13,36,37,63,76,89,91,104,108,110,115,118,124,125,131,132,134,138,],[-3,-4,-5,-7,-8,-9,-10,-11,-12,-13,-2,-6,-14,-32,-20,-38,-31,-22,-24,-33,125,-23,-21,-25,-15,-26,-27,]),'SEMI':([6,15,16,20,49,55,56,57,61,64,65,66,67,68,69,70,71,72,73,74,82,92,94,96,100,105,106,],[37,-65,-60,-61,76,-65,-63,-62,89,91,-49,-50,-51,-52,-53,-54,-55,-56,-57,-58,-59,104,-64,-39,111,115,116,]),'EQUALS':([6,15,16,20,49,55,56,57,65,66,67,68,69,70,71,72,73,74,82,86,94,96,119,],[38,-65,-60,-61,75,-65,-63,-62,-49,-50,-51,-52,-53,-54,-55,-56,-57,-58,-59,38,-64,-39,126,]),'PLUS':([6,15,16,20,54,55,56,57,61,64,65,66,67,68,69,70,71,72,73,74,78,81,82,83,84,86,92,94,96,100,106,107,119,130,],[39,-65,-60,-61,39,-65,-63,-62,39,39,-49,-50,-51,-52,39,39,39,39,39,39,39,39,-59,39,39,39,39,-64,-39,39,39,39,39,39,]),'MINUS':([6,15,16,20,54,55,56,57,61,64,65,66,67,68,69,70,71,72,73,74,78,81,82,83,84,86,92,94,96,100,106,107,119,130,],[40,-65,-60,-61,40,-65,-63,-62,40,40,-49,-50,-51,-52,40,40,40,40,40,40,40,40,-59,40,40,40,40,-64,-39,40,40,40,40,40,]),'DIVIDE':([6,15,16,20,54,55,56,57,61,64,65,66,67,68,69,70,71,72,73,74,78,81,82,83,84,86,92,94,96,100,106,107,119,130,],[42,-65,-60,-61,42,-65,-63,-62,42,42,42,42,-51,-52,42,42,42,42,42,42,42,42,-59,42,42,42,42,-64,-39,42,42,42,42,42,]),'LESS':([6,15,16,20,54,55,56,57,61,64,65,66,67,68,69,70,71,72,73,74,78,81,82,83,84,86,92,94,96,100,106,107,119,130,],[43,-65,-60,-61,43,-65,-63,-62,43,43,-49,-50,-51,-52,-53,-54,-55,-56,43,43,43,43,-59,43,43,43,43,-64,-39,43,43,43,43,43,]),'GREATER':([6,15,16,20,54,55,56,57,61,64,65,66,67,68,69,70,71,72,73,74,78,81,82,83,84,86,92,94,96,100,106,107,119,130,],[44,-65,-60,-61,44,-65,-63,-62,44,44,-49,-50,-51,-52,-53,-54,-55,-56,44,44,44,44,-59,44,44,44,44,-64,-39,44,44,44,44,44,]),'LESS_EQ':([6,15,16,20,54,55,56,57,61,64,65,66,67,68,69,70,71,72,73,74,78,81,82,83,84,86,92,94,96,100,106,107,119,130,],[45,-65,-60,-61,45,-65,-63,-62,45,45,-49,-50,-51,-52,-53,-54,-55,-56,45,45,45,45,-59,45,45,45,45,-64,-39,45,45,45,45,45,]),'GREATER_EQ':([6,15,16,20,54,55,56,57,61,64,65,66,67,68,69,70,71,72,73,74,78,81,82,83,84,86,92,94,96,100,106,107,119,130,],[46,-65,-60,-61,46,-65,-63,-62,46,46,-49,-50,-51,-52,-53,-54,-55,-56,46,46,46,46,-59,46,46,46,46,-64,-39,46,46,46,46,46,]),'EQ':([6,15,16,20,54,55,56,57,61,64,65,66,67,68,69,70,71,72,73,74,78,81,82,83,84,86,92,94,96,100,106,107,119,130,],[47,-65,-60,-61,47,-65,-63,-62,47,47,-49,-50,-51,-52,-53,-54,-55,-56,-57,-58,47,47,-59,47,47,47,47,-64,-39,47,47,47,47,47,]),'NOT_EQ':([6,15,16,20,54,55,56,57,61,64,65,66,67,68,69,70,71,72,73,74,78,81,82,83,84,86,92,94,96,100,106,107,119,130,],[48,-65,-60,-61,48,-65,-63,-62,48,48,-49,-50,-51,-52,-53,-54,-55,-56,-57,-58,48,48,-59,48,48,48,48,-64,-39,48,48,48,48,48,]),'LBRACKET':([15,49,55,],[51,77,51,]),'RPAREN':([16,20,53,54,55,56,57,65,66,67,68,69,70,71,72,73,74,80,81,82,83,84,90,94,96,101,103,107,114,120,122,123,130,136,],[-60,-61,-48,82,-65,-63,-62,-49,-50,-51,-52,-53,-54,-55,-56,-57,-58,96,-47,-59,98,99,-18,-64,-39,112,-17,-46,-19,127,-16,129,-30,137,]),'RBRACKET':([16,20,55,56,57,65,66,67,68,69,70,71,72,73,74,78,82,93,94,96,],[-60,-61,-65,-63,-62,-49,-50,-51,-52,-53,-54,-55,-56,-57,-58,94,-59,105,-64,-39,]),'COMMA':([16,20,53,55,56,57,65,66,67,68,69,70,71,72,73,74,80,81,82,90,94,96,101,103,107,114,122,],[-60,-61,-48,-65,-63,-62,-49,-50,-51,-52,-53,-54,-55,-56,-57,-58,97,-47,-59,-18,-64,-39,113,-17,-46,-19,-16,]),'LCURLY':([28,29,30,50,98,99,117,127,128,129,137,],[-34,-35,-36,-37,109,109,109,109,109,109,109,]),'ELSE':([108,125,],[117,-21,]),'ARROW':([112,],[121,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'program':([0,],[1,]),'statement_list':([0,109,],[2,118,]),'statement':([0,2,109,118,],[3,36,3,36,]),'var_declaration':([0,2,60,79,109,118,],[4,4,88,88,4,4,]),'assignment':([0,2,60,79,109,118,],[5,5,87,87,5,5,]),'expression':([0,2,18,19,21,25,38,39,40,41,42,43,44,45,46,47,48,51,53,58,59,60,75,79,85,95,97,109,111,116,118,126,],[6,6,54,56,57,61,64,65,66,67,68,69,70,71,72,73,74,78,81,83,84,86,92,86,100,106,107,6,119,119,6,130,]),'if_statement':([0,2,109,118,],[7,7,7,7,]),'while_statement':([0,2,109,118,],[8,8,8,8,]),'for_statement':([0,2,109,118,],[9,9,9,9,]),'parallel_for_statement':([0,2,109,118,],[10,10,10,10,]),'return_statement':([0,2,109,118,],[11,11,11,11,]),'function_definition':([0,2,109,118,],[12,12,12,12,]),'import_statement':([0,2,109,118,],[13,13,13,13,]),'type':([0,2,60,79,90,109,113,118,121,],[14,14,14,14,102,14,102,14,128,]),'func_name':([0,2,18,19,21,25,38,39,40,41,42,43,44,45,46,47,48,51,53,58,59,60,75,79,85,95,97,109,111,116,118,126,],[17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,]),'arg_list':([53,],[80,]),'for_init':([60,79,],[85,95,]),'parameters':([90,],[101,]),'parameter':([90,113,],[103,122,]),'block':([98,99,117,127,128,129,137,],[108,110,124,131,132,134,138,]),'assignment_no_semi':([111,116,],[120,123,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> program","S'",1,None,None,None),
+  ('program -> statement_list','program',1,'p_program','parser.py',16),
+  ('statement_list -> statement_list statement','statement_list',2,'p_statement_list','parser.py',20),
+  ('statement_list -> statement','statement_list',1,'p_statement_list','parser.py',21),
+  ('statement -> var_declaration','statement',1,'p_statement','parser.py',30),
+  ('statement -> assignment','statement',1,'p_statement','parser.py',31),
+  ('statement -> expression SEMI','statement',2,'p_statement','parser.py',32),
+  ('statement -> if_statement','statement',1,'p_statement','parser.py',33),
+  ('statement -> while_statement','statement',1,'p_statement','parser.py',34),
+  ('statement -> for_statement','statement',1,'p_statement','parser.py',35),
+  ('statement -> parallel_for_statement','statement',1,'p_statement','parser.py',36),
+  ('statement -> return_statement','statement',1,'p_statement','parser.py',37),
+  ('statement -> function_definition','statement',1,'p_statement','parser.py',38),
+  ('statement -> import_statement','statement',1,'p_statement','parser.py',39),
+  ('import_statement -> IMPORT ID','import_statement',2,'p_import_statement','parser.py',43),
+  ('function_definition -> DEF ID LPAREN parameters RPAREN ARROW type block','function_definition',8,'p_function_definition','parser.py',47),
+  ('parameters -> parameters COMMA parameter','parameters',3,'p_parameters','parser.py',51),
+  ('parameters -> parameter','parameters',1,'p_parameters','parser.py',52),
+  ('parameters -> <empty>','parameters',0,'p_parameters','parser.py',53),
+  ('parameter -> type ID','parameter',2,'p_parameter','parser.py',63),
+  ('return_statement -> RETURN expression SEMI','return_statement',3,'p_return_statement','parser.py',67),
+  ('block -> LCURLY statement_list RCURLY','block',3,'p_block','parser.py',71),
+  ('if_statement -> IF LPAREN expression RPAREN block','if_statement',5,'p_if_statement','parser.py',75),
+  ('if_statement -> IF LPAREN expression RPAREN block ELSE block','if_statement',7,'p_if_statement','parser.py',76),
+  ('while_statement -> WHILE LPAREN expression RPAREN block','while_statement',5,'p_while_statement','parser.py',83),
+  ('for_statement -> FOR LPAREN for_init expression SEMI assignment_no_semi RPAREN block','for_statement',8,'p_for_statement','parser.py',87),
+  ('parallel_for_statement -> ID FOR LPAREN for_init expression SEMI assignment_no_semi RPAREN block','parallel_for_statement',9,'p_parallel_for_statement','parser.py',91),
+  ('parallel_for_statement -> ID FOR LPAREN for_init expression SEMI assignment_no_semi RPAREN ID LPAREN ID RPAREN block','parallel_for_statement',13,'p_parallel_for_statement','parser.py',92),
+  ('for_init -> assignment','for_init',1,'p_for_init','parser.py',103),
+  ('for_init -> var_declaration','for_init',1,'p_for_init','parser.py',104),
+  ('assignment_no_semi -> expression EQUALS expression','assignment_no_semi',3,'p_assignment_no_semi','parser.py',108),
+  ('var_declaration -> type ID EQUALS expression SEMI','var_declaration',5,'p_var_declaration','parser.py',112),
+  ('var_declaration -> type ID SEMI','var_declaration',3,'p_var_declaration','parser.py',113),
+  ('var_declaration -> type ID LBRACKET NUMBER RBRACKET SEMI','var_declaration',6,'p_var_declaration','parser.py',114),
+  ('type -> INT','type',1,'p_type','parser.py',125),
+  ('type -> FLOAT','type',1,'p_type','parser.py',126),
+  ('type -> CHAR','type',1,'p_type','parser.py',127),
+  ('type -> type TIMES','type',2,'p_type','parser.py',128),
+  ('assignment -> expression EQUALS expression SEMI','assignment',4,'p_assignment','parser.py',135),
+  ('expression -> func_name LPAREN arg_list RPAREN','expression',4,'p_expression_func_call','parser.py',139),
+  ('func_name -> PRINT','func_name',1,'p_func_name','parser.py',143),
+  ('func_name -> FOPEN','func_name',1,'p_func_name','parser.py',144),
+  ('func_name -> FREAD','func_name',1,'p_func_name','parser.py',145),
+  ('func_name -> FWRITE','func_name',1,'p_func_name','parser.py',146),
+  ('func_name -> FCLOSE','func_name',1,'p_func_name','parser.py',147),
+  ('func_name -> ID','func_name',1,'p_func_name','parser.py',148),
+  ('arg_list -> arg_list COMMA expression','arg_list',3,'p_arg_list','parser.py',155),
+  ('arg_list -> expression','arg_list',1,'p_arg_list','parser.py',156),
+  ('arg_list -> <empty>','arg_list',0,'p_arg_list','parser.py',157),
+  ('expression -> expression PLUS expression','expression',3,'p_expression_binop','parser.py',176),
+  ('expression -> expression MINUS expression','expression',3,'p_expression_binop','parser.py',177),
+  ('expression -> expression TIMES expression','expression',3,'p_expression_binop','parser.py',178),
+  ('expression -> expression DIVIDE expression','expression',3,'p_expression_binop','parser.py',179),
+  ('expression -> expression LESS expression','expression',3,'p_expression_binop','parser.py',180),
+  ('expression -> expression GREATER expression','expression',3,'p_expression_binop','parser.py',181),
+  ('expression -> expression LESS_EQ expression','expression',3,'p_expression_binop','parser.py',182),
+  ('expression -> expression GREATER_EQ expression','expression',3,'p_expression_binop','parser.py',183),
+  ('expression -> expression EQ expression','expression',3,'p_expression_binop','parser.py',184),
+  ('expression -> expression NOT_EQ expression','expression',3,'p_expression_binop','parser.py',185),
+  ('expression -> LPAREN expression RPAREN','expression',3,'p_expression_group','parser.py',189),
+  ('expression -> NUMBER','expression',1,'p_expression_number','parser.py',193),
+  ('expression -> STRING','expression',1,'p_expression_string','parser.py',197),
+  ('expression -> AMPERSAND expression','expression',2,'p_expression_unaryop','parser.py',201),
+  ('expression -> TIMES expression','expression',2,'p_expression_unaryop','parser.py',202),
+  ('expression -> ID LBRACKET expression RBRACKET','expression',4,'p_expression_array_access','parser.py',206),
+  ('expression -> ID','expression',1,'p_expression_id','parser.py',210),
+]
@@ -0,0 +1,131 @@
+import contextlib
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak RSS is then left out
+    resource = None
+
+# Per-phase timing for --time-phases. Every phase records its wall time,
+# the CPU time spent in this process and in the child processes it waited
+# for (llc, cargo, gcc, the program itself), and the peak RSS of both so
+# far. Counts (tokens, AST nodes, IR instructions) are recorded alongside
+# so that throughput can be derived from the report.
+
+def _children_cpu():
+    # CPU seconds of waited-for child processes; getrusage has microsecond
+    # resolution where os.times() counts clock ticks
+    if resource is None:
+        times = os.times()
+        return times.children_user + times.children_system
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def _peak_rss(who):
+    # High-water mark in bytes (ru_maxrss is in KiB on Linux, bytes on macOS)
+    if resource is None:
+        return None
+    rss = resource.getrusage(who).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+class PhaseTimer:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.phases = []
+        self.counts = {}
+
+    @contextlib.contextmanager
+    def _measure(self, name):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        children_cpu = _children_cpu()
+        try:
+            yield
+        finally:
+            self.add(name, {
+                'wall': time.perf_counter() - wall,
+                'cpu': time.process_time() - cpu,
+                'children_cpu': _children_cpu() - children_cpu,
+                'peak_rss': _peak_rss(resource.RUSAGE_SELF) if resource else None,
+                'children_peak_rss': _peak_rss(resource.RUSAGE_CHILDREN) if resource else None,
+            })
+
+    def phase(self, name):
+        # Context manager timing the code it wraps as phase name
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._measure(name)
+
+    def add(self, name, record, runs=1):
+        # Phases that run more than once (per compilation unit, say) add up,
+        # except for the peak RSS, which is a high-water mark
+        for phase in self.phases:
+            if phase['name'] == name:
+                for field in ('wall', 'cpu', 'children_cpu'):
+                    phase[field] += record[field]
+                for field in ('peak_rss', 'children_peak_rss'):
+                    if record[field] is not None:
+                        phase[field] = max(phase[field] or 0, record[field])
+                phase['runs'] += runs
+                return
+        self.phases.append(dict(record, name=name, runs=runs))
+
+    def count(self, name, value):
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def merge(self, other):
+        # Adds the phases and counts of a timer that ran elsewhere, e.g. in
+        # a worker process
+        for phase in other.phases:
+            self.add(phase['name'], phase, phase['runs'])
+        for name, value in other.counts.items():
+            self.count(name, value)
+
+    def totals(self, wall):
+        # The whole run (phases can nest, e.g. the units of a multi-file
+        # build inside 'units', so their sum would count twice)
+        return {
+            'wall': wall,
+            'cpu': time.process_time(),
+            'children_cpu': _children_cpu(),
+            'peak_rss': _peak_rss(resource.RUSAGE_SELF) if resource else None,
+            'children_peak_rss': _peak_rss(resource.RUSAGE_CHILDREN) if resource else None,
+        }
+
+    def report(self, wall, file=sys.stderr):
+        def mib(value):
+            return '-' if value is None else f"{value / (1024 * 1024):.1f}"
+
+        def row(name, record):
+            print(f"{name:<16} {record['wall'] * 1000:>10.2f} {record['cpu'] * 1000:>10.2f} "
+                  f"{record['children_cpu'] * 1000:>12.2f} {mib(record['peak_rss']):>8} "
+                  f"{mib(record['children_peak_rss']):>13}", file=file)
+
+        print(f"{'phase':<16} {'wall ms':>10} {'cpu ms':>10} {'child cpu ms':>12} "
+              f"{'rss MiB':>8} {'child rss MiB':>13}", file=file)
+        for phase in self.phases:
+            row(phase['name'] if phase['runs'] == 1 else f"{phase['name']} (x{phase['runs']})", phase)
+        row('total', self.totals(wall))
+        if self.counts:
+            print('counts: ' + ', '.join(f"{name} {value}" for name, value in self.counts.items()), file=file)
+
+    def as_json(self, wall):
+        return {
+            'phases': [{field: phase[field] for field in ('name', 'runs', 'wall', 'cpu', 'children_cpu',
+                                                         'peak_rss', 'children_peak_rss')}
+                       for phase in self.phases],
+            'total': self.totals(wall),
+            'counts': self.counts,
+        }
+
+    def write_json(self, path, wall, **extra):
+        # extra goes into the top-level object (inputs, flags, ...)
+        data = dict(extra, **self.as_json(wall))
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.write('\n')
@@ -0,0 +1,157 @@
+import contextlib
+import ctypes
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from . import toolchain
+
+# A compile daemon: clients send {"argv": [...], "cwd": ...} as one line of
+# JSON over a Unix socket and get one line of JSON back. Requests run in a
+# pool of warm worker processes, so the interpreter, the parser tables,
+# llvmlite and the toolchain lookups are paid for once per worker.
+
+def default_socket_path():
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or toolchain.cache_dir()
+    return os.path.join(runtime_dir, 'c-script.sock')
+
+@contextlib.contextmanager
+def captured_output():
+    # Redirects fds 1 and 2 (including child processes such as gcc) into a
+    # temporary file for the duration of a request; yields a list that
+    # receives the captured text. Only safe in a single-threaded worker.
+    result = []
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = os.dup(1), os.dup(2)
+    with tempfile.TemporaryFile() as capture:
+        os.dup2(capture.fileno(), 1)
+        os.dup2(capture.fileno(), 2)
+        try:
+            yield result
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+            capture.seek(0)
+            result.append(capture.read().decode('utf-8', errors='replace'))
+
+def run_forked(fn):
+    # Runs fn() -> returncode in a child forked from this (warm) worker and
+    # returns the child's exit status. Programs run by a request get a
+    # process of their own: the runtime's globals start out fresh, its exit
+    # handlers (buffered output, --profile reports) run when the request is
+    # done, and a program that exits or crashes only takes the child down.
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        returncode = 1
+        try:
+            returncode = fn()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            # libc exit() rather than os._exit(), so that the runtime's
+            # atexit handlers run; the worker's Python state is left alone
+            ctypes.CDLL(None).exit(returncode)
+    _, status = os.waitpid(pid, 0)
+    if os.WIFSIGNALED(status):
+        signum = os.WTERMSIG(status)
+        print(f"program terminated by {signal.Signals(signum).name}", file=sys.stderr)
+        return 128 + signum
+    return os.WEXITSTATUS(status)
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            response = self.server.run(request['argv'], request['cwd'])
+        except Exception as e:
+            response = {'returncode': 1, 'output': f"compile server error: {e}\n", 'outputs': []}
+        self.wfile.write(json.dumps(response).encode() + b'\n')
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def run(self, argv, cwd):
+        pool = self.pool
+        try:
+            future = pool.submit(self.handler, argv, cwd)
+        except BrokenProcessPool:
+            # Broken by an earlier request before this one started
+            self._replace_pool(pool)
+            return self.run(argv, cwd)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            # The worker died during this request, which fails; later ones
+            # get a new pool
+            self._replace_pool(pool)
+            raise
+
+    def _replace_pool(self, pool):
+        with self.pool_lock:
+            if self.pool is pool:
+                self.pool = self.make_pool()
+                pool.shutdown(wait=False)
+
+def _is_listening(socket_path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(socket_path)
+        except OSError:
+            return False
+        return True
+
+def serve(socket_path, handler, workers=None, initializer=None):
+    # handler(argv, cwd) -> {"returncode", "output", "outputs"} runs in a
+    # worker process; initializer warms each worker up once
+    if os.path.exists(socket_path):
+        if _is_listening(socket_path):
+            raise Exception(f"A compile server is already listening on {socket_path}")
+        os.unlink(socket_path)
+    os.makedirs(os.path.dirname(socket_path) or '.', exist_ok=True)
+
+    def make_pool():
+        return ProcessPoolExecutor(max_workers=workers, initializer=initializer)
+
+    server = _Server(socket_path, _Handler)
+    server.make_pool = make_pool
+    server.pool_lock = threading.Lock()
+    server.pool = make_pool()
+    server.handler = handler
+    try:
+        # Start the workers (and warm them up) before accepting requests
+        server.pool.submit(int).result()
+        print(f"Compile server listening on {socket_path}")
+        sys.stdout.flush()
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.pool.shutdown()
+        os.unlink(socket_path)
+
+def request(socket_path, argv, cwd):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(socket_path)
+        s.sendall(json.dumps({'argv': argv, 'cwd': cwd}).encode() + b'\n')
+        data = b''
+        while not data.endswith(b'\n'):
+            chunk = s.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    return json.loads(data)
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# Prebuilt Rust artifacts (the runtime library and the Rust frontend) are
+# cached under a hash of their sources so that a fresh artifact is used
+# directly instead of going through cargo's own freshness check.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNTIME_CRATE = os.path.join(ROOT, 'runtime')
+FRONTEND_CRATE = os.path.join(ROOT, 'rust')
+
+linux_triple = "x86_64-pc-linux-gnu"
+macos_arm_triple = "aarch64-apple-darwin"
+macos_x86_triple = "x86_64-apple-darwin"
+
+def host_triple():
+    # Target triple CodeGen puts in its modules, '' to use LLVM's default
+    if platform.system().lower() == "linux":
+        return linux_triple
+    elif platform.system().lower() == "darwin":
+        if platform.machine().lower() == "arm64":
+            return macos_arm_triple
+        return macos_x86_triple
+    return ''
+
+def cache_dir():
+    base = os.environ.get('CSCRIPT_CACHE_DIR')
+    if not base:
+        xdg = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        base = os.path.join(xdg, 'c-script')
+    return base
+
+def shared_library_name(name):
+    if sys.platform == 'darwin':
+        return f'lib{name}.dylib'
+    return f'lib{name}.so'
+
+def executable_name(name):
+    if sys.platform == 'win32':
+        return name + '.exe'
+    return name
+
+def _crate_files(crate_dir):
+    files = [os.path.join(crate_dir, 'Cargo.toml')]
+    lock = os.path.join(crate_dir, 'Cargo.lock')
+    if os.path.exists(lock):
+        files.append(lock)
+    for dirpath, dirnames, filenames in os.walk(os.path.join(crate_dir, 'src')):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            files.append(os.path.join(dirpath, filename))
+    return files
+
+def source_hash(crate_dir):
+    h = hashlib.sha256()
+    h.update(sys.platform.encode())
+    for path in _crate_files(crate_dir):
+        h.update(os.path.relpath(path, crate_dir).encode() + b'\0')
+        with open(path, 'rb') as f:
+            h.update(f.read())
+        h.update(b'\0')
+    return h.hexdigest()[:16]
+
+def _target_dir(crate_dir):
+    return os.environ.get('CARGO_TARGET_DIR') or os.path.join(crate_dir, 'target')
+
+def _store(entry, artifacts):
+    # Copy into a private directory first and rename it into place, so that
+    # concurrent compiles never see a half-written entry
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    staging = tempfile.mkdtemp(dir=os.path.dirname(entry))
+    for src in artifacts:
+        shutil.copy2(src, os.path.join(staging, os.path.basename(src)))
+    try:
+        os.rename(staging, entry)
+    except OSError:
+        # Somebody else stored the same entry first
+        shutil.rmtree(staging, ignore_errors=True)
+
+def _cached_artifact(kind, crate_dir, names, cargo_args):
+    entry = os.path.join(cache_dir(), f'{kind}-{source_hash(crate_dir)}')
+    if all(os.path.exists(os.path.join(entry, name)) for name in names):
+        return entry
+
+    print(f"Building Rust {kind}...")
+    subprocess.run(['cargo', 'build', '--release', '--manifest-path',
+                    os.path.join(crate_dir, 'Cargo.toml')] + cargo_args, check=True)
+    release_dir = os.path.join(_target_dir(crate_dir), 'release')
+
+    # cargo may have just written Cargo.lock, key on the sources as built
+    entry = os.path.join(cache_dir(), f'{kind}-{source_hash(crate_dir)}')
+    if not os.path.isdir(entry):
+        _store(entry, [os.path.join(release_dir, name) for name in names])
+    return entry
+
+def runtime_library(kind='static'):
+    # Path to libruntime.a (kind='static') or the shared runtime library
+    names = ['libruntime.a', shared_library_name('runtime')]
+    entry = _cached_artifact('runtime', RUNTIME_CRATE, names, [])
+    if kind == 'static':
+        return os.path.join(entry, names[0])
+    return os.path.join(entry, names[1])
+
+def codegen_binary():
+    # Path to the Rust frontend's codegen executable
+    name = executable_name('codegen')
+    entry = _cached_artifact('frontend', FRONTEND_CRATE, [name], ['--bin', 'codegen'])
+    return os.path.join(entry, name)
@@ -2,27 +2,545 @@ import os
 import sys
 import subprocess
 import argparse
+import functools
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-from c_script import lexer, parser, CodeGen
+from c_script import __version__, cache, incremental, interpreter, phases, server, toolchain
+from c_script.parser import iter_statements, scan_signatures, tokenize, parse_tokens
 
-LLC = "llc"
+@functools.cache
+def find_llc():
+    # Only needed when falling back to the external llc binary
+    path = os.environ["PATH"]
 
-path = os.environ["PATH"]
+    pathlist = path.split(os.pathsep)
 
-pathlist = path.split(os.pathsep)
+    for p in pathlist:
+        for llc_ in ["llc", "llc-18", "llc-20"]:
+            llc_test = os.path.join(p, llc_)
 
-for p in pathlist:
-    for llc_ in ["llc", "llc-18", "llc-20"]:
-        llc_test = os.path.join(p, llc_)
+            if os.path.exists(llc_test):
+                print(f"Using llc {llc_test}")
+                return llc_test
 
-        if os.path.exists(llc_test):
-            LLC = llc_test
-            print(f"Using llc {LLC}")
-            break
+    return "llc"
 
-def main():
+def emit_with_llc(ir_text, ll_filename, o_filename, args, timer):
+    with open(ll_filename, 'w') as f:
+        f.write(ir_text)
+
+    llc_args = [find_llc(), '-relocation-model=pic', '-filetype=obj', f'-O{args.opt_level}']
+    if args.mcpu:
+        llc_args.append(f'-mcpu={args.mcpu}')
+    if args.mattr:
+        llc_args.append(f'-mattr={args.mattr}')
+    with timer.phase('llc'):
+        subprocess.run(llc_args + [ll_filename, '-o', o_filename])
+
+def instruction_count(mod):
+    # Instructions in an llvmlite.binding module
+    return sum(len(list(block.instructions)) for func in mod.functions for block in func.blocks)
+
+def emit_in_process(ir_text, o_filename, bc_filename, args, timer):
+    from c_script import backend
+
+    with timer.phase('optimize'):
+        mod = backend.parse_module(ir_text)
+        target_machine = backend.create_target_machine(
+            triple=mod.triple or None, cpu=args.mcpu or '', features=args.mattr or '',
+            opt=args.opt_level)
+        backend.optimize(mod, target_machine, args.opt_level)
+    if timer.enabled:
+        timer.count('optimized_ir_instructions', instruction_count(mod))
+    if args.print_after_opt:
+        print(mod)
+
+    with timer.phase('emit'):
+        if args.emit == 'bc':
+            backend.emit_bitcode(mod, bc_filename)
+        else:
+            backend.emit_object(mod, target_machine, o_filename)
+
+def run_jit(ir_texts, args, timer):
+    from c_script import jit
+
+    with timer.phase('runtime'):
+        runtime_path = toolchain.runtime_library('shared')
+    with timer.phase('jit'):
+        engine, lib = jit.load(ir_texts, runtime_path, cpu=args.mcpu or '', features=args.mattr or '',
+                               opt_level=args.opt_level)
+    with timer.phase('execute'):
+        return jit.execute(engine, lib)
+
+def print_cache_stats(compile_cache):
+    stats = compile_cache.stats()
+    entries = compile_cache.entries()
+    print(f"cache: {stats['hits']} hits, {stats['misses']} misses, "
+          f"{stats['bytes_saved']} bytes saved, {len(entries)} entries "
+          f"({sum(size for _, size, _ in entries)} bytes, {stats['evictions']} evicted)")
+
+def cache_outputs(args, o_filename):
+    # The files a compile with these flags produces, by cache entry name
+    if args.emit == 'bc':
+        return {'bitcode': args.output + '.bc'}
+    if args.emit == 'obj':
+        return {'object': o_filename}
+    return {'executable': args.output}
+
+def codegen_flags(args):
+    # Everything besides the source that changes the generated code
+    mcpu = args.mcpu or ''
+    if mcpu == 'native':
+        # Results tuned for this host are not valid on another one
+        from c_script import backend
+        mcpu = ':'.join(backend.host_cpu())
+    return {
+        'opt_level': args.opt_level,
+        'mcpu': mcpu,
+        'mattr': args.mattr or '',
+        'emit': args.emit,
+        'llc': args.llc,
+        'fold': not args.no_fold,
+        'unchecked_alloc': args.unchecked_alloc,
+        'bounds_checks': args.bounds_checks,
+        'profile': args.profile,
+        'profile_loops': args.profile_loops,
+    }
+
+def cache_key(compile_cache, args, path, extra=None):
+    with open(path, 'rb') as f:
+        source = f.read()
+    flags = codegen_flags(args)
+    flags.update(extra or {})
+    frontend = 'rust' if args.compile else 'python'
+    return compile_cache.key(source, frontend, toolchain.host_triple(), flags)
+
+def run_output(args, start_time, timer):
+    with timer.phase('execute'):
+        subprocess.run([os.path.join(".", args.output)])
+    print(f"aot: wall time {time.perf_counter() - start_time:.3f}s", file=sys.stderr)
+
+def parse_file(path, args, timer):
+    # Lexes, parses and (unless --no-fold) folds a source file
+    from c_script.folding import fold
+    from c_script.nodes import walk
+
+    with open(path, 'r') as f:
+        data = f.read()
+    with timer.phase('lex'):
+        toks = tokenize(data)
+    with timer.phase('parse'):
+        ast = parse_tokens(toks, data)
+    if timer.enabled:
+        timer.count('source_bytes', len(data))
+        timer.count('tokens', len(toks))
+        timer.count('ast_nodes', sum(1 for _ in walk(ast)) if ast is not None else 0)
+    if ast is not None and not args.no_fold:
+        with timer.phase('fold'):
+            ast = fold(ast)
+    return ast
+
+def make_codegen(args, externs=None):
+    from c_script import CodeGen
+
+    return CodeGen(externs=externs, unchecked_alloc=args.unchecked_alloc,
+                   bounds_checks=args.bounds_checks, profile=args.profile or args.profile_loops,
+                   profile_loops=args.profile_loops)
+
+def generate_ir(path, args, ll_filename, timer, externs=None):
+    if args.compile:
+        for flag in ('unchecked_alloc', 'bounds_checks', 'profile', 'profile_loops'):
+            if getattr(args, flag):
+                sys.exit(f"--{flag.replace('_', '-')} is not supported by the Rust frontend (-c)")
+        with timer.phase('frontend build'):
+            codegen_binary = toolchain.codegen_binary()
+        with timer.phase('frontend'):
+            subprocess.run([codegen_binary, path, "-o", ll_filename])
+        with open(ll_filename, 'r') as f:
+            return f.read()
+
+    with timer.phase('import'):
+        from c_script import CodeGen
+
+    ast = parse_file(path, args, timer)
+    if ast is None:
+        sys.exit(1)
+    with timer.phase('codegen'):
+        codegen = make_codegen(args, externs)
+        codegen.generate(ast)
+    with timer.phase('serialize'):
+        ir_text = str(codegen.module)
+    if timer.enabled:
+        timer.count('ir_instructions', sum(len(block.instructions) for func in codegen.module.functions
+                                           for block in func.blocks))
+    return ir_text
+
+def interpret(args, start_time, timer):
+    # Tiered execution: interpret the AST, JIT-compile what gets hot
+    import ctypes
+
+    if args.compile:
+        sys.exit("--interp is not supported by the Rust frontend (-c)")
+    if len(args.inputs) > 1:
+        sys.exit("--interp runs a single input file")
+    if args.profile or args.profile_loops:
+        sys.exit("--profile instruments compiled code and is not supported with --interp")
+    ast = parse_file(args.inputs[0], args, timer)
+    if ast is None:
+        sys.exit(1)
+
+    with timer.phase('runtime'):
+        lib = ctypes.CDLL(toolchain.runtime_library('shared'))
+    interp = interpreter.Interpreter(lib, hot_threshold=args.hot_threshold,
+                                     unchecked_alloc=args.unchecked_alloc, bounds_checks=args.bounds_checks,
+                                     cpu=args.mcpu or '', features=args.mattr or '',
+                                     opt_level=max(args.opt_level, 2))
+    with timer.phase('interpret'):
+        interp.run(ast)
+    print(f"interp: wall time {time.perf_counter() - start_time:.3f}s", file=sys.stderr)
+    if interp.compiled:
+        print(f"interp: native code for {', '.join(interp.compiled)}", file=sys.stderr)
+    if interp.failed:
+        print(f"interp: not compilable, kept interpreted: {', '.join(interp.failed)}", file=sys.stderr)
+
+def emit(ir_text, ll_filename, o_filename, bc_filename, args, timer):
+    use_llc = args.llc
+    if not use_llc:
+        try:
+            emit_in_process(ir_text, o_filename, bc_filename, args, timer)
+        except ImportError:
+            print("llvmlite.binding is unavailable, falling back to llc")
+            use_llc = True
+        else:
+            if args.debug and not args.compile:
+                with open(ll_filename, 'w') as f:
+                    f.write(ir_text)
+
+    if use_llc:
+        # The installed llc may be older than the LLVM inside llvmlite, so it
+        # is given the unoptimized IR and only applies its own -O level
+        if args.emit == 'bc' or args.print_after_opt:
+            sys.exit("--emit bc and --print-after-opt require llvmlite.binding")
+        emit_with_llc(ir_text, ll_filename, o_filename, args, timer)
+
+    if not args.debug and os.path.exists(ll_filename):
+        os.remove(ll_filename)
+
+def link(o_filenames, args, timer):
+    # Rust runtime, built by cargo only when its sources changed
+    with timer.phase('runtime'):
+        runtime_lib = toolchain.runtime_library('static')
+
+    print("Linking...")
+    with timer.phase('link'):
+        return subprocess.run(['gcc'] + o_filenames + [runtime_lib, '-o', args.output, '-lpthread', '-ldl'])
+
+def build(args, compile_cache, start_time, timer):
+    if args.interp:
+        return interpret(args, start_time, timer)
+    if args.stream:
+        return build_streaming(args, start_time, timer)
+    if args.incremental:
+        return build_incremental(args, start_time, timer)
+    if len(args.inputs) > 1:
+        return build_units(args, compile_cache, start_time, timer)
+
+    path = args.inputs[0]
+    ll_filename = args.output + '.ll'
+    o_filename = args.output + '.o'
+    bc_filename = args.output + '.bc'
+
+    key = None
+    if compile_cache is not None and not args.jit and not args.print_after_opt:
+        with timer.phase('cache'):
+            key = cache_key(compile_cache, args, path)
+            hit = compile_cache.fetch(key, cache_outputs(args, o_filename))
+        if hit:
+            # Skips lexing, parsing, codegen, emission and linking entirely
+            if args.run and args.emit == 'exe':
+                run_output(args, start_time, timer)
+            return
+
+    ir_text = generate_ir(path, args, ll_filename, timer)
+
+    if args.jit:
+        if args.compile and not args.debug:
+            os.remove(ll_filename)
+        run_jit([ir_text], args, timer)
+        print(f"jit: wall time {time.perf_counter() - start_time:.3f}s", file=sys.stderr)
+        return
+
+    emit(ir_text, ll_filename, o_filename, bc_filename, args, timer)
+
+    if args.emit != 'exe':
+        if key is not None:
+            compile_cache.store(key, cache_outputs(args, o_filename))
+        return
+
+    result = link([o_filename], args, timer)
+    if key is not None and result.returncode == 0:
+        compile_cache.store(key, cache_outputs(args, o_filename))
+
+    if not args.debug:
+        os.remove(o_filename)
+
+    if args.run:
+        run_output(args, start_time, timer)
+
+def unit_filename(args, index, path, ext):
+    # Per-unit outputs of a multi-file build: <output>.<n>.<stem><ext>
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{args.output}.{index}.{stem}{ext}"
+
+def unit_signatures(path):
+    with open(path, 'r') as f:
+        return scan_signatures(f.read())
+
+def compile_unit(index, path, externs, args, compile_cache):
+    # Compiles one file of a multi-file build to its own module. Returns the
+    # IR text for --jit, otherwise the object (or bitcode) filename, and the
+    # unit's phase timings (units may run in worker processes).
+    ll_filename = unit_filename(args, index, path, '.ll')
+    o_filename = unit_filename(args, index, path, '.o')
+    bc_filename = unit_filename(args, index, path, '.bc')
+    timer = phases.PhaseTimer(enabled=args.time_phases is not None)
+
+    if args.jit:
+        ir_text = generate_ir(path, args, ll_filename, timer, externs)
+        if args.compile and not args.debug:
+            os.remove(ll_filename)
+        return ir_text, timer
+
+    output = bc_filename if args.emit == 'bc' else o_filename
+    name = 'bitcode' if args.emit == 'bc' else 'object'
+    key = None
+    if compile_cache is not None and not args.print_after_opt:
+        # Declarations of the other units end up in this object too
+        with timer.phase('cache'):
+            key = cache_key(compile_cache, args, path, {'externs': repr(externs), 'emit': args.emit + '-unit'})
+            hit = compile_cache.fetch(key, {name: output})
+        if hit:
+            return output, timer
+
+    ir_text = generate_ir(path, args, ll_filename, timer, externs)
+    emit(ir_text, ll_filename, o_filename, bc_filename, args, timer)
+    if key is not None:
+        compile_cache.store(key, {name: output})
+    return output, timer
+
+def map_units(func, jobs, *iterables):
+    # Runs func over the units in a process pool, or inline for -j 1
+    if jobs == 1:
+        return list(map(func, *iterables))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(func, *iterables))
+
+def build_units(args, compile_cache, start_time, timer):
+    # Separate compilation: every input becomes its own module and object
+    # file, compiled in parallel, followed by a single link
+    paths = args.inputs
+    jobs = min(args.jobs or os.cpu_count() or 1, len(paths))
+
+    # Every unit declares the functions the other units define
+    signatures = map_units(unit_signatures, jobs, paths)
+    externs = []
+    owner = {}
+    for path, unit in zip(paths, signatures):
+        for signature in unit:
+            name = signature[0]
+            if name in owner:
+                sys.exit(f"{path}: function {name} is already defined in {owner[name]}")
+            owner[name] = path
+            externs.append(signature)
+
+    n = len(paths)
+    with timer.phase('units'):
+        results = map_units(compile_unit, jobs, range(n), paths, [externs] * n,
+                            [args] * n, [compile_cache] * n)
+    outputs = []
+    for output, unit_timer in results:
+        outputs.append(output)
+        timer.merge(unit_timer)
+
+    if args.jit:
+        run_jit(outputs, args, timer)
+        print(f"jit: wall time {time.perf_counter() - start_time:.3f}s", file=sys.stderr)
+        return
+
+    if args.emit != 'exe':
+        return
+
+    result = link(outputs, args, timer)
+    if result.returncode != 0:
+        sys.exit(result.returncode)
+
+    if not args.debug:
+        for filename in outputs:
+            os.remove(filename)
+
+    if args.run:
+        run_output(args, start_time, timer)
+
+def compile_function_unit(unit, args, directory):
+    # Compiles one unit of an incremental build into directory. Returns the
+    # files to cache ({'module': .ll, 'object': .o}) and the unit's timings.
+    timer = phases.PhaseTimer(enabled=args.time_phases is not None)
+    stem = os.path.join(directory, unit.key)
+    with timer.phase('codegen'):
+        codegen = make_codegen(args, unit.externs)
+        codegen.generate(unit.program)
+    with timer.phase('serialize'):
+        ir_text = str(codegen.module)
+    outputs = {'module': stem + '.module.ll', 'object': stem + '.o'}
+    with open(outputs['module'], 'w') as f:
+        f.write(ir_text)
+    emit(ir_text, stem + '.ll', outputs['object'], stem + '.bc', args, timer)
+    return outputs, timer
+
+def build_incremental(args, start_time, timer):
+    # --incremental: every function is compiled to its own module and object
+    # file, cached by incremental.split's keys, and only the functions whose
+    # key changed are compiled again before the link
+    if args.compile:
+        sys.exit("--incremental is not supported by the Rust frontend (-c)")
+    if len(args.inputs) > 1:
+        sys.exit("--incremental builds a single input file")
+    if args.emit != 'exe':
+        sys.exit("--incremental builds executables (or runs the program with --jit)")
+
+    ast = parse_file(args.inputs[0], args, timer)
+    if ast is None:
+        sys.exit(1)
+    with timer.phase('split'):
+        units = incremental.split(ast, codegen_flags(args), toolchain.host_triple())
+
+    function_cache = cache.CompileCache(directory=os.path.join(toolchain.cache_dir(), 'functions'),
+                                        max_bytes=args.cache_size * 1024 * 1024)
+    names = ('module', 'object')
+    with timer.phase('lookup'):
+        found = [function_cache.lookup(unit.key, names) for unit in units]
+    missing = [unit for unit, paths in zip(units, found) if paths is None]
+
+    if missing:
+        jobs = min(args.jobs or os.cpu_count() or 1, len(missing))
+        with tempfile.TemporaryDirectory() as directory:
+            n = len(missing)
+            with timer.phase('units'):
+                results = map_units(compile_function_unit, jobs, missing, [args] * n, [directory] * n)
+            for unit, (outputs, unit_timer) in zip(missing, results):
+                function_cache.store(unit.key, outputs, evict=False)
+                timer.merge(unit_timer)
+        function_cache.evict()
+        found = [paths or function_cache.lookup(unit.key, names) for unit, paths in zip(units, found)]
+
+    print(f"incremental: reused {len(units) - len(missing)}/{len(units)} functions"
+          + (f", recompiled {', '.join(unit.name for unit in missing)}" if 0 < len(missing) <= 10 else ''),
+          file=sys.stderr)
+
+    if args.jit:
+        ir_texts = []
+        for paths in found:
+            with open(paths['module']) as f:
+                ir_texts.append(f.read())
+        run_jit(ir_texts, args, timer)
+        print(f"jit: wall time {time.perf_counter() - start_time:.3f}s", file=sys.stderr)
+        return
+
+    result = link([paths['object'] for paths in found], args, timer)
+    if result.returncode != 0:
+        sys.exit(result.returncode)
+    if args.run:
+        run_output(args, start_time, timer)
+
+def build_streaming(args, start_time, timer):
+    # --stream: every function is compiled to an object file as soon as it
+    # has been parsed, and its tokens, AST and IR are dropped before the
+    # next one is read. Only signatures, imports and the top-level
+    # statements (which become main) are kept until the end.
+    from c_script.folding import fold, Folder
+    from c_script.nodes import FunctionDef, Import, Program
+
+    if args.compile:
+        sys.exit("--stream is not supported by the Rust frontend (-c)")
+    if len(args.inputs) > 1:
+        sys.exit("--stream builds a single input file")
+    if args.emit != 'exe' or args.jit:
+        sys.exit("--stream links an executable (it cannot be combined with --emit or --jit)")
+
+    with open(args.inputs[0], 'r') as f:
+        data = f.read()
+    builder = incremental.UnitBuilder(codegen_flags(args), toolchain.host_triple())
+    function_cache = None
+    if args.incremental:
+        function_cache = cache.CompileCache(directory=os.path.join(toolchain.cache_dir(), 'functions'),
+                                            max_bytes=args.cache_size * 1024 * 1024)
+    names = ('module', 'object')
+    objects = []
+    statements = []
+    units = reused = 0
+
+    def compile_unit(unit, directory):
+        nonlocal units, reused
+        units += 1
+        if function_cache is not None:
+            paths = function_cache.lookup(unit.key, names)
+            if paths is not None:
+                reused += 1
+                return paths['object']
+        outputs, unit_timer = compile_function_unit(unit, args, directory)
+        timer.merge(unit_timer)
+        if function_cache is None:
+            os.remove(outputs['module'])
+            return outputs['object']
+        function_cache.store(unit.key, outputs, evict=False)
+        os.remove(outputs['module'])
+        os.remove(outputs['object'])
+        return function_cache.lookup(unit.key, names)['object']
+
+    with tempfile.TemporaryDirectory() as directory:
+        stream = iter_statements(data)
+        while True:
+            with timer.phase('parse'):
+                stmt = next(stream, Ellipsis)
+            if stmt is Ellipsis:
+                break
+            if stmt is None:
+                sys.exit(1)
+            if timer.enabled:
+                timer.count('top_level_statements', 1)
+            if isinstance(stmt, Import):
+                builder.add_import(stmt)
+            elif isinstance(stmt, FunctionDef):
+                if not args.no_fold:
+                    with timer.phase('fold'):
+                        stmt, = Folder().fold_functiondef(stmt)
+                objects.append(compile_unit(builder.function(stmt), directory))
+            else:
+                statements.append(stmt)
+
+        if statements and not args.no_fold:
+            with timer.phase('fold'):
+                statements = fold(Program(statements)).stmts
+        main = builder.main(statements)
+        statements = None
+        if main is not None:
+            objects.append(compile_unit(main, directory))
+        if function_cache is not None:
+            function_cache.evict()
+            print(f"incremental: reused {reused}/{units} functions", file=sys.stderr)
+
+        result = link(objects, args, timer)
+    if result.returncode != 0:
+        sys.exit(result.returncode)
+    if args.run:
+        run_output(args, start_time, timer)
+
+def make_arg_parser():
     arg_parser = argparse.ArgumentParser(description='C-Script compiler')
-    arg_parser.add_argument('input', help='input file')
+    arg_parser.add_argument('inputs', help='input files (several files are compiled separately and linked together)',
+                            nargs='*', metavar='input')
     arg_parser.add_argument('-o', '--output', help='output file',
                             default='a.out')
     arg_parser.add_argument('-d', '--debug', help="don't delete the output files",
@@ -31,39 +549,159 @@ def main():
                             action='store_true')
     arg_parser.add_argument('-c', '--compile', help="compile the output file",
                             action='store_true')
-    args = arg_parser.parse_args()
-    ll_filename = args.output + '.ll'
+    arg_parser.add_argument('--jit', help="run the program in-process with the LLVM JIT instead of linking an executable",
+                            action='store_true')
+    arg_parser.add_argument('--interp', help="run the program in the AST interpreter, compiling hot functions and loops to native code with the JIT",
+                            action='store_true')
+    arg_parser.add_argument('--hot-threshold', help="calls plus loop iterations after which --interp compiles a function, or a running loop, to native code",
+                            type=int, default=interpreter.HOT_THRESHOLD, metavar='N')
+    arg_parser.add_argument('--emit', help="stop after producing an object file (obj) or LLVM bitcode (bc)",
+                            choices=['exe', 'obj', 'bc'], default='exe')
+    arg_parser.add_argument('--llc', help="lower to an object file with the external llc instead of in-process",
+                            action='store_true')
+    arg_parser.add_argument('--mcpu', help="target CPU name, or 'native' for the host CPU and its features")
+    arg_parser.add_argument('--mattr', help="target features, e.g. '+avx2,-sse4.1'")
+    arg_parser.add_argument('-O', dest='opt_level', help="optimization level (0-3), -O2 is recommended for release builds",
+                            type=int, choices=range(4), default=0, metavar='LEVEL')
+    arg_parser.add_argument('--no-fold', help="skip constant folding and dead code removal on the AST before code generation",
+                            action='store_true')
+    arg_parser.add_argument('--unchecked-alloc', help="release mode: malloc/free skip allocation tracking (no double-free or invalid-pointer detection)",
+                            action='store_true')
+    arg_parser.add_argument('--bounds-checks', help="check array indices and pointer dereferences at run time (checks proven redundant are left out)",
+                            action='store_true')
+    arg_parser.add_argument('--profile', help="instrument functions to count calls and time them; the program writes a report to stderr, <prefix>.json and <prefix>.folded at exit ($CSCRIPT_PROFILE, default cscript-profile)",
+                            action='store_true')
+    arg_parser.add_argument('--profile-loops', help="like --profile, and also count the iterations of every loop",
+                            action='store_true')
+    arg_parser.add_argument('--print-after-opt', help="print the LLVM IR after the optimization pipeline has run",
+                            action='store_true')
+    arg_parser.add_argument('-j', '--jobs', help="number of files to compile in parallel (default: CPU count), or of compile server workers",
+                            type=int, default=None)
+    arg_parser.add_argument('--cache', help="reuse (and store) compile results in the compile cache",
+                            action='store_true')
+    arg_parser.add_argument('--incremental', help="compile every function to its own cached object file and recompile only the functions that changed",
+                            action='store_true')
+    arg_parser.add_argument('--stream', help="compile each function as soon as it is parsed and drop it before reading on, keeping compiler memory flat on large programs",
+                            action='store_true')
+    arg_parser.add_argument('--cache-size', help="compile cache size limit in MiB (least recently used entries are evicted)",
+                            type=int, default=cache.DEFAULT_MAX_BYTES // (1024 * 1024))
+    arg_parser.add_argument('--cache-stats', help="print compile cache hits, misses and bytes saved",
+                            action='store_true')
+    arg_parser.add_argument('--time-phases', help="report wall time, CPU time (including child processes) and peak RSS of every compiler phase on stderr, and write them to this JSON file if given",
+                            nargs='?', const='', default=None, metavar='JSON')
+    arg_parser.add_argument('--serve', help="run a compile server on this Unix socket (default: $XDG_RUNTIME_DIR/c-script.sock)",
+                            nargs='?', const='', default=None, metavar='SOCKET')
+    arg_parser.add_argument('--server', help="send the compile to the compile server on this socket instead of compiling here",
+                            nargs='?', const='', default=None, metavar='SOCKET')
+    return arg_parser
 
-    if args.compile:
-        subprocess.run(["cargo", "run", "--manifest-path", "rust/Cargo.toml", "--bin", "codegen",  "--", args.input, "-o", ll_filename])
-    else:
-        with open(args.input, 'r') as f:
-            data = f.read()
+def run(args, arg_parser, start_time):
+    if not args.inputs:
+        if args.cache_stats:
+            print_cache_stats(cache.CompileCache(max_bytes=args.cache_size * 1024 * 1024))
+            return
+        arg_parser.error("the following arguments are required: input")
 
-        ast = parser.parse(data, lexer=lexer)
-        codegen = CodeGen()
-        codegen.generate(ast)
+    compile_cache = None
+    if args.cache or args.cache_stats:
+        compile_cache = cache.CompileCache(max_bytes=args.cache_size * 1024 * 1024)
+    timer = phases.PhaseTimer(enabled=args.time_phases is not None)
+    build(args, compile_cache if args.cache else None, start_time, timer)
 
-        with open(ll_filename, 'w') as f:
-            f.write(str(codegen.module))
+    if args.cache_stats:
+        print_cache_stats(compile_cache)
+    if timer.enabled:
+        report_phases(args, timer, start_time)
 
-    o_filename = args.output + '.o'
-    subprocess.run([LLC, '-relocation-model=pic', '-filetype=obj', ll_filename, '-o', o_filename])
+def report_phases(args, timer, start_time):
+    wall = time.perf_counter() - start_time
+    timer.report(wall)
+    if args.time_phases:
+        timer.write_json(args.time_phases, wall, version=__version__, inputs=args.inputs,
+                         frontend='rust' if args.compile else 'python', opt_level=args.opt_level)
 
-    # Build Rust runtime
-    print("Building Rust runtime...")
-    subprocess.run(['cargo', 'build', '--release', '--manifest-path', 'runtime/Cargo.toml'], check=True)
+def warm_up():
+    # Compile server worker initializer: pay for everything that does not
+    # depend on the request once
+    from c_script import CodeGen, backend, get_lexer, get_parser
 
-    # Link
-    print("Linking...")
-    runtime_lib = 'runtime/target/release/libruntime.a'
-    subprocess.run(['gcc', o_filename, runtime_lib, '-o', args.output, '-lpthread', '-ldl'])
+    get_lexer()
+    get_parser()
+    CodeGen()
+    backend.create_target_machine()
+    toolchain.runtime_library('static')
 
-    if not args.debug:
-        subprocess.run(['rm', ll_filename, o_filename])
+def run_request(args, arg_parser, start_time):
+    # run() for the compile server, with its exit status as a return code
+    try:
+        run(args, arg_parser, start_time)
+    except SystemExit as e:
+        if isinstance(e.code, str):
+            print(e.code, file=sys.stderr)
+            return 1
+        return e.code or 0
+    except Exception as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
 
-    if args.run:
-        subprocess.run([f"./{args.output}"])
+def serve_request(argv, cwd):
+    # Runs one client request in a compile server worker
+    start_time = time.perf_counter()
+    arg_parser = make_arg_parser()
+    returncode = 0
+    args = None
+    with server.captured_output() as output:
+        try:
+            os.chdir(cwd)
+            args = arg_parser.parse_args(argv)
+            # Requests already run in parallel across the server's workers
+            if args.jobs is None:
+                args.jobs = 1
+            if args.jit or args.interp:
+                # These run the program too, which must not touch the worker
+                returncode = server.run_forked(lambda: run_request(args, arg_parser, start_time))
+            else:
+                returncode = run_request(args, arg_parser, start_time)
+        except SystemExit as e:
+            returncode = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            print(f"error: {e}", file=sys.stderr)
+            returncode = 1
+
+    outputs = []
+    if args is not None:
+        for filename in (args.output, args.output + '.o', args.output + '.bc'):
+            if os.path.exists(filename):
+                outputs.append(os.path.abspath(filename))
+    return {'returncode': returncode, 'output': output[0], 'outputs': outputs}
+
+def compile_on_server(args, argv, start_time):
+    # Thin client: the server compiles, the program itself runs here
+    socket_path = args.server or server.default_socket_path()
+    argv = [arg for arg in argv if arg not in ('-r', '--run') and not arg.startswith('--server')]
+    if args.server:
+        argv = [arg for arg in argv if arg != args.server]
+    response = server.request(socket_path, argv, os.getcwd())
+    sys.stdout.write(response['output'])
+    if response['returncode'] != 0:
+        sys.exit(response['returncode'])
+    if args.run and args.emit == 'exe' and not args.jit:
+        # --time-phases is reported by the server, which did the compiling
+        run_output(args, start_time, phases.PhaseTimer(enabled=False))
+
+def main():
+    start_time = time.perf_counter()
+    arg_parser = make_arg_parser()
+    args = arg_parser.parse_args()
+
+    if args.serve is not None:
+        server.serve(args.serve or server.default_socket_path(), serve_request,
+                     workers=args.jobs, initializer=warm_up)
+    elif args.server is not None:
+        compile_on_server(args, sys.argv[1:], start_time)
+    else:
+        run(args, arg_parser, start_time)
 
 if __name__ == "__main__":
     main()
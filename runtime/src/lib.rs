@@ -1,60 +1,264 @@
-use std::collections::HashMap;
+use std::cell::{Cell, RefCell};
+use std::collections::{HashMap, VecDeque};
+use std::hash::{BuildHasherDefault, Hasher};
 use std::ffi::{CStr, CString};
 use std::fs::File;
-use std::io::{Read, Write};
+use std::io::{BufReader, BufWriter, Read, Write};
 use std::os::raw::{c_char, c_float, c_int};
+use std::os::unix::io::AsRawFd;
 use std::ptr;
-use std::sync::Mutex;
+use std::sync::atomic::{AtomicI32, AtomicU64, Ordering};
+use std::sync::{Arc, Condvar, Mutex};
+use std::time::Instant;
 
 use lazy_static::lazy_static;
 
 lazy_static! {
 
     // Global file handle table
-    static ref FILE_HANDLES: Mutex<HashMap<i32, File>> = {
-        Mutex::new(HashMap::new())
+    static ref FILE_HANDLES: Mutex<HandleTable> = {
+        unsafe {
+            libc::atexit(flush_files_at_exit);
+        }
+        Mutex::new(HandleTable {
+            slots: Vec::new(),
+            free: Vec::new(),
+        })
+    };
+
+    // Strings returned by cscript_fread. Each read is its own allocation, so
+    // it stays valid after later reads and after fclose; they are released
+    // together at exit.
+    static ref READS: Mutex<Vec<CString>> = {
+        unsafe {
+            libc::atexit(release_reads_at_exit);
+        }
+        Mutex::new(Vec::new())
     };
 
-    // Global allocation table for malloc/free tracking
-    static ref ALLOCATIONS: Mutex<HashMap<usize, AllocationInfo>> = {
+    // Read-only file mappings handed out by cscript_mmap: address -> length
+    static ref MAPPINGS: Mutex<HashMap<usize, usize>> = {
         Mutex::new(HashMap::new())
     };
+
+    // Allocation tracking for malloc/free, sharded by address so that
+    // threads freeing unrelated blocks do not contend on one lock
+    static ref ALLOCATIONS: Vec<Mutex<AllocationShard>> = {
+        (0..ALLOCATION_SHARDS).map(|_| Mutex::new(AllocationShard {
+            blocks: HashMap::default(),
+            quarantine: VecDeque::with_capacity(QUARANTINE_PER_SHARD + 1),
+        })).collect()
+    };
 }
 
-#[derive(Debug, Clone)]
-struct AllocationInfo {
-    size: usize,
-    is_valid: bool,
+// An open file. Handle n refers to slots[n - 1]; closed slots are reused.
+enum Stream {
+    Reader(BufReader<File>),
+    Writer(BufWriter<File>),
+}
+
+struct HandleTable {
+    slots: Vec<Option<Stream>>,
+    free: Vec<usize>,
+}
+
+impl HandleTable {
+    fn insert(&mut self, stream: Stream) -> c_int {
+        let index = match self.free.pop() {
+            Some(index) => {
+                self.slots[index] = Some(stream);
+                index
+            }
+            None => {
+                self.slots.push(Some(stream));
+                self.slots.len() - 1
+            }
+        };
+        index as c_int + 1
+    }
+
+    fn get_mut(&mut self, handle: c_int) -> Option<&mut Stream> {
+        if handle <= 0 {
+            return None;
+        }
+        self.slots.get_mut(handle as usize - 1)?.as_mut()
+    }
+
+    fn remove(&mut self, handle: c_int) -> Option<Stream> {
+        if handle <= 0 {
+            return None;
+        }
+        let index = handle as usize - 1;
+        let stream = self.slots.get_mut(index)?.take()?;
+        self.free.push(index);
+        Some(stream)
+    }
+
+    fn flush_writers(&mut self) {
+        for slot in self.slots.iter_mut() {
+            if let Some(Stream::Writer(file)) = slot {
+                let _ = file.flush();
+            }
+        }
+    }
+}
+
+fn get_handles() -> std::sync::MutexGuard<'static, HandleTable> {
+    FILE_HANDLES.lock().unwrap_or_else(|e| e.into_inner())
+}
+
+// Writes are buffered per handle; files the program never closed still get
+// their data at exit
+extern "C" fn flush_files_at_exit() {
+    get_handles().flush_writers();
+}
+
+// Console output. Prints go to a process-wide buffer that is written to fd 1
+// when it fills up, on an explicit cscript_flush(), before cscript_system()
+// runs a child process and at exit. When stdout is a terminal the buffer is
+// also flushed after every line, and CSCRIPT_UNBUFFERED=1 flushes after
+// every print.
+
+const CONSOLE_CAPACITY: usize = 64 * 1024;
+
+#[derive(PartialEq)]
+enum ConsoleMode {
+    Block,
+    Line,
+    Unbuffered,
+}
+
+struct Console {
+    buf: Vec<u8>,
+    mode: ConsoleMode,
 }
 
-static mut NEXT_HANDLE: i32 = 1;
+lazy_static! {
+    static ref CONSOLE: Mutex<Console> = {
+        let mode = if std::env::var_os("CSCRIPT_UNBUFFERED").map_or(false, |v| v != "0") {
+            ConsoleMode::Unbuffered
+        } else if unsafe { libc::isatty(1) } == 1 {
+            ConsoleMode::Line
+        } else {
+            ConsoleMode::Block
+        };
+        unsafe {
+            libc::atexit(flush_at_exit);
+        }
+        Mutex::new(Console {
+            buf: Vec::with_capacity(CONSOLE_CAPACITY),
+            mode,
+        })
+    };
+}
 
-fn get_handles() -> &'static Mutex<HashMap<i32, File>> {
-    &FILE_HANDLES
+extern "C" fn flush_at_exit() {
+    cscript_flush();
+}
+
+impl Console {
+    fn flush(&mut self) {
+        let mut data = &self.buf[..];
+        while !data.is_empty() {
+            let n = unsafe { libc::write(1, data.as_ptr() as *const libc::c_void, data.len()) };
+            if n < 0 {
+                if std::io::Error::last_os_error().kind() == std::io::ErrorKind::Interrupted {
+                    continue;
+                }
+                // Nowhere left to report it, drop the output
+                break;
+            }
+            data = &data[n as usize..];
+        }
+        self.buf.clear();
+    }
+
+    // Called once a print (or a batch of prints) has been appended
+    fn end_print(&mut self) {
+        if self.mode != ConsoleMode::Block || self.buf.len() >= CONSOLE_CAPACITY {
+            self.flush();
+        }
+    }
+
+    fn push_int(&mut self, val: c_int) {
+        // Digits are produced backwards into a small stack buffer
+        let mut digits = [0u8; 12];
+        let mut pos = digits.len();
+        let mut n = (val as i64).unsigned_abs();
+        loop {
+            pos -= 1;
+            digits[pos] = b'0' + (n % 10) as u8;
+            n /= 10;
+            if n == 0 {
+                break;
+            }
+        }
+        if val < 0 {
+            pos -= 1;
+            digits[pos] = b'-';
+        }
+        self.buf.extend_from_slice(&digits[pos..]);
+        self.buf.push(b'\n');
+    }
+}
+
+fn console() -> std::sync::MutexGuard<'static, Console> {
+    CONSOLE.lock().unwrap_or_else(|e| e.into_inner())
+}
+
+// Writes out buffered console output and everything written to files that
+// are still open, like fflush(NULL)
+#[no_mangle]
+pub extern "C" fn cscript_flush() {
+    console().flush();
+    get_handles().flush_writers();
 }
 
 #[no_mangle]
 pub extern "C" fn cscript_print_int(val: c_int) {
-    println!("{}", val);
+    let mut out = console();
+    out.push_int(val);
+    out.end_print();
+}
+
+#[no_mangle]
+pub extern "C" fn cscript_print_int_array(vals: *const c_int, len: c_int) {
+    if vals.is_null() || len <= 0 {
+        return;
+    }
+    let vals = unsafe { std::slice::from_raw_parts(vals, len as usize) };
+    let mut out = console();
+    for &val in vals {
+        out.push_int(val);
+        if out.buf.len() >= CONSOLE_CAPACITY {
+            out.flush();
+        }
+    }
+    out.end_print();
 }
 
 #[no_mangle]
 pub extern "C" fn cscript_print_float(val: c_float) {
-    println!("{}", val);
+    let mut out = console();
+    let _ = writeln!(out.buf, "{}", val);
+    out.end_print();
 }
 
 #[no_mangle]
 pub extern "C" fn cscript_print_string(val: *const c_char) {
+    let mut out = console();
     if val.is_null() {
-        println!("(null)");
-        return;
-    }
-    let c_str = unsafe { CStr::from_ptr(val) };
-    if let Ok(s) = c_str.to_str() {
-        println!("{}", s);
+        out.buf.extend_from_slice(b"(null)\n");
     } else {
-        println!("(invalid utf-8)");
+        let bytes = unsafe { CStr::from_ptr(val) }.to_bytes();
+        if std::str::from_utf8(bytes).is_ok() {
+            out.buf.extend_from_slice(bytes);
+            out.buf.push(b'\n');
+        } else {
+            out.buf.extend_from_slice(b"(invalid utf-8)\n");
+        }
     }
+    out.end_print();
 }
 
 #[no_mangle]
@@ -66,25 +270,16 @@ pub extern "C" fn cscript_fopen(filename: *const c_char, mode: *const c_char) ->
     let filename_str = unsafe { CStr::from_ptr(filename).to_string_lossy() };
     let mode_str = unsafe { CStr::from_ptr(mode).to_string_lossy() };
 
-    let file = if mode_str == "w" {
-        File::create(filename_str.as_ref())
+    let stream = if mode_str == "w" {
+        File::create(filename_str.as_ref()).map(|f| Stream::Writer(BufWriter::new(f)))
     } else if mode_str == "r" {
-        File::open(filename_str.as_ref())
+        File::open(filename_str.as_ref()).map(|f| Stream::Reader(BufReader::new(f)))
     } else {
         return -1;
     };
 
-    match file {
-        Ok(f) => {
-            let handles = get_handles();
-            let mut map = handles.lock().unwrap();
-            let handle = unsafe { NEXT_HANDLE };
-            unsafe {
-                NEXT_HANDLE += 1;
-            }
-            map.insert(handle, f);
-            handle
-        }
+    match stream {
+        Ok(stream) => get_handles().insert(stream),
         Err(_) => -1,
     }
 }
@@ -95,10 +290,8 @@ pub extern "C" fn cscript_fwrite(handle: c_int, data: *const c_char) -> c_int {
         return 0;
     }
 
-    let handles = get_handles();
-    let mut map = handles.lock().unwrap();
-
-    if let Some(file) = map.get_mut(&handle) {
+    let mut handles = get_handles();
+    if let Some(Stream::Writer(file)) = handles.get_mut(handle) {
         let data_slice = unsafe { CStr::from_ptr(data).to_bytes() };
         match file.write_all(data_slice) {
             Ok(_) => 1,
@@ -111,39 +304,144 @@ pub extern "C" fn cscript_fwrite(handle: c_int, data: *const c_char) -> c_int {
 
 #[no_mangle]
 pub extern "C" fn cscript_fclose(handle: c_int) -> c_int {
-    let handles = get_handles();
-    let mut map = handles.lock().unwrap();
-
-    if map.remove(&handle).is_some() {
-        0
-    } else {
-        -1
+    let stream = get_handles().remove(handle);
+    match stream {
+        Some(Stream::Writer(mut file)) => match file.flush() {
+            Ok(_) => 0,
+            Err(_) => -1,
+        },
+        Some(Stream::Reader(_)) => 0,
+        None => -1,
     }
 }
 
+// Reads up to size bytes and returns them as a null-terminated string. The
+// string is a new allocation owned by the runtime: it is not touched by later
+// reads or by cscript_fclose and lives until the program exits. Read loops
+// that should not allocate per call use cscript_fread_into instead.
 #[no_mangle]
 pub extern "C" fn cscript_fread(handle: c_int, size: c_int) -> *const c_char {
     if size <= 0 {
         return ptr::null();
     }
 
-    let handles = get_handles();
-    let mut map = handles.lock().unwrap();
+    let mut data = vec![0u8; size as usize];
+    let read = match get_handles().get_mut(handle) {
+        Some(Stream::Reader(file)) => file.read(&mut data),
+        _ => return ptr::null(),
+    };
+    match read {
+        Ok(n) => {
+            // Stop at an embedded NUL, as a C string would
+            let end = data[..n].iter().position(|&b| b == 0).unwrap_or(n);
+            data.truncate(end);
+            let s = unsafe { CString::from_vec_unchecked(data) };
+            let p = s.as_ptr();
+            reads().push(s);
+            p
+        }
+        Err(_) => ptr::null(),
+    }
+}
+
+fn reads() -> std::sync::MutexGuard<'static, Vec<CString>> {
+    READS.lock().unwrap_or_else(|e| e.into_inner())
+}
+
+extern "C" fn release_reads_at_exit() {
+    reads().clear();
+}
 
-    if let Some(file) = map.get_mut(&handle) {
-        let mut buffer = vec![0u8; size as usize];
-        match file.read(&mut buffer) {
+// Reads at most size - 1 bytes into the caller's buffer and null-terminates
+// them, so that nothing is allocated per read. Returns the number of bytes
+// read, 0 at end of file and -1 on error.
+#[no_mangle]
+pub extern "C" fn cscript_fread_into(handle: c_int, buf: *mut c_char, size: c_int) -> c_int {
+    if buf.is_null() || size <= 0 {
+        return -1;
+    }
+
+    let mut handles = get_handles();
+    if let Some(Stream::Reader(file)) = handles.get_mut(handle) {
+        let out = unsafe { std::slice::from_raw_parts_mut(buf as *mut u8, size as usize) };
+        let capacity = out.len() - 1;
+        match file.read(&mut out[..capacity]) {
             Ok(n) => {
-                buffer.truncate(n);
-                match CString::new(buffer) {
-                    Ok(c_string) => c_string.into_raw(),
-                    Err(_) => ptr::null(),
-                }
+                out[n] = 0;
+                n as c_int
+            }
+            Err(_) => {
+                out[0] = 0;
+                -1
             }
-            Err(_) => ptr::null(),
         }
     } else {
-        ptr::null()
+        -1
+    }
+}
+
+// Maps a whole file read-only and returns a pointer to its first byte, or
+// NULL if it cannot be opened or is empty. The pages are shared with the
+// page cache, so scanning the file copies nothing.
+#[no_mangle]
+pub extern "C" fn cscript_mmap(filename: *const c_char) -> *const c_char {
+    if filename.is_null() {
+        return ptr::null();
+    }
+
+    let filename_str = unsafe { CStr::from_ptr(filename).to_string_lossy() };
+    let file = match File::open(filename_str.as_ref()) {
+        Ok(f) => f,
+        Err(_) => return ptr::null(),
+    };
+    let len = match file.metadata() {
+        Ok(meta) => meta.len() as usize,
+        Err(_) => return ptr::null(),
+    };
+    if len == 0 {
+        return ptr::null();
+    }
+
+    // The mapping stays valid after the file is closed
+    let addr = unsafe {
+        libc::mmap(
+            ptr::null_mut(),
+            len,
+            libc::PROT_READ,
+            libc::MAP_PRIVATE,
+            file.as_raw_fd(),
+            0,
+        )
+    };
+    if addr == libc::MAP_FAILED {
+        return ptr::null();
+    }
+
+    MAPPINGS.lock().unwrap().insert(addr as usize, len);
+    addr as *const c_char
+}
+
+// Length of a mapping returned by cscript_mmap, or -1 for any other
+// pointer. C-Script indexes with 32-bit ints, so lengths are capped at
+// INT_MAX; bytes past that are mapped but not reachable by index.
+#[no_mangle]
+pub extern "C" fn cscript_mmap_len(addr: *const c_char) -> c_int {
+    match MAPPINGS.lock().unwrap().get(&(addr as usize)) {
+        Some(&len) => len.min(c_int::MAX as usize) as c_int,
+        None => -1,
+    }
+}
+
+#[no_mangle]
+pub extern "C" fn cscript_munmap(addr: *const c_char) -> c_int {
+    let len = match MAPPINGS.lock().unwrap().remove(&(addr as usize)) {
+        Some(len) => len,
+        None => return -1,
+    };
+    if unsafe { libc::munmap(addr as *mut libc::c_void, len) } == 0 {
+        0
+    } else {
+        -1
     }
 }
 
@@ -155,6 +453,10 @@ pub extern "C" fn cscript_system(command: *const c_char) -> c_int {
 
     let command_str = unsafe { CStr::from_ptr(command).to_string_lossy() };
 
+    // The child writes to the same stdout, everything printed so far has to
+    // come first, and it may read the files we have written
+    cscript_flush();
+
     // Use sh -c to execute the command string
     match std::process::Command::new("sh")
         .arg("-c")
@@ -183,6 +485,129 @@ pub extern "C" fn cscript_getenv(name: *const c_char) -> *const c_char {
     }
 }
 
+// Memory allocation. Blocks of up to 4 KiB come from per-thread size-class
+// arenas (free lists refilled from 256 KiB chunks), larger ones straight
+// from the system allocator. cscript_malloc/cscript_free also record every
+// live block in a sharded table so that frees and bounds checks can be
+// validated; a freed block stays in a bounded per-shard quarantine ring,
+// where a second free or a bounds check reports it, before its memory is
+// reused. cscript_malloc_unchecked/cscript_free_unchecked skip the tracking.
+
+const SIZE_CLASSES: [usize; 9] = [16, 32, 64, 128, 256, 512, 1024, 2048, 4096];
+const ARENA_CHUNK: usize = 256 * 1024;
+const BLOCK_ALIGN: usize = 16;
+const ALLOCATION_SHARDS: usize = 64;
+const QUARANTINE_PER_SHARD: usize = 64;
+// Unchecked blocks remember their size in front of the data
+const UNCHECKED_HEADER: usize = 16;
+
+struct AllocationInfo {
+    size: usize,
+    is_valid: bool,
+}
+
+// Addresses are already well distributed, a multiply is all the hashing
+// the allocation table needs
+#[derive(Default)]
+struct AddressHasher(u64);
+
+impl Hasher for AddressHasher {
+    fn finish(&self) -> u64 {
+        self.0
+    }
+
+    fn write(&mut self, bytes: &[u8]) {
+        for &b in bytes {
+            self.0 = (self.0 << 8 | b as u64).wrapping_mul(0x9E37_79B9_7F4A_7C15);
+        }
+    }
+
+    fn write_usize(&mut self, n: usize) {
+        self.0 = (n as u64 >> 4).wrapping_mul(0x9E37_79B9_7F4A_7C15);
+    }
+}
+
+struct AllocationShard {
+    blocks: HashMap<usize, AllocationInfo, BuildHasherDefault<AddressHasher>>,
+    // Freed blocks, oldest first, still in blocks with is_valid = false
+    quarantine: VecDeque<usize>,
+}
+
+fn allocation_shard(addr: usize) -> std::sync::MutexGuard<'static, AllocationShard> {
+    let index = ((addr as u64 >> 4).wrapping_mul(0x9E37_79B9_7F4A_7C15) >> 58) as usize;
+    ALLOCATIONS[index % ALLOCATION_SHARDS].lock().unwrap_or_else(|e| e.into_inner())
+}
+
+struct Arena {
+    free: [Vec<usize>; SIZE_CLASSES.len()],
+    next: usize,
+    remaining: usize,
+}
+
+thread_local! {
+    static ARENA: RefCell<Arena> = RefCell::new(Arena {
+        free: Default::default(),
+        next: 0,
+        remaining: 0,
+    });
+}
+
+fn size_class(size: usize) -> Option<usize> {
+    if size <= SIZE_CLASSES[0] {
+        return Some(0);
+    }
+    let class = (usize::BITS - (size - 1).leading_zeros()) as usize - 4;
+    if class < SIZE_CLASSES.len() {
+        Some(class)
+    } else {
+        None
+    }
+}
+
+impl Arena {
+    fn alloc(&mut self, class: usize) -> *mut u8 {
+        if let Some(addr) = self.free[class].pop() {
+            return addr as *mut u8;
+        }
+        let size = SIZE_CLASSES[class];
+        if self.remaining < size {
+            // Chunks are never returned, blocks freed by other threads may
+            // still point into them
+            let layout = std::alloc::Layout::from_size_align(ARENA_CHUNK, BLOCK_ALIGN).unwrap();
+            let chunk = unsafe { std::alloc::alloc(layout) };
+            if chunk.is_null() {
+                return chunk;
+            }
+            self.next = chunk as usize;
+            self.remaining = ARENA_CHUNK;
+        }
+        let addr = self.next;
+        self.next += size;
+        self.remaining -= size;
+        addr as *mut u8
+    }
+}
+
+fn raw_alloc(size: usize) -> *mut u8 {
+    match size_class(size) {
+        Some(class) => ARENA.with(|arena| arena.borrow_mut().alloc(class)),
+        None => {
+            let layout = std::alloc::Layout::from_size_align(size, BLOCK_ALIGN).unwrap();
+            unsafe { std::alloc::alloc(layout) }
+        }
+    }
+}
+
+fn raw_release(addr: usize, size: usize) {
+    match size_class(size) {
+        Some(class) => ARENA.with(|arena| arena.borrow_mut().free[class].push(addr)),
+        None => {
+            let layout = std::alloc::Layout::from_size_align(size, BLOCK_ALIGN).unwrap();
+            unsafe { std::alloc::dealloc(addr as *mut u8, layout) }
+        }
+    }
+}
+
 #[no_mangle]
 pub extern "C" fn cscript_malloc(size: c_int) -> *mut c_char {
     if size <= 0 {
@@ -190,19 +615,14 @@ pub extern "C" fn cscript_malloc(size: c_int) -> *mut c_char {
         return ptr::null_mut();
     }
 
-    // Allocate memory as a boxed slice
-    let layout = std::alloc::Layout::from_size_align(size as usize, 8).unwrap();
-    let ptr = unsafe { std::alloc::alloc(layout) as *mut c_char };
-
+    let ptr = raw_alloc(size as usize) as *mut c_char;
     if ptr.is_null() {
         eprintln!("malloc error: allocation failed for size {}", size);
         return ptr::null_mut();
     }
 
     // Track the allocation
-    let allocations = &ALLOCATIONS;
-    let mut map = allocations.lock().unwrap();
-    map.insert(
+    allocation_shard(ptr as usize).blocks.insert(
         ptr as usize,
         AllocationInfo {
             size: size as usize,
@@ -220,39 +640,66 @@ pub extern "C" fn cscript_free(ptr: *mut c_char) -> c_int {
         return -1;
     }
 
-    let allocations = &ALLOCATIONS;
-    let mut map = allocations.lock().unwrap();
-
     let addr = ptr as usize;
+    let mut shard = allocation_shard(addr);
 
     // Check if pointer exists in allocation table
-    if let Some(info) = map.get_mut(&addr) {
-        // Check for double-free
-        if !info.is_valid {
+    match shard.blocks.get_mut(&addr) {
+        Some(info) if !info.is_valid => {
             eprintln!("free error: double free detected at address 0x{:x}", addr);
             return -1;
         }
+        // Mark as freed (for use-after-free detection) and quarantine it
+        Some(info) => info.is_valid = false,
+        None => {
+            eprintln!(
+                "free error: pointer 0x{:x} was not allocated by malloc",
+                addr
+            );
+            return -1;
+        }
+    }
 
-        // Mark as freed (for use-after-free detection)
-        info.is_valid = false;
+    // Only the oldest quarantined block is forgotten and its memory reused
+    shard.quarantine.push_back(addr);
+    if shard.quarantine.len() > QUARANTINE_PER_SHARD {
+        let oldest = shard.quarantine.pop_front().unwrap();
+        let info = shard.blocks.remove(&oldest).unwrap();
+        drop(shard);
+        raw_release(oldest, info.size);
+    }
 
-        // Deallocate the memory
-        let layout = std::alloc::Layout::from_size_align(info.size, 8).unwrap();
-        unsafe {
-            std::alloc::dealloc(ptr as *mut u8, layout);
-        }
+    0
+}
 
-        // Keep in tracking table but marked invalid to detect double-free/use-after-free
-        // map.remove(&addr);
+// Release builds without any tracking: no double-free, invalid-pointer or
+// bounds detection, just the arenas
+#[no_mangle]
+pub extern "C" fn cscript_malloc_unchecked(size: c_int) -> *mut c_char {
+    if size <= 0 {
+        return ptr::null_mut();
+    }
+    let total = size as usize + UNCHECKED_HEADER;
+    let base = raw_alloc(total);
+    if base.is_null() {
+        return ptr::null_mut();
+    }
+    unsafe {
+        *(base as *mut usize) = total;
+        base.add(UNCHECKED_HEADER) as *mut c_char
+    }
+}
 
-        0
-    } else {
-        eprintln!(
-            "free error: pointer 0x{:x} was not allocated by malloc",
-            addr
-        );
-        -1
+#[no_mangle]
+pub extern "C" fn cscript_free_unchecked(ptr: *mut c_char) -> c_int {
+    if ptr.is_null() {
+        return 0;
+    }
+    unsafe {
+        let base = (ptr as *mut u8).sub(UNCHECKED_HEADER);
+        raw_release(base as usize, *(base as *const usize));
     }
+    0
 }
 
 #[no_mangle]
@@ -262,12 +709,10 @@ pub extern "C" fn cscript_check_bounds(ptr: *mut c_char, offset: c_int) -> c_int
         return 0;
     }
 
-    let allocations = &ALLOCATIONS;
-    let map = allocations.lock().unwrap();
-
     let addr = ptr as usize;
+    let shard = allocation_shard(addr);
 
-    if let Some(info) = map.get(&addr) {
+    if let Some(info) = shard.blocks.get(&addr) {
         if !info.is_valid {
             eprintln!(
                 "bounds check error: use-after-free detected at address 0x{:x}",
@@ -293,3 +738,623 @@ pub extern "C" fn cscript_check_bounds(ptr: *mut c_char, offset: c_int) -> c_int
         0
     }
 }
+
+// Bounds checks emitted by `main.py --bounds-checks`. Indexing a fixed-size
+// array is checked inline and only calls cscript_bounds_fail on failure;
+// pointers are looked up in the allocation and mapping tables.
+
+fn bounds_error(message: String, line: c_int) -> ! {
+    // Whatever the program printed before the bad access comes first
+    cscript_flush();
+    eprintln!("bounds check error: {} (line {})", message, line);
+    std::process::exit(1)
+}
+
+#[no_mangle]
+pub extern "C" fn cscript_bounds_fail(index: c_int, length: c_int, line: c_int) -> ! {
+    bounds_error(
+        format!("index {} out of range for array of length {}", index, length),
+        line,
+    )
+}
+
+// Size of the block ptr points to the start of, and whether it is still
+// live: a malloc'd block or a file mapping. None for anything else (stack
+// arrays, string constants, pointers into the middle of a block).
+fn block_extent(ptr: *const c_char) -> Option<(usize, bool)> {
+    let addr = ptr as usize;
+    if let Some(info) = allocation_shard(addr).blocks.get(&addr) {
+        return Some((info.size, info.is_valid));
+    }
+    MAPPINGS.lock().unwrap().get(&addr).map(|&len| (len, true))
+}
+
+#[no_mangle]
+pub extern "C" fn cscript_check_index(ptr: *const c_char, index: c_int, elem_size: c_int, line: c_int) {
+    if ptr.is_null() {
+        bounds_error("null pointer access".to_string(), line);
+    }
+    if let Some((size, is_valid)) = block_extent(ptr) {
+        if !is_valid {
+            bounds_error(format!("use-after-free at address 0x{:x}", ptr as usize), line);
+        }
+        let offset = index as i64 * elem_size as i64;
+        if offset < 0 || offset + elem_size as i64 > size as i64 {
+            bounds_error(
+                format!("index {} out of range for a block of {} bytes", index, size),
+                line,
+            );
+        }
+    }
+}
+
+// 1 if elements lo..=hi of ptr all lie in one live block, so a loop can
+// skip checking them one by one; 0 otherwise (including unknown pointers)
+#[no_mangle]
+pub extern "C" fn cscript_bounds_ok(ptr: *const c_char, lo: i64, hi: i64, elem_size: c_int) -> c_int {
+    if ptr.is_null() || lo < 0 {
+        return 0;
+    }
+    match block_extent(ptr) {
+        Some((size, true)) if (hi + 1) * elem_size as i64 <= size as i64 => 1,
+        _ => 0,
+    }
+}
+
+// Profiling hooks emitted by `main.py --profile`. Instrumented functions
+// call cscript_prof_enter on entry and cscript_prof_exit before every
+// return. Each thread records a calling context tree (one node per distinct
+// call path) with call counts and inclusive and self time in timestamp
+// counter ticks; the report is written at exit.
+
+struct CallNode {
+    func: u32,
+    parent: usize,
+    children: Vec<(u32, usize)>,
+    calls: u64,
+    total: u64,
+    own: u64,
+}
+
+struct ProfileFrame {
+    node: usize,
+    start: u64,
+    children: u64,
+}
+
+struct ThreadProfile {
+    // nodes[0] is the root, above the thread's outermost function
+    nodes: Vec<CallNode>,
+    stack: Vec<ProfileFrame>,
+}
+
+struct ProfileRegistry {
+    names: Vec<String>,
+    threads: Vec<Arc<Mutex<ThreadProfile>>>,
+    // Loop iteration counters (--profile-loops): counter address, label
+    loops: Vec<(usize, String)>,
+    start: (Instant, u64),
+}
+
+lazy_static! {
+    static ref PROFILE: Mutex<ProfileRegistry> = {
+        unsafe {
+            libc::atexit(write_profile_at_exit);
+        }
+        Mutex::new(ProfileRegistry {
+            names: Vec::new(),
+            threads: Vec::new(),
+            loops: Vec::new(),
+            start: (Instant::now(), ticks()),
+        })
+    };
+}
+
+#[cfg(not(target_arch = "x86_64"))]
+lazy_static! {
+    static ref EPOCH: Instant = Instant::now();
+}
+
+thread_local! {
+    static THREAD_PROFILE: Arc<Mutex<ThreadProfile>> = {
+        let profile = Arc::new(Mutex::new(ThreadProfile {
+            nodes: vec![CallNode {
+                func: u32::MAX,
+                parent: 0,
+                children: Vec::new(),
+                calls: 0,
+                total: 0,
+                own: 0,
+            }],
+            stack: Vec::new(),
+        }));
+        profile_registry().threads.push(profile.clone());
+        profile
+    };
+}
+
+fn profile_registry() -> std::sync::MutexGuard<'static, ProfileRegistry> {
+    PROFILE.lock().unwrap_or_else(|e| e.into_inner())
+}
+
+#[inline]
+fn ticks() -> u64 {
+    #[cfg(target_arch = "x86_64")]
+    unsafe {
+        core::arch::x86_64::_rdtsc()
+    }
+    #[cfg(not(target_arch = "x86_64"))]
+    {
+        EPOCH.elapsed().as_nanos() as u64
+    }
+}
+
+impl ThreadProfile {
+    fn child(&mut self, parent: usize, func: u32) -> usize {
+        if let Some(&(_, node)) = self.nodes[parent].children.iter().find(|&&(f, _)| f == func) {
+            return node;
+        }
+        let node = self.nodes.len();
+        self.nodes.push(CallNode {
+            func,
+            parent,
+            children: Vec::new(),
+            calls: 0,
+            total: 0,
+            own: 0,
+        });
+        self.nodes[parent].children.push((func, node));
+        node
+    }
+
+    fn exit(&mut self, now: u64) {
+        if let Some(frame) = self.stack.pop() {
+            let elapsed = now.saturating_sub(frame.start);
+            let node = &mut self.nodes[frame.node];
+            node.total += elapsed;
+            node.own += elapsed.saturating_sub(frame.children);
+            if let Some(caller) = self.stack.last_mut() {
+                caller.children += elapsed;
+            }
+        }
+    }
+
+    // Whether a caller of node (on its path from the root) is func
+    fn recursive(&self, node: usize, func: u32) -> bool {
+        let mut current = self.nodes[node].parent;
+        while current != 0 {
+            if self.nodes[current].func == func {
+                return true;
+            }
+            current = self.nodes[current].parent;
+        }
+        false
+    }
+
+    fn path(&self, node: usize, names: &[String]) -> String {
+        let mut frames = Vec::new();
+        let mut current = node;
+        while current != 0 {
+            frames.push(names[self.nodes[current].func as usize].as_str());
+            current = self.nodes[current].parent;
+        }
+        frames.reverse();
+        frames.join(";")
+    }
+}
+
+// slot is the function's own counter in the generated code: 0 until the
+// function is first called, then its number here plus one
+fn register_function(slot: &AtomicI32, name: *const c_char) -> c_int {
+    let mut registry = profile_registry();
+    // Another thread may have got here first
+    let id = slot.load(Ordering::Acquire);
+    if id != 0 {
+        return id;
+    }
+    let name = unsafe { CStr::from_ptr(name) }.to_string_lossy().into_owned();
+    registry.names.push(name);
+    let id = registry.names.len() as c_int;
+    slot.store(id, Ordering::Release);
+    id
+}
+
+#[no_mangle]
+pub extern "C" fn cscript_prof_enter(slot: *mut c_int, name: *const c_char) {
+    let slot = unsafe { &*(slot as *const AtomicI32) };
+    let mut id = slot.load(Ordering::Acquire);
+    if id == 0 {
+        id = register_function(slot, name);
+    }
+    THREAD_PROFILE.with(|profile| {
+        let mut profile = profile.lock().unwrap_or_else(|e| e.into_inner());
+        let caller = profile.stack.last().map_or(0, |frame| frame.node);
+        let node = profile.child(caller, (id - 1) as u32);
+        profile.nodes[node].calls += 1;
+        // Taken last so that the bookkeeping is not charged to the callee
+        profile.stack.push(ProfileFrame {
+            node,
+            start: ticks(),
+            children: 0,
+        });
+    });
+}
+
+#[no_mangle]
+pub extern "C" fn cscript_prof_exit() {
+    let now = ticks();
+    THREAD_PROFILE.with(|profile| profile.lock().unwrap_or_else(|e| e.into_inner()).exit(now));
+}
+
+// Called from a module constructor with the labels of the module's loops.
+// Returns one counter per loop; they are owned by the runtime (JIT code and
+// its globals may be gone by the time the report is written at exit).
+#[no_mangle]
+pub extern "C" fn cscript_prof_register_loops(labels: *const *const c_char, count: c_int) -> *mut u64 {
+    let count = count.max(0) as usize;
+    let counters: &'static mut [u64] = Box::leak(vec![0u64; count].into_boxed_slice());
+    let mut registry = profile_registry();
+    for i in 0..count {
+        let label = unsafe { CStr::from_ptr(*labels.add(i)) }.to_string_lossy().into_owned();
+        registry.loops.push((&counters[i] as *const u64 as usize, label));
+    }
+    counters.as_mut_ptr()
+}
+
+fn json_string(s: &str) -> String {
+    let mut out = String::with_capacity(s.len() + 2);
+    out.push('"');
+    for c in s.chars() {
+        match c {
+            '"' => out.push_str("\\\""),
+            '\\' => out.push_str("\\\\"),
+            c if (c as u32) < 0x20 => out.push_str(&format!("\\u{:04x}", c as u32)),
+            c => out.push(c),
+        }
+    }
+    out.push('"');
+    out
+}
+
+extern "C" fn write_profile_at_exit() {
+    // The program's own output comes first
+    cscript_flush();
+    let registry = profile_registry();
+    let end = (Instant::now(), ticks());
+    let elapsed_ticks = end.1.saturating_sub(registry.start.1).max(1);
+    let ns_per_tick = end.0.duration_since(registry.start.0).as_nanos() as f64 / elapsed_ticks as f64;
+    let ns = |t: u64| (t as f64 * ns_per_tick) as u64;
+
+    let count = registry.names.len();
+    let mut calls = vec![0u64; count];
+    let mut total = vec![0u64; count];
+    let mut own = vec![0u64; count];
+    let mut folded: HashMap<String, u64> = HashMap::new();
+    for thread in &registry.threads {
+        let mut profile = thread.lock().unwrap_or_else(|e| e.into_inner());
+        // Functions still running (exit() called further down) end now
+        while !profile.stack.is_empty() {
+            profile.exit(end.1);
+        }
+        for (index, node) in profile.nodes.iter().enumerate().skip(1) {
+            let func = node.func as usize;
+            calls[func] += node.calls;
+            own[func] += node.own;
+            // Only the outermost activation of a recursive function counts
+            // towards its inclusive time
+            if !profile.recursive(index, node.func) {
+                total[func] += node.total;
+            }
+            if node.own > 0 {
+                *folded.entry(profile.path(index, &registry.names)).or_insert(0) += ns(node.own);
+            }
+        }
+    }
+
+    let mut order: Vec<usize> = (0..count).collect();
+    order.sort_by(|&a, &b| own[b].cmp(&own[a]).then(registry.names[a].cmp(&registry.names[b])));
+    let all: u64 = own.iter().sum::<u64>().max(1);
+    let mut loops: Vec<(&str, u64)> = registry
+        .loops
+        .iter()
+        .map(|(counter, label)| (label.as_str(), unsafe { *(*counter as *const u64) }))
+        .collect();
+    loops.sort_by(|a, b| b.1.cmp(&a.1).then(a.0.cmp(b.0)));
+
+    let prefix = std::env::var("CSCRIPT_PROFILE").unwrap_or_else(|_| "cscript-profile".to_string());
+    let mut report = String::new();
+    report.push_str(&format!("profile: {} functions, {} threads (also {}.json, {}.folded)\n",
+                             count, registry.threads.len(), prefix, prefix));
+    report.push_str("       calls     total ms      self ms  self %  function\n");
+    for &f in &order {
+        report.push_str(&format!("{:>12} {:>12.3} {:>12.3} {:>6.1}%  {}\n", calls[f],
+                                 ns(total[f]) as f64 / 1e6, ns(own[f]) as f64 / 1e6,
+                                 own[f] as f64 * 100.0 / all as f64, registry.names[f]));
+    }
+    if !loops.is_empty() {
+        report.push_str("  iterations  loop\n");
+        for (label, iterations) in &loops {
+            report.push_str(&format!("{:>12}  {}\n", iterations, label));
+        }
+    }
+    eprint!("{}", report);
+
+    let mut json = String::from("{\n  \"unit\": \"ns\",\n  \"functions\": [");
+    for (i, &f) in order.iter().enumerate() {
+        json.push_str(if i == 0 { "\n" } else { ",\n" });
+        json.push_str(&format!("    {{\"name\": {}, \"calls\": {}, \"total\": {}, \"self\": {}}}",
+                               json_string(&registry.names[f]), calls[f], ns(total[f]), ns(own[f])));
+    }
+    json.push_str("\n  ],\n  \"loops\": [");
+    for (i, (label, iterations)) in loops.iter().enumerate() {
+        json.push_str(if i == 0 { "\n" } else { ",\n" });
+        json.push_str(&format!("    {{\"label\": {}, \"iterations\": {}}}", json_string(label), iterations));
+    }
+    json.push_str("\n  ]\n}\n");
+
+    // Folded stacks ("main;f;g <self ns>"), as flamegraph.pl and speedscope read them
+    let mut stacks: Vec<(String, u64)> = folded.into_iter().collect();
+    stacks.sort();
+    let folded: String = stacks.iter().map(|(stack, t)| format!("{} {}\n", stack, t)).collect();
+
+    for (ext, data) in [("json", json), ("folded", folded)] {
+        let path = format!("{}.{}", prefix, ext);
+        if let Err(e) = std::fs::write(&path, data) {
+            eprintln!("profile: cannot write {}: {}", path, e);
+        }
+    }
+}
+
+// Thread pool behind `parallel for`. The generated code outlines the loop
+// body into a function that runs the iterations [lo, hi) and returns its
+// part of the reduction (0 without one). cscript_parallel_for gives every
+// thread, the caller included, an equal contiguous share of the iteration
+// space. A thread runs its share chunk by chunk from the front; once it is
+// empty, it steals the back half of the largest share left and carries on
+// with that. Workers are started on first use; CSCRIPT_THREADS sets the
+// number of threads (default: one per core, counting the caller). A
+// parallel for inside another one runs serially on the thread that got
+// there.
+
+type ParallelBody = extern "C" fn(c_int, c_int, *mut u8) -> c_int;
+
+// Chunks per thread when a loop is split up
+const CHUNKS_PER_THREAD: u64 = 16;
+const WORKER_STACK: usize = 8 * 1024 * 1024;
+
+// What is left of a thread's share, as (start, end) offsets from the loop's
+// lo packed into one word, so that its owner taking chunks and the threads
+// stealing from it each need a single compare-and-swap
+struct WorkRange(AtomicU64);
+
+fn pack_range(start: u32, end: u32) -> u64 {
+    ((start as u64) << 32) | end as u64
+}
+
+fn unpack_range(range: u64) -> (u32, u32) {
+    ((range >> 32) as u32, range as u32)
+}
+
+impl WorkRange {
+    fn remaining(&self) -> u32 {
+        let (start, end) = unpack_range(self.0.load(Ordering::Acquire));
+        end.saturating_sub(start)
+    }
+
+    // Up to grain iterations from the front
+    fn take(&self, grain: u32) -> Option<(u32, u32)> {
+        let mut current = self.0.load(Ordering::Acquire);
+        loop {
+            let (start, end) = unpack_range(current);
+            if start >= end {
+                return None;
+            }
+            let next = start + grain.min(end - start);
+            match self.0.compare_exchange_weak(current, pack_range(next, end),
+                                               Ordering::AcqRel, Ordering::Acquire) {
+                Ok(_) => return Some((start, next)),
+                Err(range) => current = range,
+            }
+        }
+    }
+
+    // The back half, or everything when no more than a chunk is left
+    fn steal(&self, grain: u32) -> Option<(u32, u32)> {
+        let mut current = self.0.load(Ordering::Acquire);
+        loop {
+            let (start, end) = unpack_range(current);
+            if start >= end {
+                return None;
+            }
+            let left = end - start;
+            let mid = if left <= grain { start } else { start + left / 2 };
+            match self.0.compare_exchange_weak(current, pack_range(start, mid),
+                                               Ordering::AcqRel, Ordering::Acquire) {
+                Ok(_) => return Some((mid, end)),
+                Err(range) => current = range,
+            }
+        }
+    }
+}
+
+struct ParallelJob {
+    body: ParallelBody,
+    env: usize,
+    lo: c_int,
+    grain: u32,
+    // ranges[0] belongs to the calling thread, ranges[n] to worker n
+    ranges: Vec<WorkRange>,
+    sum: AtomicI32,
+}
+
+impl ParallelJob {
+    fn run(&self, me: usize) {
+        // Sums wrap like the generated code's int arithmetic
+        let mut sum: c_int = 0;
+        loop {
+            while let Some((start, end)) = self.ranges[me].take(self.grain) {
+                let lo = (self.lo as i64 + start as i64) as c_int;
+                let hi = (self.lo as i64 + end as i64) as c_int;
+                sum = sum.wrapping_add((self.body)(lo, hi, self.env as *mut u8));
+            }
+            match self.steal(me) {
+                // Nobody else takes from an empty range, so it can simply
+                // be replaced
+                Some((start, end)) => self.ranges[me].0.store(pack_range(start, end), Ordering::Release),
+                None => break,
+            }
+        }
+        self.sum.fetch_add(sum, Ordering::Relaxed);
+    }
+
+    fn steal(&self, me: usize) -> Option<(u32, u32)> {
+        loop {
+            let victim = (0..self.ranges.len())
+                .filter(|&i| i != me)
+                .max_by_key(|&i| self.ranges[i].remaining())?;
+            if self.ranges[victim].remaining() == 0 {
+                return None;
+            }
+            if let Some(range) = self.ranges[victim].steal(self.grain) {
+                return Some(range);
+            }
+        }
+    }
+}
+
+struct PoolState {
+    job: Option<Arc<ParallelJob>>,
+    generation: u64,
+    // Workers still running the current job
+    running: usize,
+}
+
+struct ThreadPool {
+    workers: usize,
+    state: Mutex<PoolState>,
+    start: Condvar,
+    done: Condvar,
+    // One parallel loop at a time
+    busy: Mutex<()>,
+}
+
+impl ThreadPool {
+    fn state(&self) -> std::sync::MutexGuard<'_, PoolState> {
+        self.state.lock().unwrap_or_else(|e| e.into_inner())
+    }
+
+    fn work(&self, me: usize) {
+        IN_PARALLEL.with(|flag| flag.set(true));
+        let mut seen = 0;
+        loop {
+            let job = {
+                let mut state = self.state();
+                while state.generation == seen {
+                    state = self.start.wait(state).unwrap_or_else(|e| e.into_inner());
+                }
+                seen = state.generation;
+                state.job.clone()
+            };
+            if let Some(job) = job {
+                job.run(me);
+            }
+            let mut state = self.state();
+            state.running -= 1;
+            if state.running == 0 {
+                self.done.notify_one();
+            }
+        }
+    }
+}
+
+fn pool_threads() -> usize {
+    std::env::var("CSCRIPT_THREADS")
+        .ok()
+        .and_then(|n| n.trim().parse::<usize>().ok())
+        .filter(|&n| n > 0)
+        .unwrap_or_else(|| std::thread::available_parallelism().map_or(1, |n| n.get()))
+}
+
+lazy_static! {
+    // None when there is a single thread and loops just run serially
+    static ref THREAD_POOL: Option<Arc<ThreadPool>> = {
+        let threads = pool_threads();
+        if threads < 2 {
+            return None;
+        }
+        let pool = Arc::new(ThreadPool {
+            workers: threads - 1,
+            state: Mutex::new(PoolState {
+                job: None,
+                generation: 0,
+                running: 0,
+            }),
+            start: Condvar::new(),
+            done: Condvar::new(),
+            busy: Mutex::new(()),
+        });
+        for me in 1..threads {
+            let worker = pool.clone();
+            let spawned = std::thread::Builder::new()
+                .name(format!("cscript-worker-{}", me))
+                .stack_size(WORKER_STACK)
+                .spawn(move || worker.work(me));
+            if let Err(e) = spawned {
+                eprintln!("runtime error: cannot start worker thread: {}", e);
+                std::process::exit(1);
+            }
+        }
+        Some(pool)
+    };
+}
+
+thread_local! {
+    // Set on pool workers, and on the caller while it runs its share
+    static IN_PARALLEL: Cell<bool> = Cell::new(false);
+}
+
+#[no_mangle]
+pub extern "C" fn cscript_parallel_for(body: ParallelBody, lo: c_int, hi: c_int, env: *mut u8) -> c_int {
+    if hi <= lo {
+        return 0;
+    }
+    let pool = match THREAD_POOL.as_ref() {
+        Some(pool) if !IN_PARALLEL.with(|flag| flag.get()) => pool,
+        _ => return body(lo, hi, env),
+    };
+    let _busy = pool.busy.lock().unwrap_or_else(|e| e.into_inner());
+
+    let n = (hi as i64 - lo as i64) as u64;
+    let threads = pool.workers as u64 + 1;
+    let grain = (n / (threads * CHUNKS_PER_THREAD)).max(1) as u32;
+    let ranges = (0..threads)
+        .map(|t| WorkRange(AtomicU64::new(pack_range((n * t / threads) as u32, (n * (t + 1) / threads) as u32))))
+        .collect();
+    let job = Arc::new(ParallelJob {
+        body,
+        env: env as usize,
+        lo,
+        grain,
+        ranges,
+        sum: AtomicI32::new(0),
+    });
+
+    {
+        let mut state = pool.state();
+        state.job = Some(job.clone());
+        state.generation += 1;
+        state.running = pool.workers;
+    }
+    pool.start.notify_all();
+
+    IN_PARALLEL.with(|flag| flag.set(true));
+    job.run(0);
+    IN_PARALLEL.with(|flag| flag.set(false));
+
+    let mut state = pool.state();
+    while state.running > 0 {
+        state = pool.done.wait(state).unwrap_or_else(|e| e.into_inner());
+    }
+    state.job = None;
+    job.sum.load(Ordering::Relaxed)
+}